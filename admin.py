@@ -0,0 +1,79 @@
+"""Admin API: bulk rate changes and booking reports.
+
+Registered by ``create_app`` only when ``ADMIN_TOKEN`` is set (app config or
+environment), so a deployment without a token neither serves these routes nor
+imports the modules behind them. Every request needs
+``Authorization: Bearer <ADMIN_TOKEN>``.
+"""
+import functools
+import hmac
+import os
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+import booking_reports
+import database
+import rate_updates
+from models import db
+
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+def admin_token(config):
+    return config.get('ADMIN_TOKEN') or os.environ.get('ADMIN_TOKEN')
+
+
+def admin_required(view):
+    """Require ``Authorization: Bearer <ADMIN_TOKEN>``; without a token the admin API is off."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = admin_token(current_app.config)
+        if not token:
+            return jsonify({'error': 'admin API is disabled; set ADMIN_TOKEN'}), 403
+        given = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(given.encode(), token.encode()):
+            return jsonify({'error': 'invalid admin token'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@bp.route('/rates', methods=['POST'])
+@admin_required
+def admin_update_rates():
+    """Apply hotel, flight and activity price changes in one transaction (see rate_updates.py)."""
+    with db.engine.connect() as conn:
+        try:
+            changes = rate_updates.parse_changes(request.get_json(silent=True), conn)
+        except rate_updates.UpdateError as e:
+            return jsonify({'error': str(e), 'errors': e.errors}), 400
+        return jsonify(rate_updates.apply_changes(conn, changes))
+
+
+@bp.route('/bookings/export')
+@admin_required
+def admin_export_bookings():
+    """Stream bookings as CSV or NDJSON, chunk by chunk (see booking_reports.py)."""
+    try:
+        filters, fmt = booking_reports.parse_export(request.args)
+    except booking_reports.ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    engine = current_app.extensions.get('read_engine') or db.engine
+    chunk = current_app.config.get('BOOKING_EXPORT_CHUNK', booking_reports.DEFAULT_CHUNK)
+    chunks, mimetype = booking_reports.export(engine, filters, fmt, chunk)
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=bookings.{fmt}'
+    return response
+
+
+@bp.route('/bookings/stats')
+@admin_required
+@database.read_only
+def admin_booking_stats():
+    """Booking counts per package and/or day from the booking_stat table."""
+    try:
+        filters = booking_reports.parse_stats(request.args)
+    except booking_reports.ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'group': filters.group,
+                    'rows': booking_reports.booking_stats(db.session.connection(), filters)})
@@ -1,205 +1,165 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-from flask_sqlalchemy import SQLAlchemy
-
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///holidays.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-
-db = SQLAlchemy(app)
-
-
-# ---------------- MODELS ---------------- #
-class City(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), unique=True, nullable=False)
-
-class Package(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100))
-    destination = db.Column(db.String(50))
-    description = db.Column(db.Text)
-    price = db.Column(db.Integer)
-    duration = db.Column(db.String(20))
-    image = db.Column(db.String(200))
-    type = db.Column(db.String(50))
-
-class Flight(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    city_id = db.Column(db.Integer, db.ForeignKey('city.id'))
-    source_station = db.Column(db.String(100))
-    destination_station = db.Column(db.String(100))
-    price = db.Column(db.Integer)
-    details = db.Column(db.Text)
-
-class Hotel(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    city_id = db.Column(db.Integer, db.ForeignKey('city.id'))
-    name = db.Column(db.String(100))
-    address = db.Column(db.Text)
-    room_category = db.Column(db.String(100))
-    price = db.Column(db.Integer)
-    meal = db.Column(db.String(100))
-    details = db.Column(db.Text)
-
-class Activity(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    city_id = db.Column(db.Integer, db.ForeignKey('city.id'))
-    name = db.Column(db.String(100))
-    type = db.Column(db.String(50))  # e.g., pickup, drop, tour
-    rate_1 = db.Column(db.Integer)   # rate for 1 pax
-    rate_2 = db.Column(db.Integer)   # rate for 2 pax
-    rate_3 = db.Column(db.Integer)   # rate for 3 pax
-    rate_4 = db.Column(db.Integer)   # rate for 4 pax
-    price = db.Column(db.Integer)    # default price (optional)
-    details = db.Column(db.Text)
-
-class Booking(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    package_id = db.Column(db.Integer, db.ForeignKey('package.id'))
-    name = db.Column(db.String(100))
-    email = db.Column(db.String(100))
-    phone = db.Column(db.String(20))
-    travellers = db.Column(db.Integer)
-    taxi_type = db.Column(db.String(50))
-    room_type = db.Column(db.String(50))
-    hotel_type = db.Column(db.String(50))
-    persons = db.Column(db.Integer)
-    status = db.Column(db.String(20), default='CONFIRMED')
+import base64
+import hashlib
+import json
+import os
+import uuid
+from datetime import date, datetime, timedelta
+
+from flask import (Blueprint, Flask, Response, abort, current_app, render_template, request, jsonify, redirect,
+                   stream_with_context, url_for)
+from sqlalchemy import and_, or_, select
+
+import assets
+import bookings
+import compression
+import database
+import metrics
+import page_cache
+import price_calendar
+import price_table
+import pricing
+import quotes
+import rate_import
+import reprice
+import schema
+import search
+from catalog import catalog
+from models import db, Package
+
+
+main = Blueprint('main', __name__)
+
+
+# ---------------- PRICING ---------------- #
+def price_packages(packages, from_city, persons):
+    """Price every package in one array operation over the catalog snapshot."""
+    snapshot = catalog.current()
+    package_prices = {}
+    priced, items = [], []
+    with metrics.track_pricing():
+        for pkg in packages:
+            entry = snapshot.city(pkg.destination)
+            if not entry:
+                package_prices[pkg.id] = {
+                    "with_flight": pkg.price,
+                    "without_flight": pkg.price
+                }
+                continue
+            priced.append(pkg.id)
+            items.append(pricing.GridItem(pkg.destination, pkg.duration, entry.hotels, entry.activities,
+                                          entry.routes, entry.rates, from_city))
+        with_flight, without_flight = pricing.price_grids(items, [persons])
+        for i, package_id in enumerate(priced):
+            package_prices[package_id] = {
+                "with_flight": int(with_flight[i, 0]),
+                "without_flight": int(without_flight[i, 0])
+            }
+    return package_prices
 
 
 # ---------------- ROUTES ---------------- #
-@app.route('/')
+@main.route('/')
 def home():
     return render_template('home.html')
 
 
-@app.route('/packages')
+def _filter_packages(query, destination, pkg_type):
+    if destination:
+        query = query.filter(Package.id.in_(search.destination_matches(destination)))
+    if pkg_type:
+        query = query.filter(Package.type == pkg_type)
+    return query
+
+
+def _int_arg(name, default):
+    try:
+        return int(request.args.get(name, default))
+    except Exception:
+        return default
+
+
+def _persons_arg():
+    """Group size from the query string: 1 when missing or invalid, 400 above the largest group."""
+    try:
+        persons = max(int(request.args.get('persons', 1)), 1)
+    except Exception:
+        persons = 1
+    if persons > pricing.MAX_GROUP_SIZE:
+        abort(400, f'persons must be at most {pricing.MAX_GROUP_SIZE}')
+    return persons
+
+
+def _catalog_etag(*parts):
+    """ETag for a response that depends only on the catalog and ``parts``."""
+    return hashlib.sha1(repr((catalog.current().version,) + parts).encode()).hexdigest()
+
+
+def _not_modified(etag, cache_control=None):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        int(values['id'])
+    except Exception:
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return values
+
+
+@main.route('/packages')
+@database.read_only
+@page_cache.cached_page(('destination', 'type', 'from_city', 'persons', 'departure'))
 def packages():
     destination = request.args.get('destination')
     pkg_type = request.args.get('type')
 
-    query = Package.query
-
-    if destination:
-        query = query.filter(Package.destination.ilike(f"%{destination}%"))
-    if pkg_type:
-        query = query.filter(Package.type == pkg_type)
+    query = _filter_packages(Package.query, destination, pkg_type)
 
     packages = query.all()
-    print("DEBUG: packages found =", len(packages))
 
-    # For each package, calculate both "With Flight" and "Without Flight" prices
-    package_prices = {}
-    import re
-    for pkg in packages:
-        city = City.query.filter_by(name=pkg.destination).first()
-        price_with_flight = 0
-        price_without_flight = 0
-        if city:
-            flights = Flight.query.filter_by(city_id=city.id).all()
-            hotels = Hotel.query.filter_by(city_id=city.id).order_by(Hotel.id).all()
-            activities = Activity.query.filter_by(city_id=city.id).all()
-            duration_str = pkg.duration or "4D/3N"
-            match = re.match(r"(\d+)D", duration_str)
-            num_days = int(match.group(1)) if match else 4
-            from_city = request.args.get('from_city', 'New Delhi')
-            # Onward flight (first day)
-            onward_flight = next((f for f in flights if f.source_station and f.destination_station and f.source_station.lower() == from_city.lower() and f.destination_station.lower() == pkg.destination.lower()), None)
-            if onward_flight:
-                price_with_flight += onward_flight.price
-            # Return flight (last day)
-            return_flight = next((f for f in flights if f.source_station and f.destination_station and f.source_station.lower() == pkg.destination.lower() and f.destination_station.lower() == from_city.lower()), None)
-            if return_flight:
-                price_with_flight += return_flight.price
-            # Hotels: use first hotel for all nights (num_days-1)
-            if hotels:
-                price_with_flight += hotels[0].price * (num_days-1)
-                price_without_flight += hotels[0].price * (num_days-1)
-            # Activities: assign dynamically by type, Goa special case
-            pickup_acts = [a for a in activities if a.type and a.type.lower() == "pickup"]
-            drop_acts = [a for a in activities if a.type and a.type.lower() == "drop"]
-            tour_acts = [a for a in activities if a.type and a.type.lower() == "tour"]
-
-            day_activities = []
-            num_middle_days = num_days - 2
-            # Day 1: pickup
-            day_activities.append(pickup_acts)
-            # Special case for Goa: assign all tours to day 3
-            if pkg.destination.lower() == "goa" and num_days == 4:
-                day_activities.append([])  # day 2
-                day_activities.append(tour_acts)  # day 3
-            else:
-                # Middle days: distribute tours, one per day, extra tours on last middle day
-                for i in range(num_middle_days):
-                    if len(tour_acts) == 0:
-                        day_activities.append([])
-                    elif len(tour_acts) <= num_middle_days:
-                        if i < len(tour_acts):
-                            day_activities.append([tour_acts[i]])
-                        else:
-                            day_activities.append([])
-                    else:
-                        if i < num_middle_days - 1:
-                            day_activities.append([tour_acts[i]])
-                        else:
-                            day_activities.append(tour_acts[i:])
-            # Last day: drop
-            day_activities.append(drop_acts)
-            # Get number of persons from query string, default to 1
-            try:
-                persons = int(request.args.get('persons', 1))
-            except Exception:
-                persons = 1
-
-            # Helper to get correct rate for activity
-            def get_activity_rate(activity, persons):
-                if persons == 1 and hasattr(activity, "rate_1") and activity.rate_1 is not None:
-                    return activity.rate_1
-                elif persons == 2 and hasattr(activity, "rate_2") and activity.rate_2 is not None:
-                    return activity.rate_2
-                elif persons == 3 and hasattr(activity, "rate_3") and activity.rate_3 is not None:
-                    return activity.rate_3
-                elif persons == 4 and hasattr(activity, "rate_4") and activity.rate_4 is not None:
-                    return activity.rate_4
-                elif hasattr(activity, "price") and activity.price is not None:
-                    return activity.price
-                return 0
-
-            for acts in day_activities:
-                for activity in acts:
-                    if activity:
-                        rate = get_activity_rate(activity, persons)
-                        price_with_flight += rate * persons if rate is not None else 0
-                        price_without_flight += rate * persons if rate is not None else 0
-            package_prices[pkg.id] = {
-                "with_flight": price_with_flight,
-                "without_flight": price_without_flight
-            }
-        else:
-            package_prices[pkg.id] = {
-                "with_flight": pkg.price,
-                "without_flight": pkg.price
-            }
+    from_city = request.args.get('from_city', 'New Delhi')
+    persons = _persons_arg()
+
+    # For each package, read both "With Flight" and "Without Flight" prices
+    # from the price table; price anything not materialized yet live
+    package_prices = price_table.lookup_totals(query.with_entities(Package.id).scalar_subquery(), from_city, persons)
+    missing = [pkg for pkg in packages if pkg.id not in package_prices]
+    if missing:
+        package_prices.update(price_packages(missing, from_city, persons))
+    snapshot = catalog.current()
+    # Seasonal rates apply on a departure date; the price table holds undated totals
+    departure = price_calendar.parse_departure(request.args.get('departure'))
+    if departure:
+        package_prices.update(price_calendar.departure_prices(packages, snapshot, from_city, persons, departure))
+    page_cache.depends_on(entry.city.id for entry in map(snapshot.city, {pkg.destination for pkg in packages})
+                          if entry)
 
     return render_template('packages.html', packages=packages, package_prices=package_prices)
 
 
-from datetime import datetime, timedelta
-
-@app.route('/package/<int:id>')
+@main.route('/package/<int:id>')
+@database.read_only
+# Day labels start today when there is no departure date
+@page_cache.cached_page(('departure', 'from_city', 'flight_option', 'persons', 'initial_price'),
+                        vary=lambda: date.today())
 def package_detail(id):
     package = Package.query.get_or_404(id)
     # Get departure date and from_city from query string if present
     departure = request.args.get('departure')
     from_city = request.args.get('from_city', 'New Delhi')
     flight_option = request.args.get('flight_option', 'with')  # default to 'with'
-    # Parse duration for dynamic days
-    import re
-    duration_str = package.duration or "4D/3N"
-    match = re.match(r"(\d+)D", duration_str)
-    num_days = int(match.group(1)) if match else 4
+    persons = _persons_arg()
+    num_days = pricing.parse_num_days(package.duration)
+    departure_date = price_calendar.parse_departure(departure)
 
     # Get initial_price from query string if present
     try:
@@ -219,187 +179,43 @@ def package_detail(id):
         dt = base_date + timedelta(days=i)
         label = f"{dt.day} {months[dt.month-1]}, {weekdays[dt.weekday()]}"
         day_labels.append(label)
-    # Calculate initial total price for visible items from DB
-    city = City.query.filter_by(name=package.destination).first()
-    initial_total_price = 0
+
+    entry = catalog.current().city(package.destination)
+    if entry:
+        page_cache.depends_on([entry.city.id])
     item_prices = {}
     hotel_names = []
     hotel_details = []
     activity_details = []
-    if city:
-        flights = Flight.query.filter_by(city_id=city.id).all()
-        hotels = Hotel.query.filter_by(city_id=city.id).all()
-        activities = Activity.query.filter_by(city_id=city.id).all()
-        # Ensure all days have keys, set missing to 0
-        # Assign flights by direction
-        item_prices = {}
-        hotel_names = []
-        hotel_details = []
-        activity_details = []
-
-        # Add flight prices to item_prices for each day
-        for idx in range(1, num_days+1):
-            if idx == 1:
-                onward_flight = next((f for f in flights if f.source_station and f.destination_station and f.source_station.lower() == from_city.lower() and f.destination_station.lower() == package.destination.lower()), None)
-                if onward_flight and flight_option != "without":
-                    item_prices[f"flight-day{idx}"] = onward_flight.price
-                else:
-                    item_prices[f"flight-day{idx}"] = 0
-            elif idx == num_days:
-                return_flight = next((f for f in flights if f.source_station and f.destination_station and f.source_station.lower() == package.destination.lower() and f.destination_station.lower() == from_city.lower()), None)
-                if return_flight and flight_option != "without":
-                    item_prices[f"flight-day{idx}"] = return_flight.price
-                else:
-                    item_prices[f"flight-day{idx}"] = 0
-            else:
-                item_prices[f"flight-day{idx}"] = 0
-
-        # Add hotel prices to item_prices for each night (num_days-1)
-        for idx in range(1, num_days):
-            if hotels:
-                hotel = hotels[0]
-                item_prices[f"hotel-day{idx}"] = hotel.price
-                hotel_names.append(hotel.name)
-                hotel_details.append({
-                    "name": hotel.name,
-                    "address": hotel.address,
-                    "room_category": hotel.room_category,
-                    "meal": hotel.meal,
-                    "price": hotel.price
-                })
-            else:
-                item_prices[f"hotel-day{idx}"] = 0
-                hotel_names.append("No Hotel")
-                hotel_details.append({
-                    "name": "No Hotel",
-                    "address": "",
-                    "room_category": "",
-                    "meal": "",
-                    "price": 0
-                })
-
-        # Helper to get correct rate for activity
-        def get_activity_rate(activity, persons):
-            if persons == 1 and hasattr(activity, "rate_1") and activity.rate_1 is not None:
-                return activity.rate_1
-            elif persons == 2 and hasattr(activity, "rate_2") and activity.rate_2 is not None:
-                return activity.rate_2
-            elif persons == 3 and hasattr(activity, "rate_3") and activity.rate_3 is not None:
-                return activity.rate_3
-            elif persons == 4 and hasattr(activity, "rate_4") and activity.rate_4 is not None:
-                return activity.rate_4
-            elif hasattr(activity, "price") and activity.price is not None:
-                return activity.price
-            return 0
-
-        # Assign activities to days dynamically by type, distributing tours
-        pickup_acts = [a for a in activities if a.type and a.type.lower() == "pickup"]
-        drop_acts = [a for a in activities if a.type and a.type.lower() == "drop"]
-        tour_acts = [a for a in activities if a.type and a.type.lower() == "tour"]
-
-        day_activities = []
-        num_middle_days = num_days - 2
-        # Day 1: pickup
-        day_activities.append(pickup_acts)
-        # Special case for Goa: custom distribution of tours, pickup/drop only on 1/4
-        if package.destination.lower() == "goa" and num_days == 4:
-            day_activities = []
-            day_activities.append(pickup_acts)  # day 1: pickup only
-            # Find activities by name
-            def find_activity(name):
-                return next((a for a in tour_acts if a.name.upper() == name.upper()), None)
-            day_activities.append([find_activity("NORTH GOA TOUR SIC")])  # day 2
-            day_activities.append([
-                find_activity("SOUTH GOA TOUR SIC"),
-                find_activity("BOAT CRUISE RIDE"),
-                find_activity("SCUBA DIVING+WATERSPORTS")
-            ])  # day 3
-            day_activities.append(drop_acts)  # day 4: drop only
-        else:
-            # Middle days: distribute tours, one per day, extra tours on last middle day
-            for i in range(num_middle_days):
-                if len(tour_acts) == 0:
-                    day_activities.append([])
-                elif len(tour_acts) <= num_middle_days:
-                    # Fewer or equal tours than middle days: assign one per day, empty if not enough
-                    if i < len(tour_acts):
-                        day_activities.append([tour_acts[i]])
-                    else:
-                        day_activities.append([])
-                else:
-                    # More tours than middle days: assign one per day, extras on last middle day
-                    if i < num_middle_days - 1:
-                        day_activities.append([tour_acts[i]])
-                    else:
-                        # Last middle day: assign remaining tours
-                        day_activities.append(tour_acts[i:])
-        # Last day: drop
-        day_activities.append(drop_acts)
-
-        # Get number of persons from query string, default to 1
-        try:
-            persons = int(request.args.get('persons', 1))
-        except Exception:
-            persons = 1
-
-        for idx, acts in enumerate(day_activities, start=1):
-            total_day_price = 0
-            day_detail = []
-            for activity in acts:
-                if activity:
-                    print(f"DEBUG: idx={idx}, activity_name={activity.name}, persons={persons}")
-                    rate = get_activity_rate(activity, persons)
-                    print(f"DEBUG: Multiplying rate {rate} by persons {persons} for activity {activity.name}")
-                    total_day_price += rate * persons if rate is not None else 0
-                    day_detail.append({
-                        "name": activity.name,
-                        "type": activity.type,
-                        "rate_1": activity.rate_1,
-                        "rate_2": activity.rate_2,
-                        "rate_3": activity.rate_3,
-                        "rate_4": activity.rate_4,
-                        "details": activity.details
-                    })
-            item_prices[f"activity-day{idx}"] = total_day_price
-            activity_details.append(day_detail if day_detail else [{
-                "name": "",
-                "type": "",
-                "rate_1": 0,
-                "rate_2": 0,
-                "rate_3": 0,
-                "rate_4": 0,
-                "details": ""
-            }])
+    if entry:
+        with metrics.track_pricing():
+            itinerary = pricing.build_itinerary(
+                package.destination, package.duration, entry.flights, entry.hotels, entry.activities,
+                from_city, persons, entry.routes, entry.rates, departure_date, entry.seasons)
+            item_prices = pricing.item_prices(itinerary, flight_option)
+        for day in itinerary.days[:-1]:
+            hotel = day.hotel
+            hotel_names.append(hotel.name if hotel else "No Hotel")
+            hotel_details.append(_hotel_detail(hotel))
+        for day in itinerary.days:
+            activity_details.append([_activity_detail(a) for a in day.activities] or [_activity_detail(None)])
     else:
-        initial_total_price = package.price
         hotel_names = ["No Hotel"] * (num_days-1)
-        hotel_details = [{
-            "name": "No Hotel",
-            "address": "",
-            "room_category": "",
-            "meal": "",
-            "price": 0
-        }] * (num_days-1)
-        activity_details = [{
-            "name": "",
-            "type": "",
-            "rate_1": 0,
-            "rate_2": 0,
-            "rate_3": 0,
-            "rate_4": 0,
-            "details": ""
-        }] * num_days
-
-    # Ensure initial_total_price is the sum of all item_prices values
-    calculated_total_price = sum([v for v in item_prices.values() if isinstance(v, (int, float))])
+        hotel_details = [_hotel_detail(None)] * (num_days-1)
+        activity_details = [_activity_detail(None)] * num_days
+
+    # The price table holds undated totals; on a departure date seasonal rates apply
+    totals = None if departure_date else price_table.lookup_totals([package.id], from_city, persons).get(package.id)
     if initial_price_param > 0:
         initial_total_price = initial_price_param
+    elif totals:
+        initial_total_price = totals["without_flight" if flight_option == "without" else "with_flight"]
+    elif entry:
+        # Dated or not materialized yet: the total is the sum of all item_prices values
+        initial_total_price = sum(item_prices.values())
     else:
-        initial_total_price = calculated_total_price
+        initial_total_price = package.price
 
-    print("DEBUG: item_prices =", item_prices)
-    print("DEBUG: activity_details =", activity_details)
-    print("DEBUG: initial_total_price =", initial_total_price)
     return render_template(
         'package_detail.html',
         package=package,
@@ -417,107 +233,361 @@ def package_detail(id):
     )
 
 
-@app.route('/api/hotels')
+def _hotel_detail(hotel):
+    if hotel is None:
+        return {"name": "No Hotel", "address": "", "room_category": "", "meal": "", "price": 0}
+    return {
+        "name": hotel.name,
+        "address": hotel.address,
+        "room_category": hotel.room_category,
+        "meal": hotel.meal,
+        "price": hotel.price
+    }
+
+
+def _activity_detail(activity):
+    if activity is None:
+        return {"name": "", "type": "", "rate_1": 0, "rate_2": 0, "rate_3": 0, "rate_4": 0, "price": 0, "details": ""}
+    return {
+        "name": activity.name,
+        "type": activity.type,
+        "rate_1": activity.rate_1,
+        "rate_2": activity.rate_2,
+        "rate_3": activity.rate_3,
+        "rate_4": activity.rate_4,
+        "price": activity.price,
+        "details": activity.details
+    }
+
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+@main.route('/api/packages')
+@database.read_only
+def api_packages():
+    destination = request.args.get('destination')
+    pkg_type = request.args.get('type')
+    from_city = request.args.get('from_city', 'New Delhi')
+    flight_option = request.args.get('flight_option', 'with')
+    persons = _int_arg('persons', 1)
+    limit = min(max(_int_arg('limit', API_PAGE_SIZE), 1), API_MAX_PAGE_SIZE)
+    sort = request.args.get('sort', 'id')
+    if sort not in ('id', 'price'):
+        return jsonify({'error': "sort must be 'id' or 'price'"}), 400
+    if not 1 <= persons <= pricing.MAX_GROUP_SIZE:
+        return jsonify({'error': f'persons must be between 1 and {pricing.MAX_GROUP_SIZE}'}), 400
+
+    # A page only changes with the catalog, so its ETag is known before any
+    # query runs and an unchanged page costs neither SQL nor serialization
+    etag = _catalog_etag(sorted(request.args.items(multi=True)))
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    try:
+        after = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Keyset pagination: a deep page seeks past the cursor instead of skipping rows
+    query = _filter_packages(select(Package), destination, pkg_type)
+    if sort == 'price':
+        query, price = price_table.with_price(query, from_city, persons, flight_option)
+        query = query.add_columns(price)
+        if after:
+            query = query.where(or_(price > after.get('price', 0),
+                                    and_(price == after.get('price', 0), Package.id > after['id'])))
+        query = query.order_by(price, Package.id)
+    else:
+        if after:
+            query = query.where(Package.id > after['id'])
+        query = query.order_by(Package.id)
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    page = [row[0] for row in rows[:limit]]
+
+    package_prices = price_table.lookup_totals([pkg.id for pkg in page], from_city, persons)
+    missing = [pkg for pkg in page if pkg.id not in package_prices]
+    if missing:
+        package_prices.update(price_packages(missing, from_city, persons))
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor({'id': last[0].id, 'price': last[1]} if sort == 'price' else {'id': last[0].id})
+    response = jsonify({
+        'packages': [{
+            'id': pkg.id,
+            'name': pkg.name,
+            'destination': pkg.destination,
+            'duration': pkg.duration,
+            'type': pkg.type,
+            'image': pkg.image,
+            'price': pkg.price,
+            'with_flight': package_prices[pkg.id]['with_flight'],
+            'without_flight': package_prices[pkg.id]['without_flight'],
+        } for pkg in page],
+        'next_cursor': next_cursor,
+    })
+    response.set_etag(etag)
+    return response
+
+
+@main.route('/api/quotes', methods=['POST'])
+@database.read_only
+def api_quotes():
+    body = request.get_json(silent=True)
+    items = body.get('quotes') if isinstance(body, dict) else body
+    if not isinstance(items, list):
+        return jsonify({'error': "body must be a list of quotes or {\"quotes\": [...]}"}), 400
+    if len(items) > quotes.MAX_QUOTES:
+        return jsonify({'error': f'at most {quotes.MAX_QUOTES} quotes per request'}), 400
+
+    parsed, errors = {}, []
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = quotes.parse_quote(item)
+        except quotes.QuoteError as e:
+            errors.append({'index': index, 'error': str(e)})
+    package_ids = sorted({package_id for package_id, *_ in parsed.values()})
+    packages = {}
+    for i in range(0, len(package_ids), 500):
+        chunk = package_ids[i:i + 500]
+        rows = db.session.execute(select(Package.id, Package.destination, Package.duration, Package.price)
+                                  .where(Package.id.in_(chunk)))
+        packages.update((row.id, tuple(row)) for row in rows)
+
+    # One group per destination city, so its catalog rows are sent once
+    snapshot = catalog.current()
+    groups = {}
+    for index, (package_id, from_city, persons, flight_option) in parsed.items():
+        package = packages.get(package_id)
+        if package is None:
+            errors.append({'index': index, 'error': f'unknown package {package_id}'})
+            continue
+        entry = snapshot.city(package[1]) if package[1] else None
+        job = quotes.QuoteJob(index, package, from_city, persons, flight_option)
+        groups.setdefault(entry.city.id if entry else None, (entry, []))[1].append(job)
+    workers = current_app.config.get('QUOTE_WORKERS') or quotes.available_cpus()
+
+    def generate():
+        for error in errors:
+            yield json.dumps(error) + '\n'
+        count = 0
+        for results in quotes.run_groups(list(groups.values()), workers):
+            count += len(results)
+            yield ''.join(json.dumps(r) + '\n' for r in results)
+        yield json.dumps({'done': True, 'quotes': count, 'errors': len(errors)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@main.route('/api/hotels')
+@database.read_only
 def api_hotels():
     city_name = request.args.get('city')
     hotels = []
     if city_name:
-        city = City.query.filter_by(name=city_name).first()
-        if city:
-            hotels = Hotel.query.filter_by(city_id=city.id).all()
+        entry = catalog.current().city(city_name)
+        if entry:
+            hotels = entry.hotels
     hotel_names = [h.name for h in hotels]
     return jsonify({'hotels': hotel_names})
 
-@app.route('/api/hotel_price')
+@main.route('/api/hotel_options')
+def api_hotel_options():
+    """Every hotel of a city with its price and details, in one response."""
+    city_name = request.args.get('city', '')
+    cache_control = f"public, max-age={current_app.config.get('HOTEL_OPTIONS_MAX_AGE', 60)}"
+    etag = _catalog_etag(city_name)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag, cache_control)
+    entry = catalog.current().city(city_name)
+    hotels = entry.hotels if entry else ()
+    response = jsonify({
+        'city': city_name,
+        'hotels': [{
+            'id': h.id,
+            'name': h.name,
+            'price': h.price,
+            'room_category': h.room_category,
+            'meal': h.meal,
+            'address': h.address,
+        } for h in hotels],
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+@main.route('/api/hotel_price')
+@database.read_only
 def hotel_price():
     hotel_name = request.args.get('name')
     city_name = request.args.get('city')
     hotel = None
     if hotel_name and city_name:
-        city = City.query.filter_by(name=city_name).first()
-        if city:
-            hotel = Hotel.query.filter_by(name=hotel_name, city_id=city.id).first()
+        hotel = catalog.current().hotel(city_name, hotel_name)
     if hotel:
         return jsonify({'price': hotel.price})
     return jsonify({'price': None})
 
-@app.route('/book/<int:package_id>', methods=['GET', 'POST'])
+@main.route('/api/package/<int:id>/prices')
+@database.read_only
+def package_group_prices(id):
+    """Totals for 1..max_persons travellers, priced in one array operation."""
+    package = Package.query.get_or_404(id)
+    from_city = request.args.get('from_city', 'New Delhi')
+    try:
+        max_persons = min(max(int(request.args.get('max_persons', 10)), 1), pricing.MAX_GROUP_SIZE)
+    except Exception:
+        max_persons = 10
+    persons = list(range(1, max_persons + 1))
+    entry = catalog.current().city(package.destination)
+    if entry:
+        with metrics.track_pricing():
+            item = pricing.GridItem(package.destination, package.duration, entry.hotels, entry.activities,
+                                    entry.routes, entry.rates, from_city)
+            with_flight, without_flight = (grid[0].tolist() for grid in pricing.price_grids([item], persons))
+    else:
+        with_flight = without_flight = [package.price] * len(persons)
+    return jsonify({
+        'package_id': package.id,
+        'from_city': from_city,
+        'prices': [{'persons': p, 'with_flight': w, 'without_flight': wo}
+                   for p, w, wo in zip(persons, with_flight, without_flight)],
+    })
+
+@main.route('/api/package/<int:id>/calendar')
+@database.read_only
+def package_calendar(id):
+    """Total for each departure day of ``month`` (YYYY-MM, default this month)."""
+    package = Package.query.get_or_404(id)
+    from_city = request.args.get('from_city', 'New Delhi')
+    try:
+        persons = max(int(request.args.get('persons', 1)), 1)
+    except Exception:
+        persons = 1
+    if persons > pricing.MAX_GROUP_SIZE:
+        return jsonify({'error': f'persons must be at most {pricing.MAX_GROUP_SIZE}'}), 400
+    try:
+        month = price_calendar.parse_month(request.args.get('month'))
+    except price_calendar.CalendarError as e:
+        return jsonify({'error': str(e)}), 400
+    with metrics.track_pricing():
+        days = price_calendar.package_calendar(
+            package, catalog.current(), from_city, persons, month,
+            current_app.config.get('CALENDAR_CACHE_SIZE', price_calendar.DEFAULT_CACHE_SIZE))
+    return jsonify({
+        'package_id': package.id,
+        'month': month.strftime('%Y-%m'),
+        'persons': persons,
+        'from_city': from_city,
+        'days': [{'date': d.isoformat(), 'with_flight': w, 'without_flight': wo} for d, w, wo in days],
+    })
+
+@main.route('/api/package/<int:id>/reprice', methods=['POST'])
+@database.read_only
+def package_reprice(id):
+    """Reprice one detail-page edit against an itinerary rebuilt from the catalog."""
+    package = Package.query.get_or_404(id)
+    try:
+        state, change = reprice.parse_request(request.get_json(silent=True))
+        with metrics.track_pricing():
+            result = reprice.reprice(package, catalog.current(), state, change)
+    except reprice.RepriceError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@main.route('/api/destinations/suggest')
+def suggest_destinations():
+    prefix = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except Exception:
+        limit = 10
+    suggestions = catalog.current().destinations.suggest(prefix, limit)
+    return jsonify({'q': prefix, 'suggestions': suggestions})
+
+@main.route('/book/<int:package_id>', methods=['GET', 'POST'])
 def book(package_id):
     package = Package.query.get_or_404(package_id)
 
     if request.method == 'POST':
-        booking = Booking(
-            package_id=package.id,
-            name=request.form['name'],
-            email=request.form['email'],
-            phone=request.form['phone'],
-            travellers=request.form['travellers'],
-            taxi_type=request.form['taxi_type'],
-            room_type=request.form['room_type'],
-            hotel_type=request.form['hotel_type'],
-            persons=request.form['persons']
-        )
-        db.session.add(booking)
-        db.session.commit()
-        return redirect(url_for('home'))
-
-    return render_template('booking.html', package=package)
-
-
-from sqlalchemy import text
+        try:
+            values = bookings.parse_booking(request.form, package.id)
+            key = bookings.idempotency_key(request)
+        except bookings.BookingError as e:
+            return render_template('booking.html', package=package, error=str(e), form=request.form,
+                                   idempotency_key=request.form.get('idempotency_key') or uuid.uuid4().hex), 400
+        bookings.place_booking(values, key)
+        return redirect(url_for('.home'))
+
+    return render_template('booking.html', package=package, form={}, idempotency_key=uuid.uuid4().hex)
 
-import os
 
-@app.route('/debug/update_hotel_prices')
-def debug_update_hotel_prices():
-    city = City.query.filter_by(name='Goa').first()
-    if not city:
-        return "Goa city not found."
-    updates = [
-        ('Radisson Goa Candolim - Holidays Selections', 5000),
-        ('Taj Exotica Resort & Spa', 8000),
-        ('Holiday Inn Resort Goa', 6500)
-    ]
-    for name, price in updates:
-        hotel = Hotel.query.filter_by(name=name, city_id=city.id).first()
-        if hotel:
-            hotel.price = price
-    db.session.commit()
-    return "Hotel prices updated for Goa."
-
-@app.route('/debug/dbpath')
-def debug_dbpath():
-    db_uri = app.config['SQLALCHEMY_DATABASE_URI']
-    db_path = db_uri.replace('sqlite:///', '')
-    abs_path = os.path.abspath(db_path)
-    return f"Flask is using database file: {abs_path}"
-
-@app.route('/contact')
+@main.route('/contact')
 def contact():
     return render_template('contact.html')
 
-@app.route('/debug/tables')
-def debug_tables():
-    # List all table names
-    tables = db.session.execute(text("SELECT name FROM sqlite_master WHERE type='table';")).fetchall()
-    output = []
-    for t in tables:
-        table_name = t[0]
-        # Print schema
-        schema = db.session.execute(text(f"SELECT sql FROM sqlite_master WHERE name='{table_name}';")).fetchone()
-        output.append(f"<b>Table:</b> {table_name}<br><b>Schema:</b> {schema[0] if schema else 'N/A'}")
-        # Print sample record
-        try:
-            sample = db.session.execute(text(f"SELECT * FROM {table_name} LIMIT 1;")).fetchone()
-            output.append(f"<b>Sample record:</b> {sample}<br><br>")
-        except Exception as e:
-            output.append(f"<b>Error reading sample:</b> {e}<br><br>")
-    return "<hr>".join(output)
 
-@app.route('/init_db')
-def init_db():
-    db.create_all()
-    return "Database tables created."
+# ---------------- APPLICATION ---------------- #
+def _flag(config, key, default):
+    value = config.get(key, os.environ.get(key, default))
+    return value if isinstance(value, bool) else str(value).lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def create_app(config=None):
+    """Build the application; ``config`` overrides the defaults.
+
+    The admin blueprint is registered only when ``ADMIN_TOKEN`` is set and
+    the debug blueprint only when ``DEBUG_ROUTES`` is on (default: the app's
+    debug flag), so production workers don't import either.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///holidays.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config or {})
+
+    db.init_app(app)
+    database.init_app(app)
+    bookings.init_app(app)
+    app.cli.add_command(price_table.cli)
+    app.cli.add_command(rate_import.cli)
+    app.cli.add_command(database.cli)
+    app.cli.add_command(bookings.cli)
+    metrics.init_app(app)
+    compression.init_app(app)
+    assets.init_app(app)
+    metrics.registry.add_collector('holiday_catalog', catalog.stats)
+    metrics.registry.add_collector('holiday_booking_writer', app.extensions['booking_writer'].stats)
+    metrics.registry.add_collector('holiday_calendar_cache', price_calendar.cache.stats)
+    metrics.registry.add_collector('holiday_page_cache', page_cache.cache.stats)
+    metrics.registry.add_collector('holiday_compression', compression.stats.stats)
+
+    app.register_blueprint(main)
+    if app.config.get('ADMIN_TOKEN') or os.environ.get('ADMIN_TOKEN'):
+        import admin
+        app.register_blueprint(admin.bp)
+    if _flag(app.config, 'DEBUG_ROUTES', app.debug):
+        import debug
+        app.register_blueprint(debug.bp)
+
+    with app.app_context():
+        schema.upgrade()
+    database.log_report(app)
+    return app
+
+
+def warm_up(app):
+    """Load what the first requests would: the catalog snapshot and compiled templates.
+
+    gunicorn.conf.py calls this in the master before forking, so every
+    worker starts with them in memory shared copy-on-write.
+    """
+    with app.app_context():
+        catalog.current()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app({'DEBUG_ROUTES': True}).run(debug=True)
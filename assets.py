@@ -0,0 +1,121 @@
+"""Fingerprinted, precompressed static assets.
+
+``flask --app app assets build`` copies every file under ``static/`` to
+``static/dist/`` with a content hash in its name (``css/style.css`` becomes
+``dist/css/style.<hash>.css``). It writes a gzip variant next to each text
+asset and a ``manifest.json`` that maps source names to hashed ones.
+
+When a manifest exists at startup, ``url_for('static', filename=...)``
+returns the hashed name. Hashed files are served with an immutable
+``Cache-Control``, so browsers keep them until the content (and with it the
+name) changes. Clients that accept gzip get the precompressed variant. Files
+not in the manifest, or every file when the build has not been run, are
+served by Flask's default static route as before. Rebuilding needs a restart
+to pick up the new manifest.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+HASH_LENGTH = 12
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".map", ".html")
+
+
+def hashed_name(path, data):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def build(static_folder):
+    """Write ``static/dist``; returns ``[(source, hashed, bytes, gzip bytes or None)]``."""
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest, report = {}, []
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [d for d in dirs if d != DIST]
+        for name in sorted(files):
+            if name.startswith("."):
+                continue
+            source = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+            with open(os.path.join(root, name), "rb") as f:
+                data = f.read()
+            target = hashed_name(source, data)
+            path = os.path.join(dist, target)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            compressed_size = None
+            if name.endswith(COMPRESSIBLE):
+                # mtime=0 keeps the output byte-identical across builds
+                compressed = gzip.compress(data, 9, mtime=0)
+                if len(compressed) < len(data):
+                    with open(path + ".gz", "wb") as f:
+                        f.write(compressed)
+                    compressed_size = len(compressed)
+            manifest[source] = f"{DIST}/{target}"
+            report.append((source, target, len(data), compressed_size))
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return report
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def serve_dist(filename):
+    """Serve a hashed file, precompressed when the client accepts gzip."""
+    directory = os.path.join(current_app.static_folder, DIST)
+    if request.accept_encodings["gzip"] and os.path.isfile(os.path.join(directory, filename + ".gz")):
+        response = send_from_directory(directory, filename + ".gz",
+                                       mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = send_from_directory(directory, filename)
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_app(app):
+    manifest = load_manifest(app.static_folder)
+    app.extensions["asset_manifest"] = manifest
+    app.add_url_rule(f"{app.static_url_path}/{DIST}/<path:filename>", "static_dist", serve_dist)
+    app.cli.add_command(cli)
+
+    @app.url_defaults
+    def _hashed_static_url(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+
+# ---------------- CLI ---------------- #
+cli = AppGroup("assets", help="Build fingerprinted static assets.")
+
+
+@cli.command("build")
+def build_command():
+    """Hash and precompress everything under static/ into static/dist/."""
+    total = total_gzip = 0
+    for source, target, size, compressed_size in build(current_app.static_folder):
+        gz = f"{compressed_size:>8} gzip" if compressed_size is not None else f"{'':>13}"
+        click.echo(f"{source:<30} -> {target:<40} {size:>8} {gz}")
+        total += size
+        total_gzip += compressed_size if compressed_size is not None else size
+    click.echo(f"{total} bytes, {total_gzip} bytes sent to gzip clients ({total - total_gzip} saved)")
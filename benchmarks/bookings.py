@@ -0,0 +1,176 @@
+"""Concurrent booking benchmark: several writer processes against one SQLite file.
+
+Each process imports the app and runs ``--threads`` threads that POST bookings
+through the test client for ``--seconds``. About one in ten requests retries
+the previous booking with the same idempotency key, the way a double-submitted
+form would. The run reports sustained bookings per second, request latency and
+failures. It then checks the table holds exactly one row per idempotency key
+and that ``booking_stat`` counts every row once.
+
+Modes, each on a fresh database:
+
+    group     WAL, busy_timeout, group commit (the default configuration)
+    direct    WAL, busy_timeout, one transaction per booking
+    legacy    rollback journal, one transaction per booking
+
+Group commit saves commits, so it pays off when commits are expensive.
+``--synchronous FULL`` fsyncs on every commit, as on a durable production
+volume.
+
+    python -m benchmarks.bookings [--processes 4] [--threads 4] [--seconds 5] [--modes group,direct,legacy]
+                                  [--synchronous NORMAL|FULL]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+
+# (app config, environment) per mode; SQLite settings go through the
+# environment so they apply from the first connection the app opens
+MODES = {
+    "group": ({"BOOKING_GROUP_COMMIT": True}, {}),
+    "direct": ({"BOOKING_GROUP_COMMIT": False}, {}),
+    "legacy": ({"BOOKING_GROUP_COMMIT": False}, {"SQLITE_JOURNAL_MODE": "DELETE"}),
+}
+RETRY_SHARE = 0.1
+
+
+def _form(key, rng):
+    persons = rng.randint(1, 6)
+    return {
+        "name": "Bench User", "email": "bench@example.com", "phone": "9999999999",
+        "travellers": persons, "taxi_type": "Sedan", "room_type": "Deluxe",
+        "hotel_type": "4 Star", "persons": persons, "idempotency_key": key,
+    }
+
+
+def _environ(path, mode, synchronous):
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    os.environ["SQLITE_SYNCHRONOUS"] = synchronous
+    os.environ.update(MODES[mode][1])
+
+
+def writer_process(path, mode, synchronous, threads, seconds, start_at, results):
+    _environ(path, mode, synchronous)
+    from app import create_app
+
+    app = create_app(MODES[mode][0])
+    package_ids = [r[0] for r in sqlite3.connect(path).execute("SELECT id FROM package")]
+    stats = {"requests": 0, "failures": 0, "latencies": [], "keys": set()}
+    lock = threading.Lock()
+
+    def run(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        previous = None
+        local = {"requests": 0, "failures": 0, "latencies": [], "keys": set()}
+        while time.time() < start_at:
+            time.sleep(0.001)
+        deadline = start_at + seconds
+        while time.time() < deadline:
+            key = previous if previous and rng.random() < RETRY_SHARE else uuid.uuid4().hex
+            t0 = time.perf_counter()
+            try:
+                response = client.post(f"/book/{rng.choice(package_ids)}", data=_form(key, rng))
+                ok = response.status_code == 302
+            except Exception:
+                ok = False
+            local["latencies"].append(time.perf_counter() - t0)
+            local["requests"] += 1
+            if ok:
+                local["keys"].add(key)
+                previous = key
+            else:
+                local["failures"] += 1
+        with lock:
+            for name in ("requests", "failures"):
+                stats[name] += local[name]
+            stats["latencies"].extend(local["latencies"])
+            stats["keys"] |= local["keys"]
+
+    workers = [threading.Thread(target=run, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    stats["keys"] = list(stats["keys"])
+    results.put(stats)
+
+
+def prepare_database(path, mode, synchronous):
+    _environ(path, mode, synchronous)
+    from app import create_app
+    from models import db, Package
+
+    app = create_app()
+
+    with app.app_context():
+        db.session.add_all(Package(name=f"Package {i}", destination="Goa", price=10000, duration="4D/3N")
+                           for i in range(20))
+        db.session.commit()
+        db.engine.dispose()
+
+
+def run_mode(mode, processes, threads, seconds, synchronous):
+    path = os.path.join(tempfile.mkdtemp(prefix="holiday-bookings-"), "bench.db")
+    ctx = multiprocessing.get_context("spawn")
+    setup = ctx.Process(target=prepare_database, args=(path, mode, synchronous))
+    setup.start()
+    setup.join()
+
+    results = ctx.Queue()
+    # Give every process time to import the app before the clock starts
+    start_at = time.time() + 3
+    procs = [ctx.Process(target=writer_process, args=(path, mode, synchronous, threads, seconds, start_at, results))
+             for _ in range(processes)]
+    for p in procs:
+        p.start()
+    stats = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    latencies = sorted(v for s in stats for v in s["latencies"])
+    keys = [k for s in stats for k in s["keys"]]
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT count(*) FROM booking").fetchone()[0]
+        distinct = conn.execute("SELECT count(DISTINCT idempotency_key) FROM booking").fetchone()[0]
+        counted = conn.execute("SELECT coalesce(sum(bookings), 0) FROM booking_stat").fetchone()[0]
+    return {
+        "requests": sum(s["requests"] for s in stats),
+        "failures": sum(s["failures"] for s in stats),
+        "bookings": rows,
+        "bookings_per_second": rows / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        "consistent": rows == distinct == counted == len(set(keys)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="request threads per process")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--synchronous", default="NORMAL", choices=("NORMAL", "FULL"))
+    args = parser.parse_args(argv)
+
+    ok = True
+    for mode in args.modes.split(","):
+        r = run_mode(mode, args.processes, args.threads, args.seconds, args.synchronous)
+        print(f"{mode:<7} {r['bookings_per_second']:>8.1f} bookings/s  {r['requests']:>6} requests  "
+              f"{r['failures']:>5} failures  p50 {r['p50_ms']:7.2f}ms  p99 {r['p99_ms']:8.2f}ms  "
+              f"{'one row per key' if r['consistent'] else 'DUPLICATE OR MISSING ROWS'}")
+        ok = ok and r["consistent"]
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Synthetic catalog generator with a scale factor.
+
+``--scale 1`` builds a production-sized catalog: 500 cities, 20k packages and
+100k each of flights, hotels and activities. Counts scale linearly, so
+``--scale 0.05`` gives a quick 25-city catalog. Output is deterministic for a
+given ``--seed``.
+
+The first ``HUBS`` cities (starting with New Delhi, the default departure
+city) are departure hubs: every city gets onward and return flights from a
+rotation of hubs, several per route. Package destinations are skewed so a
+few cities hold most packages, and ``MISSING_DESTINATION_SHARE`` of packages
+point at destinations with no catalog rows. That exercises the list price
+fallback. Each city's first hotel and a share of flights get seasonal rates
+(a year-end peak and a monsoon discount) for ``SEASON_YEARS``.
+
+Rows are written with Core ``executemany`` inserts on a freshly created
+schema. The catalog version and the price table are then refreshed the way
+any other out-of-ORM writer has to.
+
+    python -m benchmarks.datagen --scale 0.1 [--seed 42] [--database bench.db]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+from catalog import bump_version, insert_day_plan_rules
+from models import db, City, Package, Flight, Hotel, Activity, SeasonalRate
+from price_table import refresh_prices
+
+
+BASE_COUNTS = {
+    "cities": 500,
+    "packages": 20000,
+    "flights": 100000,
+    "hotels": 100000,
+    "activities": 100000,
+}
+HUBS = 12
+MISSING_DESTINATION_SHARE = 0.03
+SEASONAL_FLIGHT_SHARE = 0.3
+SEASON_YEARS = (2026, 2027)
+# (start month, day), (end month, day), price multiplier in percent
+SEASONS = [((12, 20), (12, 31), 160), ((1, 1), (1, 5), 160), ((7, 1), (8, 31), 80)]
+CHUNK_SIZE = 5000
+
+HUB_NAMES = ["New Delhi", "Mumbai", "Bengaluru", "Chennai", "Kolkata", "Hyderabad",
+             "Cochin", "Ahmedabad", "Pune", "Jaipur", "Lucknow", "Goa"]
+SYLLABLES = ["ra", "ma", "na", "pur", "bad", "gar", "kot", "vel", "dha", "shi", "la", "ti",
+             "ko", "van", "sar", "mun", "dal", "ha", "ri", "yan"]
+PACKAGE_TYPES = ["Family", "Honeymoon", "Adventure", "Friends", "Solo"]
+DURATIONS = ["3D/2N", "4D/3N", "4D/3N", "5D/4N", "6D/5N", "7D/6N"]
+ROOM_CATEGORIES = ["STANDARD ROOM", "DELUXE ROOM", "PREMIUM ROOM", "SUITE"]
+MEALS = ["ROOM ONLY", "WITH BREAKFAST", "HALF BOARD"]
+
+
+def counts_for(scale):
+    counts = {name: max(1, round(base * scale)) for name, base in BASE_COUNTS.items()}
+    # Every city needs a pickup and a drop, and at least one flight each way
+    counts["cities"] = max(counts["cities"], 2)
+    for name in ("flights", "hotels", "activities"):
+        counts[name] = max(counts[name], 2 * counts["cities"])
+    return counts
+
+
+def city_names(count, rng):
+    names = HUB_NAMES[:count]
+    seen = set(names)
+    while len(names) < count:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if rng.random() < 0.2:
+            name += " " + "".join(rng.choice(SYLLABLES) for _ in range(2)).capitalize()
+        if name in seen:
+            name = f"{name} {len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _spread(total, buckets):
+    """Split ``total`` items over ``buckets`` as evenly as possible."""
+    return [total // buckets + (1 if i < total % buckets else 0) for i in range(buckets)]
+
+
+def generate_rows(scale=1.0, seed=42):
+    """Build the synthetic catalog as ``{table name: [row dicts]}``."""
+    rng = random.Random(seed)
+    counts = counts_for(scale)
+    names = city_names(counts["cities"], rng)
+    hubs = names[:min(HUBS, len(names))]
+    rows = {"city": [{"id": i + 1, "name": name} for i, name in enumerate(names)]}
+
+    flights = []
+    for city_id, (name, per_city) in enumerate(zip(names, _spread(counts["flights"], len(names))), start=1):
+        others = [h for h in hubs if h != name] or [hubs[0]]
+        for i in range(per_city):
+            hub = others[(i // 2) % len(others)]
+            source, destination = (hub, name) if i % 2 == 0 else (name, hub)
+            hour = rng.randint(5, 22)
+            flights.append({
+                "id": len(flights) + 1,
+                "city_id": city_id,
+                "source_station": source,
+                "destination_station": destination,
+                "price": rng.randrange(2500, 15000, 50),
+                "details": f"{hour:02d}:{rng.choice(('00', '15', '30', '45'))} | 6E-{rng.randint(1000, 9999)}"
+                           " | Cabin: 7kg | Check-in: 15kg",
+            })
+    rows["flight"] = flights
+
+    hotels = []
+    for city_id, (name, per_city) in enumerate(zip(names, _spread(counts["hotels"], len(names))), start=1):
+        for i in range(per_city):
+            hotels.append({
+                "id": len(hotels) + 1,
+                "city_id": city_id,
+                "name": f"{name} {rng.choice(('Grand', 'Residency', 'Inn', 'Resort', 'Palace'))} {i + 1}",
+                "address": f"{rng.randint(1, 400)} Main Road, {name}",
+                "room_category": rng.choice(ROOM_CATEGORIES),
+                "price": rng.randrange(1500, 12000, 100),
+                "meal": rng.choice(MEALS),
+                "details": "",
+            })
+    rows["hotel"] = hotels
+
+    activities = []
+    for city_id, (name, per_city) in enumerate(zip(names, _spread(counts["activities"], len(names))), start=1):
+        for i in range(per_city):
+            kind = "pickup" if i == 0 else "drop" if i == 1 else "tour"
+            base = rng.randrange(500, 6000, 50)
+            activities.append({
+                "id": len(activities) + 1,
+                "city_id": city_id,
+                "name": f"{kind.upper()} {name} {i + 1}" if kind == "tour" else f"{name} AIRPORT {kind.upper()}",
+                "type": kind,
+                "rate_1": base,
+                "rate_2": base * 6 // 10,
+                "rate_3": base * 5 // 10,
+                "rate_4": base * 4 // 10,
+                "price": base * 4 // 10,
+                "details": "",
+            })
+    rows["activity"] = activities
+
+    # Zipf-like skew: popular destinations carry many packages
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    packages = []
+    for i in range(counts["packages"]):
+        if rng.random() < MISSING_DESTINATION_SHARE:
+            destination = f"Unlisted {i % 50}"
+        else:
+            destination = rng.choices(names, weights)[0]
+        kind = rng.choice(PACKAGE_TYPES)
+        packages.append({
+            "id": i + 1,
+            "name": f"{destination} {kind} Special {i + 1}",
+            "destination": destination,
+            "description": "",
+            "price": rng.randrange(8000, 60000, 500),
+            "duration": rng.choice(DURATIONS),
+            "image": f"https://picsum.photos/300/200?{i % 100}",
+            "type": kind,
+        })
+    rows["package"] = packages
+
+    # Drawn last so the rows above stay the same for a given seed
+    seasonal = []
+    first_hotels = {}
+    for hotel in hotels:
+        first_hotels.setdefault(hotel["city_id"], hotel)
+    priced = [("hotel_id", h) for h in first_hotels.values()]
+    priced += [("flight_id", f) for f in flights if rng.random() < SEASONAL_FLIGHT_SHARE]
+    for column, row in priced:
+        for year in SEASON_YEARS:
+            for (start_month, start_day), (end_month, end_day), percent in SEASONS:
+                seasonal.append({
+                    "id": len(seasonal) + 1,
+                    "hotel_id": None,
+                    "flight_id": None,
+                    column: row["id"],
+                    "start_date": date(year, start_month, start_day),
+                    "end_date": date(year, end_month, end_day),
+                    "price": row["price"] * percent // 100,
+                })
+    rows["seasonal_rate"] = seasonal
+    return rows
+
+
+def generate(conn, scale=1.0, seed=42):
+    """Recreate the schema on ``conn`` and load a synthetic catalog into it.
+
+    Returns ``{table name: rows written}``.
+    """
+    rows = generate_rows(scale, seed)
+    db.metadata.drop_all(conn)
+    db.metadata.create_all(conn)
+
+    written = {}
+    for model in (City, Flight, Hotel, Activity, SeasonalRate, Package):
+        table = model.__table__
+        data = rows[table.name]
+        for i in range(0, len(data), CHUNK_SIZE):
+            conn.execute(table.insert(), data[i:i + CHUNK_SIZE])
+        written[table.name] = len(data)
+    written["day_plan_rule"] = insert_day_plan_rules(conn)
+    bump_version(conn)
+    written["package_price"] = refresh_prices(conn, full=True)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="SQLite file to (re)create; defaults to DATABASE_URL")
+    args = parser.parse_args(argv)
+    if args.database:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(args.database)
+
+    from app import create_app
+
+    app = create_app()
+    start = time.perf_counter()
+    with app.app_context():
+        with db.engine.begin() as conn:
+            written = generate(conn, args.scale, args.seed)
+        url = db.engine.url
+    elapsed = time.perf_counter() - start
+    for name, count in written.items():
+        print(f"{name:>14}: {count}")
+    print(f"generated scale {args.scale} into {url.database} in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""In-process load benchmark for the main routes.
+
+Generates a synthetic catalog (see ``benchmarks.datagen``), then drives the app
+through Flask's test client one scenario at a time: listing, JSON listing,
+detail, the hotel APIs, destination suggestions and the booking POST. Each
+scenario reports p50/p95/p99 latency, throughput and SQL statements per
+request. Requests are issued sequentially from one thread, so throughput is
+the single-worker figure.
+
+Results are written as JSON so two commits can be compared:
+
+    python -m benchmarks.harness --scale 0.1 --output before.json
+    git checkout other-branch
+    python -m benchmarks.harness --scale 0.1 --output after.json --compare before.json
+
+``--database PATH --reuse`` keeps a generated catalog between runs (scale 1
+takes about a minute to build).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+SCENARIOS = ("listing", "api_listing", "detail", "hotels", "hotel_options", "hotel_price", "suggest", "booking")
+WARMUP_REQUESTS = 5
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class RequestFactory:
+    """Deterministic stream of request arguments drawn from the catalog."""
+
+    def __init__(self, catalog_rows, seed):
+        self.rng = random.Random(seed)
+        self.package_ids = catalog_rows["package_ids"]
+        self.cities = catalog_rows["cities"]
+        self.hotel_names = catalog_rows["hotels"]
+        self.hubs = catalog_rows["hubs"]
+
+    def _search_args(self):
+        rng = self.rng
+        args = {"persons": rng.randint(1, 6), "from_city": rng.choice(self.hubs)}
+        if rng.random() < 0.5:
+            args["destination"] = rng.choice(self.cities)
+        if rng.random() < 0.3:
+            args["type"] = rng.choice(("Family", "Honeymoon", "Adventure"))
+        return args
+
+    def listing(self):
+        return "GET", "/packages", {"query_string": self._search_args()}
+
+    def api_listing(self):
+        args = self._search_args()
+        args["sort"] = self.rng.choice(("id", "price"))
+        return "GET", "/api/packages", {"query_string": args}
+
+    def detail(self):
+        rng = self.rng
+        args = {"persons": rng.randint(1, 6), "from_city": rng.choice(self.hubs),
+                "flight_option": rng.choice(("with", "without"))}
+        return "GET", f"/package/{rng.choice(self.package_ids)}", {"query_string": args}
+
+    def hotels(self):
+        return "GET", "/api/hotels", {"query_string": {"city": self.rng.choice(self.cities)}}
+
+    def hotel_options(self):
+        return "GET", "/api/hotel_options", {"query_string": {"city": self.rng.choice(self.cities)}}
+
+    def hotel_price(self):
+        city, name = self.rng.choice(self.hotel_names)
+        return "GET", "/api/hotel_price", {"query_string": {"city": city, "name": name}}
+
+    def suggest(self):
+        city = self.rng.choice(self.cities)
+        return "GET", "/api/destinations/suggest", {"query_string": {"q": city[:self.rng.randint(1, 4)]}}
+
+    def booking(self):
+        rng = self.rng
+        persons = rng.randint(1, 6)
+        form = {
+            "name": "Bench User", "email": "bench@example.com", "phone": "9999999999",
+            "travellers": persons, "taxi_type": "Sedan", "room_type": "Deluxe",
+            "hotel_type": "4 Star", "persons": persons,
+        }
+        return "POST", f"/book/{rng.choice(self.package_ids)}", {"data": form}
+
+
+def load_request_data(conn):
+    package_ids = [r[0] for r in conn.execute("SELECT id FROM package")]
+    cities = [r[0] for r in conn.execute("SELECT name FROM city ORDER BY id")]
+    hotels = list(conn.execute("SELECT city.name, hotel.name FROM hotel JOIN city ON city.id = hotel.city_id"))
+    if not package_ids or not cities or not hotels:
+        raise SystemExit("catalog is empty; generate one with --scale or drop --reuse")
+    hubs = [r[0] for r in conn.execute(
+        "SELECT source_station FROM flight GROUP BY source_station ORDER BY count(*) DESC LIMIT 12")]
+    return {"package_ids": package_ids, "cities": cities, "hotels": hotels, "hubs": hubs or cities[:1]}
+
+
+def run_scenario(client, factory, name, num_requests):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    make_request = getattr(factory, name)
+    statements = [0]
+
+    def _count(*args):
+        statements[0] += 1
+
+    for _ in range(WARMUP_REQUESTS):
+        method, path, kwargs = make_request()
+        client.open(path, method=method, **kwargs)
+
+    latencies, queries, errors = [], [], 0
+    # Every engine: reads may go through the read-only pool
+    event.listen(Engine, "before_cursor_execute", _count)
+    try:
+        started = time.perf_counter()
+        for _ in range(num_requests):
+            method, path, kwargs = make_request()
+            statements[0] = 0
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+            queries.append(statements[0])
+            if response.status_code >= 400:
+                errors += 1
+        wall = time.perf_counter() - started
+    finally:
+        event.remove(Engine, "before_cursor_execute", _count)
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": num_requests,
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "max_ms": round(ms[-1], 3),
+        "throughput_rps": round(num_requests / wall, 1),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+    }
+
+
+def _git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def compare(current, baseline):
+    """Print per-scenario changes against a previous results file."""
+    print(f"\ncompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    print(f"{'scenario':<14} {'p50 ms':>18} {'p95 ms':>18} {'queries':>14}")
+    for name, result in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms"):
+            change = (result[key] / old[key] - 1) * 100 if old[key] else 0.0
+            cells.append(f"{old[key]:.2f}->{result[key]:.2f} {change:+.0f}%".rjust(18))
+        cells.append(f"{old['queries_mean']:g}->{result['queries_mean']:g}".rjust(14))
+        print(f"{name:<14} " + " ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=float, default=0.1, help="catalog scale factor (1 = production size)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--database", help="SQLite file to use (default: a temporary file)")
+    parser.add_argument("--reuse", action="store_true", help="benchmark the existing --database as is")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.reuse and not args.database:
+        parser.error("--reuse needs --database")
+    path = os.path.abspath(args.database or os.path.join(tempfile.mkdtemp(prefix="holiday-bench-"), "bench.db"))
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+
+    from app import create_app
+    from models import db
+    from benchmarks.datagen import generate
+
+    app = create_app()
+    with app.app_context():
+        if not args.reuse:
+            start = time.perf_counter()
+            with db.engine.begin() as conn:
+                generate(conn, args.scale, args.seed)
+            print(f"generated scale {args.scale} catalog in {time.perf_counter() - start:.1f}s")
+        with sqlite3.connect(path) as conn:
+            request_data = load_request_data(conn)
+            table_counts = {t: conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0]
+                            for t in ("city", "package", "flight", "hotel", "activity", "package_price")}
+
+    client = app.test_client()
+    factory = RequestFactory(request_data, args.seed)
+    results = {}
+    for name in scenarios:
+        with app.app_context():
+            results[name] = run_scenario(client, factory, name, args.requests)
+        r = results[name]
+        print(f"{name:<14} p50 {r['p50_ms']:>8.2f}ms  p95 {r['p95_ms']:>8.2f}ms  p99 {r['p99_ms']:>8.2f}ms  "
+              f"{r['throughput_rps']:>8.1f} req/s  {r['queries_mean']:>6g} queries  {r['errors']} errors")
+
+    commit, dirty = _git_revision()
+    output = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "scale": None if args.reuse else args.scale,
+            "seed": args.seed,
+            "requests_per_scenario": args.requests,
+            "tables": table_counts,
+        },
+        "scenarios": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+    return 1 if any(r["errors"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Check that the /packages listing issues a fixed number of SQL queries.
+
+Builds throwaway SQLite catalogs of growing size, renders the listing for each
+and fails if the statement count changes with the number of packages.
+tests/test_listing_queries.py runs the same check under pytest.
+
+    python -m benchmarks.listing_queries
+"""
+import os
+import sys
+import tempfile
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import db, City, Package, Flight, Hotel, Activity
+
+
+def build_catalog(num_packages, num_cities=20):
+    db.drop_all()
+    db.create_all()
+    cities = [City(name=f"City {i}") for i in range(num_cities)]
+    db.session.add_all(cities)
+    db.session.flush()
+    for city in cities:
+        db.session.add_all([
+            Flight(city_id=city.id, source_station="New Delhi", destination_station=city.name, price=5000),
+            Flight(city_id=city.id, source_station=city.name, destination_station="New Delhi", price=5200),
+            Hotel(city_id=city.id, name=f"{city.name} Inn", price=3000),
+            Activity(city_id=city.id, name="PICK UP", type="pickup", rate_1=1000, rate_2=600, price=1000),
+            Activity(city_id=city.id, name="DROP", type="drop", rate_1=1000, rate_2=600, price=1000),
+            Activity(city_id=city.id, name="TOUR", type="tour", rate_1=500, price=500),
+        ])
+    db.session.add_all([
+        Package(name=f"Package {i}", destination=cities[i % num_cities].name, price=10000,
+                duration=f"{4 + i % 3}D/{3 + i % 3}N", type="Family")
+        for i in range(num_packages)
+    ])
+    db.session.commit()
+
+
+def count_listing_queries(client):
+    # Warm up first so the count covers steady state, not the catalog snapshot rebuild
+    client.get("/packages?persons=2")
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # Every engine: the listing reads through the read-only pool
+    event.listen(Engine, "before_cursor_execute", _record)
+    try:
+        response = client.get("/packages?persons=2")
+    finally:
+        event.remove(Engine, "before_cursor_execute", _record)
+    assert response.status_code == 200, response.status_code
+    return len(statements)
+
+
+def main():
+    tmpdir = tempfile.mkdtemp(prefix="holiday-bench-")
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tmpdir, "bench.db"))
+    from app import create_app
+
+    # The page cache would answer the measured request without any SQL
+    app = create_app({"PAGE_CACHE": False})
+    client = app.test_client()
+    counts = {}
+    with app.app_context():
+        for size in (10, 100, 1000):
+            build_catalog(size)
+            counts[size] = count_listing_queries(client)
+            print(f"{size:>5} packages: {counts[size]} queries")
+    if len(set(counts.values())) != 1:
+        print("FAIL: query count grows with the number of packages")
+        return 1
+    print("OK: query count is constant")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
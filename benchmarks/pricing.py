@@ -0,0 +1,68 @@
+"""Micro-benchmark for the pricing engine: itineraries priced per second.
+
+Runs entirely on plain in-memory rows, with no Flask app or database.
+
+    python -m benchmarks.pricing [--flights 200] [--hotels 30] [--activities 40] [--seconds 2]
+"""
+import argparse
+import time
+from collections import namedtuple
+
+import pricing
+
+
+FlightRow = namedtuple("FlightRow", "id source_station destination_station price")
+HotelRow = namedtuple("HotelRow", "id name price")
+ActivityRow = namedtuple("ActivityRow", "id name type rate_1 rate_2 rate_3 rate_4 price")
+
+
+def make_city(destination, num_flights, num_hotels, num_activities):
+    flights = []
+    for i in range(num_flights):
+        other = f"Station {i // 2}"
+        if i % 2:
+            flights.append(FlightRow(i, destination, other, 5000 + i))
+        else:
+            flights.append(FlightRow(i, other, destination, 5000 + i))
+    # The route the benchmark asks for sits at the end, the worst case for a scan
+    flights.append(FlightRow(num_flights, "New Delhi", destination, 6500))
+    flights.append(FlightRow(num_flights + 1, destination, "New Delhi", 6500))
+    hotels = [HotelRow(i, f"Hotel {i}", 3000 + i) for i in range(num_hotels)]
+    activities = [ActivityRow(0, "PICK UP", "pickup", 2000, 1000, 700, 600, 2000),
+                  ActivityRow(1, "DROP", "drop", 2000, 1000, 700, 600, 2000)]
+    activities += [ActivityRow(i + 2, f"TOUR {i}", "tour", 500, 500, 450, 400, 500)
+                   for i in range(num_activities - 2)]
+    return flights, hotels, activities
+
+
+def run(num_flights, num_hotels, num_activities, seconds):
+    destination = "Bench City"
+    flights, hotels, activities = make_city(destination, num_flights, num_hotels, num_activities)
+    routes = pricing.route_map(flights)  # built once per snapshot in the app
+    durations = ["3D/2N", "4D/3N", "5D/4N", "6D/5N", "8D/7N"]
+    count = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for i in range(1000):
+            pricing.build_itinerary(destination, durations[i % 5], flights, hotels, activities,
+                                    "New Delhi", i % 6 + 1, routes)
+        count += 1000
+    elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=200)
+    parser.add_argument("--hotels", type=int, default=30)
+    parser.add_argument("--activities", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    rate = run(args.flights, args.hotels, args.activities, args.seconds)
+    print(f"flights={args.flights} hotels={args.hotels} activities={args.activities}: "
+          f"{rate:,.0f} itineraries/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: per-object pricing loop vs array-backed rate vectors.
+
+Prices a listing of ``--packages`` packages spread over ``--cities`` cities
+for group sizes 1..``--max-persons``, once with ``build_itinerary`` per
+package and group size and once with a single ``price_grids`` call, and checks
+both give the same totals. Runs on plain in-memory rows, like
+benchmarks/pricing.py.
+
+    python -m benchmarks.rates [--packages 1000] [--cities 20] [--activities 40] [--max-persons 10] [--repeat 5]
+"""
+import argparse
+import time
+
+import pricing
+from benchmarks.pricing import make_city
+
+
+DURATIONS = ["3D/2N", "4D/3N", "5D/4N", "6D/5N", "8D/7N"]
+
+
+def make_listing(num_packages, num_cities, num_activities):
+    cities = []
+    for c in range(num_cities):
+        destination = f"City {c}"
+        flights, hotels, activities = make_city(destination, 40, 10, num_activities)
+        cities.append((destination, hotels, activities, pricing.route_map(flights), pricing.RateTable(activities)))
+    packages = [cities[i % num_cities][:1] + (DURATIONS[i % len(DURATIONS)],) + cities[i % num_cities][1:]
+                for i in range(num_packages)]
+    return packages
+
+
+def loop_prices(packages, persons):
+    return [[pricing.build_itinerary(destination, duration, (), hotels, activities, "New Delhi", p, routes).with_flight
+             for p in persons]
+            for destination, duration, hotels, activities, routes, _ in packages]
+
+
+def grid_prices(packages, persons):
+    items = [pricing.GridItem(destination, duration, hotels, activities, routes, rates, "New Delhi")
+             for destination, duration, hotels, activities, routes, rates in packages]
+    return pricing.price_grids(items, persons)[0].tolist()
+
+
+def best_of(repeat, function, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packages", type=int, default=1000)
+    parser.add_argument("--cities", type=int, default=20)
+    parser.add_argument("--activities", type=int, default=40)
+    parser.add_argument("--max-persons", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    packages = make_listing(args.packages, args.cities, args.activities)
+    one, table = [2], list(range(1, args.max_persons + 1))
+    print(f"{args.packages} packages, {args.cities} cities, {args.activities} activities per city")
+    for label, persons in (("1 group size", one), (f"1-{args.max_persons} travellers", table)):
+        loop_time, expected = best_of(args.repeat, loop_prices, packages, persons)
+        grid_time, actual = best_of(args.repeat, grid_prices, packages, persons)
+        status = "same totals" if actual == expected else "TOTALS DIFFER"
+        print(f"{label:>18}: loop {loop_time * 1000:8.2f}ms  vectorized {grid_time * 1000:8.2f}ms  "
+              f"{loop_time / grid_time:6.1f}x  {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Flight route lookup benchmark on a catalog with many flights.
+
+Compares the old linear ``next(...)`` scan (lower-casing both stations per
+comparison) with the ``pricing.route_map`` lookup, and times the same route
+query in SQLite with and without ``ix_flight_route``.
+
+    python -m benchmarks.routes [--flights 50000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import pricing
+from benchmarks.pricing import FlightRow
+
+
+def scan_flight(flights, source, destination):
+    return next((f for f in flights if f.source_station and f.destination_station
+                 and f.source_station.lower() == source.lower()
+                 and f.destination_station.lower() == destination.lower()), None)
+
+
+def make_flights(num_flights, num_stations=500):
+    rng = random.Random(42)
+    stations = [f"Station {i}" for i in range(num_stations)]
+    flights = []
+    for i in range(num_flights):
+        source, destination = rng.sample(stations, 2)
+        flights.append(FlightRow(i, source, destination, rng.randint(2000, 15000)))
+    return flights
+
+
+def time_lookups(fn, queries):
+    start = time.perf_counter()
+    for source, destination in queries:
+        fn(source, destination)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def time_sql(flights, queries, with_index):
+    path = os.path.join(tempfile.mkdtemp(prefix="holiday-bench-"), "routes.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE flight (id INTEGER PRIMARY KEY, city_id INTEGER, source_station TEXT, "
+                 "destination_station TEXT, price INTEGER, "
+                 "source_key TEXT GENERATED ALWAYS AS (lower(source_station)) VIRTUAL, "
+                 "destination_key TEXT GENERATED ALWAYS AS (lower(destination_station)) VIRTUAL)")
+    conn.executemany("INSERT INTO flight (id, city_id, source_station, destination_station, price) "
+                     "VALUES (?, 1, ?, ?, ?)", flights)
+    if with_index:
+        conn.execute("CREATE INDEX ix_flight_route ON flight (city_id, source_key, destination_key)")
+    conn.commit()
+    sql = "SELECT price FROM flight WHERE city_id = 1 AND source_key = ? AND destination_key = ? LIMIT 1"
+    result = time_lookups(lambda s, d: conn.execute(sql, (s.lower(), d.lower())).fetchone(), queries)
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    flights = make_flights(args.flights)
+    rng = random.Random(7)
+    queries = [(f.source_station.upper(), f.destination_station) for f in rng.choices(flights, k=args.lookups)]
+    # The scan is slow enough that a tenth of the lookups gives a stable number
+    scan_queries = queries[:max(1, args.lookups // 10)]
+
+    start = time.perf_counter()
+    routes = pricing.route_map(flights)
+    build = time.perf_counter() - start
+
+    scan = time_lookups(lambda s, d: scan_flight(flights, s, d), scan_queries)
+    mapped = time_lookups(lambda s, d: pricing.find_flight(routes, s, d), queries)
+    sql_plain = time_sql(flights, scan_queries, with_index=False)
+    sql_indexed = time_sql(flights, queries, with_index=True)
+
+    print(f"{args.flights} flights, {len(routes)} distinct routes (route map built in {build * 1000:.1f} ms)")
+    print(f"  linear scan       {scan * 1e6:10.1f} us/lookup")
+    print(f"  route map         {mapped * 1e6:10.1f} us/lookup  ({scan / mapped:,.0f}x)")
+    print(f"  SQL, no index     {sql_plain * 1e6:10.1f} us/lookup")
+    print(f"  SQL, route index  {sql_indexed * 1e6:10.1f} us/lookup  ({sql_plain / sql_indexed:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Worker startup benchmark: import time and time to first request.
+
+Each run is a fresh interpreter, like a newly started worker. It reports the
+time to import ``app``, to build the application, and then the latency of the
+first request to each of a few routes, which is where a cold worker loads the
+catalog, compiles templates and fills its caches.
+
+``--preload`` first runs ``app.warm_up``, as the gunicorn master does before
+forking under ``preload_app`` (see gunicorn.conf.py), so the first requests
+measure what a forked worker sees. Runs against a database generated with
+``benchmarks.datagen`` (``--database PATH``, generated on first use).
+
+    python -m benchmarks.startup --database /tmp/startup.db [--scale 0.05] [--runs 5] [--preload]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+
+
+ROUTES = ("/", "/packages?persons=2", "/package/{package_id}?persons=2", "/api/packages?limit=20")
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app() if hasattr(module, "create_app") else module.app
+created = time.perf_counter()
+if {preload!r}:
+    module.warm_up(application)
+warmed = time.perf_counter()
+client = application.test_client()
+first = {{}}
+for route in {routes!r}:
+    t = time.perf_counter()
+    status = client.get(route).status_code
+    first[route] = (time.perf_counter() - t, status)
+print(json.dumps({{"import": imported - start, "create": created - imported, "warm": warmed - created,
+                  "first": first}}))
+"""
+
+
+def ensure_database(path, scale, seed):
+    if os.path.exists(path):
+        return
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    from app import create_app
+    from benchmarks.datagen import generate
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as conn:
+            generate(conn, scale, seed)
+        db.engine.dispose()
+
+
+def run_once(path, preload, routes):
+    code = CHILD.format(preload=preload, routes=routes)
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + path)
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if result.returncode:
+        raise SystemExit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--scale", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preload", action="store_true", help="warm up before the first request")
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(args.database)
+    ensure_database(path, args.scale, args.seed)
+    with sqlite3.connect(path) as conn:
+        package_id = conn.execute("SELECT min(id) FROM package").fetchone()[0]
+    routes = [r.format(package_id=package_id) for r in ROUTES]
+
+    runs = [run_once(path, args.preload, routes) for _ in range(args.runs)]
+
+    def median_ms(values):
+        return statistics.median(values) * 1000
+
+    print(f"import    {median_ms([r['import'] for r in runs]):8.1f}ms")
+    print(f"create    {median_ms([r['create'] for r in runs]):8.1f}ms")
+    if args.preload:
+        print(f"warm-up   {median_ms([r['warm'] for r in runs]):8.1f}ms  (in the master, before fork)")
+    total = 0
+    for route in routes:
+        ms = median_ms([r["first"][route][0] for r in runs])
+        total += ms
+        print(f"first {route:<32} {ms:8.1f}ms")
+    print(f"first requests total {total:8.1f}ms  (median of {args.runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
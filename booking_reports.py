@@ -0,0 +1,157 @@
+"""Booking export and aggregate counts for operations.
+
+``GET /admin/bookings/export`` streams bookings as CSV (default) or NDJSON
+(``format=ndjson``), ordered by id. Rows come from one query whose result is
+read ``BOOKING_EXPORT_CHUNK`` rows at a time and written out chunk by chunk,
+so memory stays flat however many rows match. The export runs in a single
+read transaction, so it is a consistent snapshot even while bookings keep
+arriving. Filters:
+
+    package_id      one package
+    status          e.g. CONFIRMED
+    min_id, max_id  inclusive id range; resume an interrupted export with
+                    min_id = last id received + 1
+
+``GET /admin/bookings/stats`` reads the ``booking_stat`` table that
+bookings.py maintains, grouped by ``package``, ``day`` or both (``group``),
+with filters ``package_id``, ``status``, ``start`` and ``end`` (YYYY-MM-DD,
+inclusive).
+
+    BOOKING_EXPORT_CHUNK   rows per chunk, default 1000
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import func, select
+
+from models import Booking, BookingStat
+
+
+DEFAULT_CHUNK = 1000
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# Everything but the idempotency key, which is internal
+EXPORT_COLUMNS = ("id", "package_id", "status", "created_at", "name", "email", "phone", "travellers",
+                  "persons", "taxi_type", "room_type", "hotel_type")
+GROUPS = {
+    "package": ("package_id",),
+    "day": ("day",),
+    "both": ("package_id", "day"),
+}
+
+ExportFilters = namedtuple("ExportFilters", "package_id status min_id max_id")
+StatsFilters = namedtuple("StatsFilters", "package_id status start end group")
+
+
+class ReportError(ValueError):
+    pass
+
+
+def _int_arg(args, name):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ReportError(f"{name} must be a whole number") from None
+
+
+def _day_arg(args, name):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ReportError(f"{name} must be YYYY-MM-DD") from None
+
+
+def parse_export(args):
+    """``(ExportFilters, format)`` from query arguments; raises ``ReportError``."""
+    fmt = args.get("format") or "csv"
+    if fmt not in FORMATS:
+        raise ReportError(f"format must be one of {', '.join(FORMATS)}")
+    filters = ExportFilters(_int_arg(args, "package_id"), args.get("status") or None,
+                            _int_arg(args, "min_id"), _int_arg(args, "max_id"))
+    return filters, fmt
+
+
+def parse_stats(args):
+    group = args.get("group") or "both"
+    if group not in GROUPS:
+        raise ReportError(f"group must be one of {', '.join(GROUPS)}")
+    return StatsFilters(_int_arg(args, "package_id"), args.get("status") or None,
+                        _day_arg(args, "start"), _day_arg(args, "end"), group)
+
+
+def export_query(filters):
+    table = Booking.__table__
+    query = select(*(table.c[name] for name in EXPORT_COLUMNS)).order_by(table.c.id)
+    if filters.package_id is not None:
+        query = query.where(table.c.package_id == filters.package_id)
+    if filters.status is not None:
+        query = query.where(table.c.status == filters.status)
+    if filters.min_id is not None:
+        query = query.where(table.c.id >= filters.min_id)
+    if filters.max_id is not None:
+        query = query.where(table.c.id <= filters.max_id)
+    return query
+
+
+def export_chunks(engine, filters, chunk=DEFAULT_CHUNK):
+    """Lists of up to ``chunk`` rows, read lazily from one cursor on ``engine``."""
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=chunk).execute(export_query(filters))
+        for rows in result.partitions():
+            yield rows
+
+
+def _record(row):
+    record = row._asdict()
+    if record["created_at"] is not None:
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+def as_csv(chunks):
+    yield ",".join(EXPORT_COLUMNS) + "\r\n"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for rows in chunks:
+        writer.writerows(_record(row).values() for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def as_ndjson(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(_record(row)) + "\n" for row in rows)
+
+
+def export(engine, filters, fmt, chunk=DEFAULT_CHUNK):
+    """Encoded export chunks and their mimetype."""
+    encode = as_csv if fmt == "csv" else as_ndjson
+    return encode(export_chunks(engine, filters, chunk)), FORMATS[fmt]
+
+
+def booking_stats(conn, filters):
+    """Totals from ``booking_stat`` per ``filters.group``, e.g. ``{"package_id", "day", "bookings", ...}``."""
+    stat = BookingStat.__table__
+    keys = [stat.c[name] for name in GROUPS[filters.group]]
+    query = (select(*keys, func.sum(stat.c.bookings).label("bookings"),
+                    func.sum(stat.c.travellers).label("travellers"),
+                    func.sum(stat.c.persons).label("persons"))
+             .group_by(*keys).order_by(*keys))
+    if filters.package_id is not None:
+        query = query.where(stat.c.package_id == filters.package_id)
+    if filters.status is not None:
+        query = query.where(stat.c.status == filters.status)
+    if filters.start is not None:
+        query = query.where(stat.c.day >= filters.start)
+    if filters.end is not None:
+        query = query.where(stat.c.day <= filters.end)
+    return [row._asdict() for row in conn.execute(query)]
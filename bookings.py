@@ -0,0 +1,280 @@
+"""Booking write path: validation, idempotency keys and group commit.
+
+``place_booking`` hands a validated booking to the app's ``BookingWriter``,
+created by ``init_app`` from the config below. A background thread writes everything that queued up while
+its previous commit ran (up to ``BOOKING_MAX_BATCH``) in one
+``BEGIN IMMEDIATE`` transaction, so concurrent requests in a worker share one
+commit and one fsync. ``BOOKING_COMMIT_WINDOW`` (seconds, default 0) makes it
+also wait that long for more bookings. Each booking gets its own savepoint, so
+one that fails (say, a constraint violation) fails only its own request and
+the rest of the batch still commits. Across worker processes, WAL plus
+``busy_timeout`` (see database.py) make writers queue for the lock instead of
+failing.
+
+An idempotency key, from the form's hidden ``idempotency_key`` field or an
+``Idempotency-Key`` header, makes retries free: a key that was already written
+returns the existing booking instead of inserting a duplicate.
+
+``BOOKING_GROUP_COMMIT = False`` writes each booking in its own transaction
+on the request thread, with the same validation and idempotency handling.
+
+Every write also adds its new bookings to ``booking_stat`` (counts per
+package, day and status) in the same transaction, so reports read a few
+pre-aggregated rows instead of scanning ``booking``. ``flask --app app
+bookings rebuild-stats`` recomputes the table from scratch.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Booking, BookingStat
+
+
+TEXT_FIELDS = ("name", "email", "phone", "taxi_type", "room_type", "hotel_type")
+NUMBER_FIELDS = ("travellers", "persons")
+MAX_KEY_LENGTH = 64
+DEFAULT_COMMIT_WINDOW = 0.0
+DEFAULT_MAX_BATCH = 100
+WRITE_TIMEOUT = 30
+
+
+class BookingError(ValueError):
+    pass
+
+
+def parse_booking(form, package_id):
+    """Booking column values from a submitted form; raises ``BookingError``."""
+    values = {"package_id": package_id}
+    for field in TEXT_FIELDS:
+        value = (form.get(field) or "").strip()
+        if not value:
+            raise BookingError(f"{field.replace('_', ' ').capitalize()} is required.")
+        values[field] = value[:Booking.__table__.c[field].type.length]
+    for field in NUMBER_FIELDS:
+        try:
+            number = int(form.get(field, ""))
+        except ValueError:
+            raise BookingError(f"{field.capitalize()} must be a whole number.") from None
+        if number < 1:
+            raise BookingError(f"{field.capitalize()} must be at least 1.")
+        values[field] = number
+    return values
+
+
+def idempotency_key(request):
+    key = (request.headers.get("Idempotency-Key") or request.form.get("idempotency_key") or "").strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise BookingError("Idempotency key is too long.")
+    return key or None
+
+
+def write_bookings(conn, items):
+    """Insert ``(values, key)`` items in one transaction on ``conn``.
+
+    Returns ``(booking id, created)`` per item; an item whose key already
+    exists gets the id of the earlier booking and ``created = False``. Each
+    item is written under a savepoint: one whose insert fails is rolled back
+    alone and gets its exception in place of a result.
+    """
+    table = Booking.__table__
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Take the write lock up front: a deferred transaction that reads first
+    # can't wait for the lock under WAL, it fails with SQLITE_BUSY instead
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        results, created = [], []
+        for values, key in items:
+            values = {"status": "CONFIRMED", **values, "idempotency_key": key, "created_at": created_at}
+            statement = (insert(table).values(**values)
+                         .on_conflict_do_nothing(index_elements=["idempotency_key"])
+                         .returning(table.c.id))
+            try:
+                with conn.begin_nested():
+                    booking_id = conn.execute(statement).scalar()
+            except SQLAlchemyError as e:
+                results.append(e)
+                continue
+            if booking_id is None:
+                booking_id = conn.execute(select(table.c.id).where(table.c.idempotency_key == key)).scalar()
+                results.append((booking_id, False))
+            else:
+                results.append((booking_id, True))
+                created.append(values)
+        add_stats(conn, created)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return results
+
+
+def add_stats(conn, created):
+    """Add newly inserted bookings (their column values) to ``booking_stat``."""
+    totals = {}
+    for values in created:
+        day = values["created_at"].date().isoformat() if values.get("created_at") else ""
+        total = totals.setdefault((values["package_id"], day, values["status"]), [0, 0, 0])
+        total[0] += 1
+        total[1] += values.get("travellers") or 0
+        total[2] += values.get("persons") or 0
+    if not totals:
+        return
+    stat = BookingStat.__table__
+    statement = insert(stat)
+    statement = statement.on_conflict_do_update(
+        index_elements=[stat.c.package_id, stat.c.day, stat.c.status],
+        set_={c: stat.c[c] + statement.excluded[c] for c in ("bookings", "travellers", "persons")})
+    conn.execute(statement, [
+        {"package_id": package_id, "day": day, "status": status,
+         "bookings": bookings, "travellers": travellers, "persons": persons}
+        for (package_id, day, status), (bookings, travellers, persons) in totals.items()
+    ])
+
+
+def stats_query():
+    """``booking_stat`` rows aggregated from ``booking`` with one scan."""
+    table = Booking.__table__
+    day = func.coalesce(func.substr(table.c.created_at, 1, 10), "")
+    status = func.coalesce(table.c.status, "")
+    return (select(table.c.package_id, day.label("day"), status.label("status"),
+                   func.count().label("bookings"),
+                   func.coalesce(func.sum(table.c.travellers), 0).label("travellers"),
+                   func.coalesce(func.sum(table.c.persons), 0).label("persons"))
+            .where(table.c.package_id.is_not(None))
+            .group_by(table.c.package_id, day, status))
+
+
+def rebuild_stats(conn):
+    """Recompute every ``booking_stat`` row on ``conn``; returns rows written."""
+    stat = BookingStat.__table__
+    conn.execute(delete(stat))
+    query = stats_query()
+    conn.execute(insert(stat).from_select([c.name for c in query.selected_columns], query))
+    return conn.execute(select(func.count()).select_from(stat)).scalar()
+
+
+class BookingWriter:
+    """Background thread that coalesces bookings into group commits."""
+
+    def __init__(self, window=DEFAULT_COMMIT_WINDOW, max_batch=DEFAULT_MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.bookings = 0
+        self.duplicates = 0
+        self.largest_batch = 0
+        self.errors = 0
+
+    def submit(self, engine, values, key=None):
+        """Queue one booking; the ``Future`` resolves to ``(booking id, created)``."""
+        self._ensure_running()
+        future = Future()
+        self._queue.put((engine, values, key, future))
+        return future
+
+    def _ensure_running(self):
+        # Threads don't survive fork: a preloading gunicorn master may have
+        # started one before forking the worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="booking-writer", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            by_engine = {}
+            for item in batch:
+                by_engine.setdefault(item[0], []).append(item)
+            for engine, items in by_engine.items():
+                self._write(engine, items)
+
+    def _write(self, engine, items):
+        try:
+            with engine.connect() as conn:
+                results = write_bookings(conn, [(values, key) for _, values, key, _ in items])
+        except Exception as e:
+            self.errors += len(items)
+            for *_, future in items:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(items))
+        for (*_, future), result in zip(items, results):
+            if isinstance(result, Exception):
+                self.errors += 1
+                future.set_exception(result)
+                continue
+            self.bookings += 1
+            self.duplicates += not result[1]
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "bookings": self.bookings,
+            "duplicates": self.duplicates,
+            "largest_batch": self.largest_batch,
+            "errors": self.errors,
+            "mean_batch": round(self.bookings / self.batches, 2) if self.batches else 0,
+        }
+
+
+def init_app(app):
+    """Give ``app`` its ``BookingWriter``, configured from ``app.config``."""
+    app.extensions["booking_writer"] = BookingWriter(
+        app.config.get("BOOKING_COMMIT_WINDOW", DEFAULT_COMMIT_WINDOW),
+        app.config.get("BOOKING_MAX_BATCH", DEFAULT_MAX_BATCH))
+
+
+def place_booking(values, key=None):
+    """Write one booking and return ``(booking id, created)``."""
+    engine = db.engine
+    if not current_app.config.get("BOOKING_GROUP_COMMIT", True):
+        with engine.connect() as conn:
+            result = write_bookings(conn, [(values, key)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return current_app.extensions["booking_writer"].submit(engine, values, key).result(WRITE_TIMEOUT)
+
+
+# ---------------- CLI ---------------- #
+cli = AppGroup("bookings", help="Maintain booking reports.")
+
+
+@cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recompute the booking_stat table from the booking table."""
+    count = rebuild_stats(db.session.connection())
+    db.session.commit()
+    click.echo(f"{count} booking stat rows written")
@@ -0,0 +1,346 @@
+"""Versioned, immutable in-memory snapshot of the travel catalog.
+
+City, Flight, Hotel, Activity, SeasonalRate and DayPlanRule rows change a few times a day
+but are read on every listing, detail and hotel API request. ``catalog.current()`` serves them
+from an immutable snapshot indexed by city id and city name, together with the
+destination autocomplete index built from the packages. Each city's day-plan
+rules are compiled into ``pricing.DayPlan``s when the snapshot loads, one per
+trip length its packages use, so requests only index into them.
+
+Every write to those tables, or to Package, bumps the single-row ``catalog_version`` counter in
+the same transaction: ORM flushes and bulk ``Query.update()``/``delete()`` are
+caught by session events, and anything that bypasses the ORM (``bulk_save_objects``,
+raw SQL) should call ``bump_version`` itself. The writing process rebuilds its
+snapshot on the next read after commit; other processes notice the new version
+within ``CATALOG_VERSION_TTL`` seconds. A snapshot is loaded inside one read
+transaction and swapped in as a whole, so readers never see half-updated prices.
+
+Writers that know which cities they changed (rate_updates.py) send
+``rates_changed`` after committing. The snapshot then reloads just those
+cities, provided it was current right before the write; otherwise it falls
+back to a full rebuild.
+"""
+import threading
+import time
+from collections import namedtuple
+from itertools import chain
+from types import MappingProxyType
+
+from blinker import Namespace
+from flask import current_app
+from sqlalchemy import event, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+import pricing
+from models import db, City, Package, Flight, Hotel, Activity, SeasonalRate, DayPlanRule, CatalogVersion
+from search import DestinationIndex
+
+
+CATALOG_MODELS = (City, Package, Flight, Hotel, Activity, SeasonalRate, DayPlanRule)
+DEFAULT_VERSION_TTL = 1.0
+
+# Day-plan rules a new day_plan_rule table starts with:
+# {(city name, num_days): {day: (activity names)}}
+DEFAULT_DAY_PLAN_RULES = {
+    ("Goa", 4): {
+        2: ("NORTH GOA TOUR SIC",),
+        3: ("SOUTH GOA TOUR SIC", "BOAT CRUISE RIDE", "SCUBA DIVING+WATERSPORTS"),
+    },
+}
+
+_signals = Namespace()
+# Sent after a commit that changed rates, with ``city_ids``, and the catalog
+# ``previous_version`` and ``version`` around the write
+rates_changed = _signals.signal("rates-changed")
+
+
+def _row_type(model):
+    return namedtuple(model.__name__ + "Row", [c.key for c in model.__table__.columns])
+
+
+CityRow = _row_type(City)
+FlightRow = _row_type(Flight)
+HotelRow = _row_type(Hotel)
+ActivityRow = _row_type(Activity)
+SeasonalRateRow = _row_type(SeasonalRate)
+
+# Everything the pricing engine needs for one destination; ``routes`` is the
+# prebuilt ``pricing.route_map`` of ``flights``, ``rates`` the
+# ``pricing.RateTable`` of ``activities`` (with the city's day-plan
+# templates) and ``seasons`` maps
+# ``("hotel" | "flight", row id)`` to its seasonal rates by start date
+CityCatalog = namedtuple("CityCatalog", "city flights hotels activities routes rates seasons")
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog at one ``version``."""
+
+    def __init__(self, version, entries, destinations):
+        self.version = version
+        self.by_id = MappingProxyType({e.city.id: e for e in entries})
+        self.by_name = MappingProxyType({e.city.name: e for e in entries})
+        self.destinations = destinations
+
+    def city(self, name):
+        """``CityCatalog`` for a city name, or None."""
+        return self.by_name.get(name)
+
+    def hotel(self, city_name, hotel_name):
+        entry = self.by_name.get(city_name)
+        if entry is None:
+            return None
+        return next((h for h in entry.hotels if h.name == hotel_name), None)
+
+
+def read_version(conn):
+    return conn.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+
+def bump_version(conn):
+    """Increment the catalog version on ``conn``, inside the caller's transaction."""
+    result = conn.execute(update(CatalogVersion).where(CatalogVersion.id == 1)
+                          .values(version=CatalogVersion.version + 1))
+    if result.rowcount == 0:
+        conn.execute(insert(CatalogVersion).values(id=1, version=_initial_version()))
+
+
+def _initial_version():
+    # Start from a clock value so a dropped and recreated catalog (seed.py)
+    # never reuses a version an already running process has cached.
+    return int(time.time() * 1000)
+
+
+@event.listens_for(CatalogVersion.__table__, "after_create")
+def _seed_version(table, conn, **kw):
+    conn.execute(insert(table).values(id=1, version=_initial_version()))
+
+
+def insert_day_plan_rules(conn, rules=DEFAULT_DAY_PLAN_RULES):
+    """Insert ``rules`` for the cities among them that exist; returns rows written."""
+    cities = dict(conn.execute(select(City.name, City.id).where(City.name.in_({c for c, _ in rules}))).all())
+    rows = [{"city_id": cities[city], "num_days": num_days, "day": day, "position": position,
+             "activity_name": name}
+            for (city, num_days), days in rules.items() if city in cities
+            for day, names in days.items()
+            for position, name in enumerate(names)]
+    if rows:
+        conn.execute(insert(DayPlanRule), rows)
+    return len(rows)
+
+
+@event.listens_for(DayPlanRule.__table__, "after_create")
+def _seed_day_plan_rules(table, conn, **kw):
+    # Existing databases get the rules that used to be built in; new ones
+    # have no cities yet and add their own (seed.py)
+    insert_day_plan_rules(conn)
+
+
+def load_city_entries(conn, city_ids=None):
+    """Read ``CityCatalog`` entries on ``conn``, optionally limited to some cities."""
+    rows = {}
+    for model, row_type in ((City, CityRow), (Flight, FlightRow), (Hotel, HotelRow), (Activity, ActivityRow)):
+        table = model.__table__
+        query = select(*table.columns).order_by(table.c.id)
+        if city_ids is not None:
+            key = table.c.id if model is City else table.c.city_id
+            query = query.where(key.in_(list(city_ids)))
+        rows[model] = [row_type(*r) for r in conn.execute(query)]
+
+    grouped = {city.id: ([], [], []) for city in rows[City]}
+    for slot, model in enumerate((Flight, Hotel, Activity)):
+        for row in rows[model]:
+            if row.city_id in grouped:
+                grouped[row.city_id][slot].append(row)
+    seasons = _load_seasons(conn, city_ids)
+    templates = _load_day_plan_rules(conn, city_ids)
+    return [
+        CityCatalog(city, tuple(flights), tuple(hotels), tuple(activities), pricing.route_map(flights),
+                    pricing.RateTable(activities, templates.get(city.id)),
+                    {key: seasons[key] for key in _season_keys(flights, hotels) if key in seasons})
+        for city, (flights, hotels, activities) in ((c, grouped[c.id]) for c in rows[City])
+    ]
+
+
+def _load_seasons(conn, city_ids=None):
+    table = SeasonalRate.__table__
+    query = select(*table.columns).order_by(table.c.start_date, table.c.id)
+    if city_ids is not None:
+        city_ids = list(city_ids)
+        query = query.where(or_(
+            table.c.hotel_id.in_(select(Hotel.id).where(Hotel.city_id.in_(city_ids))),
+            table.c.flight_id.in_(select(Flight.id).where(Flight.city_id.in_(city_ids)))))
+    seasons = {}
+    for row in conn.execute(query):
+        rate = SeasonalRateRow(*row)
+        key = ("hotel", rate.hotel_id) if rate.hotel_id is not None else ("flight", rate.flight_id)
+        seasons.setdefault(key, []).append(rate)
+    return {key: tuple(rates) for key, rates in seasons.items()}
+
+
+def _load_day_plan_rules(conn, city_ids=None):
+    """``{city id: {num_days: {day: (activity names)}}}``."""
+    table = DayPlanRule.__table__
+    query = (select(table.c.city_id, table.c.num_days, table.c.day, table.c.activity_name)
+             .order_by(table.c.city_id, table.c.num_days, table.c.day, table.c.position, table.c.id))
+    if city_ids is not None:
+        query = query.where(table.c.city_id.in_(list(city_ids)))
+    templates = {}
+    for city_id, num_days, day, name in conn.execute(query):
+        days = templates.setdefault(city_id, {}).setdefault(num_days, {})
+        days[day] = days.get(day, ()) + (name,)
+    return templates
+
+
+def _season_keys(flights, hotels):
+    return [("flight", f.id) for f in flights] + [("hotel", h.id) for h in hotels]
+
+
+def load_snapshot(engine):
+    """Read the whole catalog in a single transaction."""
+    with engine.connect() as conn:
+        # pysqlite only opens transactions for writes; start one explicitly so
+        # the version and every table are read from the same database state.
+        conn.exec_driver_sql("BEGIN")
+        version = read_version(conn)
+        entries = load_city_entries(conn)
+        counts = conn.execute(select(Package.destination, func.count())
+                              .where(Package.destination.is_not(None))
+                              .group_by(Package.destination)).all()
+        durations = conn.execute(select(Package.destination, Package.duration).distinct()
+                                 .where(Package.destination.is_not(None))).all()
+        conn.rollback()
+    snapshot = CatalogSnapshot(version, entries, DestinationIndex(counts))
+    for destination, duration in durations:
+        entry = snapshot.city(destination)
+        if entry is not None:
+            entry.rates.plan(pricing.parse_num_days(duration))
+    return snapshot
+
+
+class Catalog:
+    """Process-wide holder of the current ``CatalogSnapshot``."""
+
+    def __init__(self):
+        self._snapshot = None
+        self._stale = True
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.partial_rebuilds = 0
+        self.rebuild_seconds = 0.0
+        self.last_rebuild_seconds = 0.0
+
+    def current(self):
+        """Return the current snapshot, rebuilding it if the catalog changed."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale:
+            ttl = current_app.config.get('CATALOG_VERSION_TTL', DEFAULT_VERSION_TTL)
+            now = time.monotonic()
+            if now - self._checked_at < ttl:
+                self.hits += 1
+                return snapshot
+            with db.engine.connect() as conn:
+                version = read_version(conn)
+            self._checked_at = now
+            if version == snapshot.version:
+                self.hits += 1
+                return snapshot
+        self.misses += 1
+        return self._rebuild(snapshot)
+
+    def _rebuild(self, seen):
+        with self._lock:
+            if self._snapshot is not seen and not self._stale:
+                # Another thread rebuilt while we waited for the lock
+                return self._snapshot
+            self._stale = False
+            start = time.perf_counter()
+            snapshot = load_snapshot(db.engine)
+            elapsed = time.perf_counter() - start
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            self.rebuilds += 1
+            self.rebuild_seconds += elapsed
+            self.last_rebuild_seconds = elapsed
+            return snapshot
+
+    def invalidate(self):
+        """Force a rebuild on the next ``current()`` call."""
+        self._stale = True
+
+    def refresh_cities(self, city_ids, previous_version, version):
+        """Reload only ``city_ids`` if the snapshot was current before ``version``."""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._stale or snapshot.version != previous_version:
+                self._stale = True
+                return
+            start = time.perf_counter()
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql("BEGIN")
+                current = read_version(conn)
+                entries = load_city_entries(conn, list(city_ids)) if current == version else None
+                conn.rollback()
+            if entries is None:
+                # Someone else wrote in between
+                self._stale = True
+                return
+            by_id = dict(snapshot.by_id)
+            by_id.update((e.city.id, e) for e in entries)
+            self._snapshot = CatalogSnapshot(version, by_id.values(), snapshot.destinations)
+            self._checked_at = time.monotonic()
+            self.partial_rebuilds += 1
+            self.last_rebuild_seconds = time.perf_counter() - start
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "cities": len(snapshot.by_id) if snapshot else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "partial_rebuilds": self.partial_rebuilds,
+            "rebuild_seconds": round(self.rebuild_seconds, 6),
+            "last_rebuild_seconds": round(self.last_rebuild_seconds, 6),
+        }
+
+
+catalog = Catalog()
+
+
+@rates_changed.connect
+def _refresh_changed_cities(sender, city_ids, previous_version, version, **kw):
+    catalog.refresh_cities(city_ids, previous_version, version)
+
+
+# ---------------- WRITE TRACKING ---------------- #
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    if any(isinstance(obj, CATALOG_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        bump_version(session.connection())
+        session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(state):
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return
+    mapper = state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, CATALOG_MODELS):
+        bump_version(state.session.connection())
+        state.session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    if session.info.pop("catalog_changed", False):
+        catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("catalog_changed", None)
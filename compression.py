@@ -0,0 +1,134 @@
+"""On-the-fly gzip for HTML and JSON responses.
+
+Responses are compressed in ``after_request`` when the client accepts gzip,
+the body is HTML or JSON, and it is at least ``GZIP_MIN_SIZE`` bytes.
+Streamed responses, files and bodies that already carry a
+``Content-Encoding`` are left alone. A compressed response's ETag becomes
+weak, since it names the uncompressed content. Compressed bodies of responses
+with an ETag (cached pages, API pages) are kept by that ETag, so a page cache
+hit does not pay for compression again.
+
+Bytes before and after compression are counted per route. ``/metrics`` has
+the totals as ``holiday_compression_*`` and ``/debug/compression`` (see
+debug.py) reports the bytes saved per route.
+
+    GZIP_MIN_SIZE    bytes, default 1024
+    GZIP_LEVEL       1-9, default 6
+    GZIP_MEMO_SIZE   compressed bodies kept by ETag, default 256
+"""
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_LEVEL = 6
+DEFAULT_MEMO_SIZE = 256
+COMPRESSIBLE_TYPES = ("text/html", "application/json")
+
+
+class CompressionStats:
+    """Bytes in and out per route, plus the ETag-keyed memo of compressed bodies."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}   # rule -> [responses, compressed, bytes_in, bytes_out]
+        self._memo = OrderedDict()
+        self.memo_hits = 0
+
+    def record(self, route, bytes_in, bytes_out, compressed):
+        with self._lock:
+            entry = self._routes.setdefault(route, [0, 0, 0, 0])
+            entry[0] += 1
+            entry[1] += compressed
+            entry[2] += bytes_in
+            entry[3] += bytes_out
+
+    def compress(self, body, etag, level, memo_size):
+        if etag is None:
+            return gzip.compress(body, level)
+        key = (etag, level)
+        with self._lock:
+            compressed = self._memo.get(key)
+            if compressed is not None:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return compressed
+        compressed = gzip.compress(body, level)
+        with self._lock:
+            self._memo[key] = compressed
+            while len(self._memo) > memo_size:
+                self._memo.popitem(last=False)
+        return compressed
+
+    def routes(self):
+        with self._lock:
+            rows = {route: list(values) for route, values in self._routes.items()}
+        return {
+            route: {
+                "responses": responses,
+                "compressed": compressed,
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "bytes_saved": bytes_in - bytes_out,
+                "ratio": round(bytes_out / bytes_in, 4) if bytes_in else 1.0,
+            }
+            for route, (responses, compressed, bytes_in, bytes_out) in sorted(rows.items())
+        }
+
+    def stats(self):
+        routes = self.routes().values()
+        bytes_in = sum(r["bytes_in"] for r in routes)
+        bytes_out = sum(r["bytes_out"] for r in routes)
+        return {
+            "responses": sum(r["responses"] for r in routes),
+            "compressed": sum(r["compressed"] for r in routes),
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "bytes_saved": bytes_in - bytes_out,
+            "memo_hits": self.memo_hits,
+        }
+
+
+stats = CompressionStats()
+
+
+def _compressible(response):
+    return (response.status_code == 200
+            and response.mimetype in COMPRESSIBLE_TYPES
+            and not response.is_streamed
+            and not response.direct_passthrough
+            and "Content-Encoding" not in response.headers)
+
+
+def _after_request(response):
+    if not _compressible(response):
+        return response
+    config = current_app.config
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    body = response.get_data()
+    response.vary.add("Accept-Encoding")
+    if len(body) < config.get("GZIP_MIN_SIZE", DEFAULT_MIN_SIZE) or not request.accept_encodings["gzip"]:
+        stats.record(route, len(body), len(body), False)
+        return response
+
+    etag, weak = response.get_etag()
+    compressed = stats.compress(body, etag if etag and not weak else None,
+                                config.get("GZIP_LEVEL", DEFAULT_LEVEL),
+                                config.get("GZIP_MEMO_SIZE", DEFAULT_MEMO_SIZE))
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = "gzip"
+    if etag:
+        response.set_etag(etag, weak=True)
+    stats.record(route, len(body), len(compressed), True)
+    return response
+
+
+def report_view():
+    return {"routes": stats.routes(), "totals": stats.stats()}
+
+
+def init_app(app):
+    app.after_request(_after_request)
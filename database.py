@@ -0,0 +1,208 @@
+"""SQLite connection setup and the read-only pool.
+
+Every new connection gets WAL journaling, so readers never block the writer;
+a ``busy_timeout``, so concurrent writers from several gunicorn workers queue
+instead of failing with ``database is locked``; and ``synchronous=NORMAL``,
+which is durable across application crashes in WAL mode and only fsyncs at
+checkpoints. Reads get a larger page cache, memory-mapped I/O and in-memory
+temp tables (sorts, GROUP BY).
+
+Views wrapped in ``read_only`` run their session queries on a second engine
+opened with ``mode=ro``. That pool is separate from the one writers use, so
+bookings and catalog writes never wait behind listing traffic for a pooled
+connection. A read-only route that tries to write fails instead of writing.
+
+Each setting is read from the app config, then the environment, then the
+default:
+
+    SQLITE_JOURNAL_MODE     default "WAL"
+    SQLITE_BUSY_TIMEOUT     milliseconds, default 5000
+    SQLITE_SYNCHRONOUS      default "NORMAL"
+    SQLITE_CACHE_SIZE       pages, or KiB when negative; default -65536 (64 MiB)
+    SQLITE_MMAP_SIZE        bytes, default 268435456 (256 MiB); 0 disables
+    SQLITE_TEMP_STORE       default "MEMORY"
+    SQLITE_READ_POOL        default on; 0 sends reads through the main engine
+    SQLITE_READ_POOL_SIZE   default 10
+
+At startup the pragmas in effect on both engines are logged on the
+``holiday.database`` logger, with a warning for any that SQLite did not
+accept. ``flask --app app database pragmas`` prints the same report.
+"""
+import functools
+import logging
+import os
+from urllib.parse import quote
+
+import click
+from flask import current_app, g
+from flask.cli import AppGroup
+from sqlalchemy import URL, create_engine, event
+
+from models import db
+
+
+DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_BUSY_TIMEOUT": 5000,
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_CACHE_SIZE": -65536,
+    "SQLITE_MMAP_SIZE": 268435456,
+    "SQLITE_TEMP_STORE": "MEMORY",
+    "SQLITE_READ_POOL": True,
+    "SQLITE_READ_POOL_SIZE": 10,
+}
+
+SYNCHRONOUS_NAMES = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+TEMP_STORE_NAMES = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+
+log = logging.getLogger("holiday.database")
+
+
+def settings(config):
+    values = {}
+    for key, default in DEFAULTS.items():
+        value = config.get(key, os.environ.get(key, default))
+        if isinstance(default, bool):
+            value = value if isinstance(value, bool) else str(value).lower() not in ("0", "false", "no", "off", "")
+        elif isinstance(default, int):
+            value = int(value)
+        else:
+            value = str(value).upper()
+        values[key] = value
+    return values
+
+
+def _pragmas(values, read_only=False):
+    pragmas = {
+        # busy_timeout first: switching to WAL needs a brief exclusive lock
+        "busy_timeout": values["SQLITE_BUSY_TIMEOUT"],
+        "journal_mode": values["SQLITE_JOURNAL_MODE"],
+        "synchronous": values["SQLITE_SYNCHRONOUS"],
+        "cache_size": values["SQLITE_CACHE_SIZE"],
+        "mmap_size": values["SQLITE_MMAP_SIZE"],
+        "temp_store": values["SQLITE_TEMP_STORE"],
+    }
+    if read_only:
+        # The journal mode belongs to the file and can't be set from a
+        # read-only connection; synchronous only matters for writes
+        del pragmas["journal_mode"], pragmas["synchronous"]
+        pragmas["query_only"] = 1
+    return pragmas
+
+
+def _listen(engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def read_only_engine(engine, pool_size):
+    """Engine on the same file as ``engine``, opened with ``mode=ro``."""
+    # Percent-encoded, so "?", "#", "%" or spaces in the path stay part of it
+    path = quote(os.path.abspath(engine.url.database))
+    url = URL.create("sqlite", database=f"file:{path}", query={"mode": "ro", "uri": "true"})
+    return create_engine(url, pool_size=pool_size, max_overflow=pool_size)
+
+
+def read_only(view):
+    """Run the view's session queries on the read-only pool, when there is one."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        engine = current_app.extensions.get("read_engine")
+        if engine is not None:
+            g.read_engine = engine
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def read_pragmas(engine):
+    """Pragmas in effect on a connection from ``engine``."""
+    with engine.connect() as conn:
+        def value(name):
+            return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        return {
+            "journal_mode": value("journal_mode").upper(),
+            "synchronous": SYNCHRONOUS_NAMES.get(value("synchronous")),
+            "busy_timeout": value("busy_timeout"),
+            "cache_size": value("cache_size"),
+            "mmap_size": value("mmap_size"),
+            "temp_store": TEMP_STORE_NAMES.get(value("temp_store")),
+            "query_only": value("query_only"),
+        }
+
+
+def report(app):
+    """``{engine name: (configured, actual)}`` pragma values for the app's engines."""
+    values = settings(app.config)
+    with app.app_context():
+        engines = {"main": (db.engine, False)}
+    if app.extensions.get("read_engine") is not None:
+        engines["read_only"] = (app.extensions["read_engine"], True)
+    result = {}
+    for name, (engine, is_read_only) in engines.items():
+        configured = _pragmas(values, is_read_only)
+        if is_read_only:
+            # Inherited from the file, which the main engine configured
+            configured["journal_mode"] = values["SQLITE_JOURNAL_MODE"]
+        result[name] = (configured, read_pragmas(engine))
+    return result
+
+
+def _mismatches(configured, actual):
+    return {k: v for k, v in configured.items() if str(actual.get(k)).upper() != str(v).upper()}
+
+
+def log_report(app):
+    for name, (configured, actual) in report(app).items():
+        log.info("%s engine pragmas: %s", name, ", ".join(f"{k}={v}" for k, v in actual.items()))
+        for key, want in _mismatches(configured, actual).items():
+            # e.g. WAL on a network filesystem, or mmap capped by SQLITE_MAX_MMAP_SIZE
+            log.warning("%s engine: %s is %s, configured %s", name, key, actual.get(key), want)
+
+
+def init_app(app):
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+    values = settings(app.config)
+    _listen(engine, _pragmas(values))
+    if values["SQLITE_READ_POOL"]:
+        read_engine = read_only_engine(engine, values["SQLITE_READ_POOL_SIZE"])
+        _listen(read_engine, _pragmas(values, read_only=True))
+        app.extensions["read_engine"] = read_engine
+
+
+def after_fork(app):
+    """Drop pooled connections inherited from a forking parent, without closing them.
+
+    A SQLite connection must not be used from two processes; the parent
+    keeps its own, the child opens fresh ones on demand.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    read_engine = app.extensions.get("read_engine")
+    if read_engine is not None:
+        read_engine.dispose(close=False)
+
+
+# ---------------- CLI ---------------- #
+cli = AppGroup("database", help="Inspect the SQLite configuration.")
+
+
+@cli.command("pragmas")
+def pragmas_command():
+    """Show the pragmas in effect on each engine."""
+    failed = False
+    for name, (configured, actual) in report(current_app).items():
+        mismatches = _mismatches(configured, actual)
+        click.echo(f"{name}:")
+        for key, value in actual.items():
+            note = f"  (configured {mismatches[key]})" if key in mismatches else ""
+            click.echo(f"  {key:<13} {value}{note}")
+        failed = failed or bool(mismatches)
+    if failed:
+        raise SystemExit(1)
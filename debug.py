@@ -0,0 +1,53 @@
+"""Debug routes: database path, catalog and compression stats, table dump.
+
+Registered by ``create_app`` only when ``DEBUG_ROUTES`` is on (app config or
+environment; defaults to the app's debug flag), so production workers neither
+serve nor import them.
+"""
+import os
+
+from flask import Blueprint, current_app, jsonify
+from markupsafe import escape
+from sqlalchemy import text
+
+import compression
+from catalog import catalog
+from models import db
+
+
+bp = Blueprint('debug', __name__)
+bp.add_url_rule('/debug/compression', 'compression', compression.report_view)
+
+
+@bp.route('/debug/dbpath')
+def debug_dbpath():
+    db_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+    db_path = db_uri.replace('sqlite:///', '')
+    abs_path = os.path.abspath(db_path)
+    return f"Flask is using database file: {abs_path}"
+
+
+@bp.route('/debug/catalog')
+def debug_catalog():
+    return jsonify(catalog.stats())
+
+
+@bp.route('/debug/tables')
+def debug_tables():
+    tables = db.session.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")).fetchall()
+    output = []
+    for table_name, schema in tables:
+        output.append(f"<b>Table:</b> {escape(table_name)}<br><b>Schema:</b> {escape(schema or 'N/A')}")
+        try:
+            quoted = db.engine.dialect.identifier_preparer.quote(table_name)
+            sample = db.session.execute(text(f"SELECT * FROM {quoted} LIMIT 1")).fetchone()
+            output.append(f"<b>Sample record:</b> {escape(sample)}<br><br>")
+        except Exception as e:
+            output.append(f"<b>Error reading sample:</b> {escape(e)}<br><br>")
+    return "<hr>".join(output)
+
+
+@bp.route('/init_db')
+def init_db():
+    db.create_all()
+    return "Database tables created."
@@ -0,0 +1,39 @@
+"""gunicorn settings: preload the app and warm it before forking workers.
+
+    gunicorn                         # picks this file up from the working directory
+
+The master builds the app, loads the catalog snapshot and compiles every
+template once; forked workers share those pages copy-on-write and serve their
+first request warm. ``gc.freeze()`` moves everything loaded so far out of the
+collector's reach, so collections in a worker don't write to (and copy) the
+shared pages. Pooled SQLite connections opened in the master are dropped in
+each worker after the fork.
+
+``GUNICORN_PRELOAD=0`` loads the app in each worker instead; workers then warm
+up before accepting requests.
+"""
+import gc
+import os
+
+
+wsgi_app = "app:create_app()"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() not in ("0", "false", "no", "off", "")
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from app import warm_up
+        warm_up(server.app.wsgi())
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        import database
+        database.after_fork(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        from app import warm_up
+        warm_up(worker.wsgi)
@@ -0,0 +1,225 @@
+"""Request instrumentation and the Prometheus ``/metrics`` endpoint.
+
+Per route this records total latency, SQL statement count and time, time
+spent in the pricing engine and Jinja render time, as histograms rendered in
+the Prometheus text format.
+
+Opt-in slow-request log: set ``SLOW_REQUEST_SECONDS`` and requests slower than
+that are logged as one JSON line on the ``holiday.slow`` logger. With
+``SLOW_REQUEST_PROFILE_RATE`` (0-1) a sample of requests also runs under
+cProfile and slow ones carry the top of the profile in the log entry.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+PROFILE_LINES = 25
+
+slow_log = logging.getLogger("holiday.slow")
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label value."""
+
+    def __init__(self, name, help_text, buckets, label="route"):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for label_value, (counts, count, total) in series:
+            label = f'{self.label}="{_escape(label_value)}"'
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+            lines.append(f"{self.name}_sum{{{label}}} {total:.6f}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "holiday_request_seconds", "Total request latency.", LATENCY_BUCKETS)
+        self.sql_statements = Histogram(
+            "holiday_request_sql_statements", "SQL statements executed per request.", COUNT_BUCKETS)
+        self.sql_seconds = Histogram(
+            "holiday_request_sql_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS)
+        self.pricing_seconds = Histogram(
+            "holiday_request_pricing_seconds", "Time spent in the pricing engine per request.", LATENCY_BUCKETS)
+        self.render_seconds = Histogram(
+            "holiday_request_render_seconds", "Time spent rendering templates per request.", LATENCY_BUCKETS)
+        self._collectors = {}
+
+    def add_collector(self, prefix, fn):
+        """Expose ``fn()``'s numeric values as ``<prefix>_<key>`` gauges; replaces an earlier ``prefix``."""
+        self._collectors[prefix] = fn
+
+    def render(self):
+        lines = []
+        for histogram in (self.request_seconds, self.sql_statements, self.sql_seconds,
+                          self.pricing_seconds, self.render_seconds):
+            lines.extend(histogram.render())
+        for prefix, fn in self._collectors.items():
+            for key, value in fn().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestStats:
+    __slots__ = ("start", "sql_statements", "sql_seconds", "pricing_seconds", "render_seconds",
+                 "render_started", "profiler")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.pricing_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+        self.profiler = None
+
+
+def _stats():
+    return g.get("_request_stats") if has_request_context() else None
+
+
+@contextmanager
+def track_pricing():
+    """Attribute the time spent inside the block to the pricing engine."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _stats()
+        if stats is not None:
+            stats.pricing_seconds += time.perf_counter() - start
+
+
+# ---------------- HOOKS ---------------- #
+# The start time lives on the statement's execution context, which goes away
+# with the statement, so one that raises leaves nothing behind on the connection
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats = _stats()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _stats()
+    if stats is not None:
+        stats.render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    stats = _stats()
+    if stats is not None and stats.render_started is not None:
+        stats.render_seconds += time.perf_counter() - stats.render_started
+        stats.render_started = None
+
+
+def _before_request():
+    stats = g._request_stats = RequestStats()
+    rate = current_app.config.get("SLOW_REQUEST_PROFILE_RATE", 0.0)
+    if current_app.config.get("SLOW_REQUEST_SECONDS") is not None and rate and random.random() < rate:
+        stats.profiler = cProfile.Profile()
+        stats.profiler.enable()
+
+
+def _after_request(response):
+    stats = g.pop("_request_stats", None)
+    if stats is None:
+        return response
+    if stats.profiler is not None:
+        stats.profiler.disable()
+    elapsed = time.perf_counter() - stats.start
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    registry.request_seconds.observe(route, elapsed)
+    registry.sql_statements.observe(route, stats.sql_statements)
+    registry.sql_seconds.observe(route, stats.sql_seconds)
+    registry.pricing_seconds.observe(route, stats.pricing_seconds)
+    registry.render_seconds.observe(route, stats.render_seconds)
+
+    threshold = current_app.config.get("SLOW_REQUEST_SECONDS")
+    if threshold is not None and elapsed >= threshold:
+        entry = {
+            "route": route,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "status": response.status_code,
+            "seconds": round(elapsed, 6),
+            "sql_statements": stats.sql_statements,
+            "sql_seconds": round(stats.sql_seconds, 6),
+            "pricing_seconds": round(stats.pricing_seconds, 6),
+            "render_seconds": round(stats.render_seconds, 6),
+        }
+        if stats.profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(stats.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            entry["profile"] = out.getvalue()
+        slow_log.warning(json.dumps(entry))
+    return response
+
+
+def metrics_view():
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,182 @@
+from flask import g, has_request_context
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    """Session that reads through the read-only engine inside ``database.read_only`` views."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            engine = g.get("read_engine")
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+class City(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+class Package(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100))
+    destination = db.Column(db.String(50), index=True)
+    description = db.Column(db.Text)
+    price = db.Column(db.Integer)
+    duration = db.Column(db.String(20))
+    image = db.Column(db.String(200))
+    type = db.Column(db.String(50), index=True)
+
+class Flight(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.Integer, db.ForeignKey('city.id'))  # leading column of ix_flight_route
+    source_station = db.Column(db.String(100))
+    destination_station = db.Column(db.String(100))
+    price = db.Column(db.Integer)
+    details = db.Column(db.Text)
+    # Normalized route keys (see pricing.route_key), kept in sync by SQLite
+    source_key = db.Column(db.String(100), db.Computed("lower(source_station)", persisted=False))
+    destination_key = db.Column(db.String(100), db.Computed("lower(destination_station)", persisted=False))
+
+    __table_args__ = (
+        db.Index('ix_flight_route', 'city_id', 'source_key', 'destination_key'),
+    )
+
+class Hotel(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.Integer, db.ForeignKey('city.id'))  # leading column of ix_hotel_city_name
+    name = db.Column(db.String(100))
+    address = db.Column(db.Text)
+    room_category = db.Column(db.String(100))
+    price = db.Column(db.Integer)
+    meal = db.Column(db.String(100))
+    details = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_hotel_city_name', 'city_id', 'name'),  # rate sheet upsert key
+    )
+
+class Activity(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.Integer, db.ForeignKey('city.id'))  # leading column of ix_activity_city_name
+    name = db.Column(db.String(100))
+    type = db.Column(db.String(50))  # e.g., pickup, drop, tour
+    rate_1 = db.Column(db.Integer)   # rate for 1 pax
+    rate_2 = db.Column(db.Integer)   # rate for 2 pax
+    rate_3 = db.Column(db.Integer)   # rate for 3 pax
+    rate_4 = db.Column(db.Integer)   # rate for 4 pax
+    price = db.Column(db.Integer)    # default price (optional)
+    details = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_activity_city_name', 'city_id', 'name'),  # rate sheet upsert key
+    )
+
+class DayPlanRule(db.Model):
+    """One tour of a day-plan template: a tour on ``day`` of ``num_days``-day trips to a city.
+
+    A city and trip length with any rules uses them for every middle day
+    (days 2 to ``num_days - 1``; a day without rules has no tours) instead
+    of spreading tours one per day. Pickup and drop stay on the first and
+    last day. ``activity_name`` is matched case-insensitively against the
+    city's tours.
+    """
+    __tablename__ = 'day_plan_rule'
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.Integer, db.ForeignKey('city.id'), nullable=False)
+    num_days = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)   # order within the day
+    activity_name = db.Column(db.String(100), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_day_plan_rule_city', 'city_id', 'num_days', 'day', 'position'),
+    )
+
+class SeasonalRate(db.Model):
+    """Date-ranged price of a hotel night or a flight, overriding the row's ``price``.
+
+    Exactly one of ``hotel_id``/``flight_id`` is set. Where ranges overlap the
+    one starting latest wins.
+    """
+    __tablename__ = 'seasonal_rate'
+    id = db.Column(db.Integer, primary_key=True)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotel.id'))
+    flight_id = db.Column(db.Integer, db.ForeignKey('flight.id'))
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)   # inclusive
+    price = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_seasonal_rate_hotel', 'hotel_id', 'start_date'),
+        db.Index('ix_seasonal_rate_flight', 'flight_id', 'start_date'),
+    )
+
+class Booking(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    package_id = db.Column(db.Integer, db.ForeignKey('package.id'), index=True)
+    name = db.Column(db.String(100))
+    email = db.Column(db.String(100))
+    phone = db.Column(db.String(20))
+    travellers = db.Column(db.Integer)
+    taxi_type = db.Column(db.String(50))
+    room_type = db.Column(db.String(50))
+    hotel_type = db.Column(db.String(50))
+    persons = db.Column(db.Integer)
+    status = db.Column(db.String(20), default='CONFIRMED')
+    idempotency_key = db.Column(db.String(64))  # set by the booking form; retries reuse it
+    created_at = db.Column(db.DateTime)         # UTC; NULL for bookings made before it was recorded
+
+    __table_args__ = (
+        db.Index('ix_booking_idempotency_key', 'idempotency_key', unique=True),
+    )
+
+
+class CatalogVersion(db.Model):
+    """Single-row counter of catalog writes, maintained by catalog.py.
+
+    ORM writes to City, Package, Flight, Hotel, Activity, SeasonalRate or
+    DayPlanRule bump it in the same transaction. Core writers bypass those
+    session events and bump it explicitly: rate_updates.py, rate_import.py,
+    seed.py and benchmarks/datagen.py.
+    """
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PackagePrice(db.Model):
+    """Materialized package totals, maintained by price_table.py.
+
+    total = base_price + per_person_price * persons
+    """
+    __tablename__ = 'package_price'
+    package_id = db.Column(db.Integer, db.ForeignKey('package.id'), primary_key=True)
+    from_city = db.Column(db.String(100), primary_key=True)      # lower-cased; '' = no matching flights
+    persons = db.Column(db.Integer, primary_key=True)            # 1-4; 5 = any other group size
+    flight_option = db.Column(db.String(10), primary_key=True)   # 'with' / 'without'
+    base_price = db.Column(db.Integer, nullable=False)
+    per_person_price = db.Column(db.Integer, nullable=False)
+
+
+class BookingStat(db.Model):
+    """Booking counts per package, day and status, maintained by bookings.py.
+
+    Updated in the transaction that inserts the bookings, so it always agrees
+    with the ``booking`` table.
+    """
+    __tablename__ = 'booking_stat'
+    package_id = db.Column(db.Integer, db.ForeignKey('package.id'), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True)     # 'YYYY-MM-DD' (UTC); '' = no created_at
+    status = db.Column(db.String(20), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False)
+    travellers = db.Column(db.Integer, nullable=False)
+    persons = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_booking_stat_day', 'day'),
+    )
@@ -0,0 +1,220 @@
+"""Rendered-page cache for the HTML listing and detail routes.
+
+A cached view's output depends only on its URL arguments and the catalog, so
+responses are stored under ``(endpoint, view args, normalized query args,
+catalog version)``. Only the arguments the view reads are part of the key, in
+a fixed order, so ``?persons=2&utm_source=x`` and ``?persons=2`` share an
+entry. A view can call ``depends_on`` with the ids of the cities whose rates
+it priced against; on ``catalog.rates_changed`` only the entries tagged with
+a changed city (or not tagged at all) are dropped, like
+``CalendarCache.drop_cities``. Any other version change drops every entry.
+
+The ETag is derived from the key, so a conditional GET whose ``If-None-Match``
+still matches gets a 304 without touching the cache or rendering anything. An
+entry kept across a rates change keeps the ETag it was rendered with, and a
+request still holding it gets a 304 too.
+
+Misses are single-flight: the first request for a key renders it while
+identical requests arriving meanwhile wait for that result instead of
+rendering it again. Only 200 responses are stored; others are handed to the
+waiting requests and then forgotten.
+
+The cache is an LRU bounded by entry count and by total body size. Hits,
+misses, coalesced waits, evictions and the hit ratio are exported on
+``/metrics`` as ``holiday_page_cache_*``.
+
+    PAGE_CACHE              default on; 0 renders every request
+    PAGE_CACHE_SIZE         entries, default 512
+    PAGE_CACHE_MAX_BYTES    bytes of bodies, default 134217728 (128 MiB)
+    PAGE_CACHE_WAIT         seconds a coalesced request waits, default 30
+"""
+import functools
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, TimeoutError
+
+from flask import current_app, g, make_response, request
+
+from catalog import catalog, rates_changed
+
+
+DEFAULT_SIZE = 512
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_WAIT = 30
+
+# ``cities`` is the frozenset of city ids the page depends on, None for all
+CachedPage = namedtuple("CachedPage", "body status mimetype etag cities")
+
+
+class PageCache:
+    """LRU of ``CachedPage`` with single-flight fills."""
+
+    def __init__(self, size=DEFAULT_SIZE, max_bytes=DEFAULT_MAX_BYTES):
+        self.size = size
+        self.max_bytes = max_bytes
+        self._version = None
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    def _drop_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def drop_cities(self, city_ids, previous_version, version):
+        """Move to ``version`` keeping the pages that don't depend on ``city_ids``,
+        if the cache was at ``previous_version``."""
+        with self._lock:
+            if self._version != previous_version:
+                return
+            for key, page in list(self._entries.items()):
+                if page.cities is None or not page.cities.isdisjoint(city_ids):
+                    del self._entries[key]
+                    self._bytes -= len(page.body)
+            self._version = version
+
+    def get(self, version, key, render, wait=DEFAULT_WAIT):
+        """The page for ``key``, calling ``render()`` at most once per concurrent miss."""
+        with self._lock:
+            self._drop_version(version)
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return page
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            try:
+                return flight.result(wait)
+            except TimeoutError:
+                return render()
+
+        try:
+            page = render()
+        except BaseException as e:
+            with self._lock:
+                del self._flights[key]
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            del self._flights[key]
+            if page.status == 200 and version == self._version and len(page.body) <= self.max_bytes:
+                self._store(key, page)
+        flight.set_result(page)
+        return page
+
+    def _store(self, key, page):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+        self._entries[key] = page
+        self._bytes += len(page.body)
+        while self._entries and (len(self._entries) > self.size or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "not_modified": self.not_modified,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0,
+        }
+
+
+cache = PageCache()
+
+
+@rates_changed.connect
+def _drop_changed_cities(sender, city_ids, previous_version, version, **kw):
+    cache.drop_cities(city_ids, previous_version, version)
+
+
+def depends_on(city_ids):
+    """Tag the page being rendered with the cities whose rates it depends on.
+
+    Calls add up. A page that never calls this depends on every city.
+    """
+    g.page_cities = getattr(g, "page_cities", frozenset()) | frozenset(city_ids)
+
+
+def normalized_args(names):
+    """``((name, value), ...)`` for the query arguments in ``names`` that are present.
+
+    Values are kept as sent: views read the first value with ``args.get`` and
+    treat an empty value differently from a missing one.
+    """
+    return tuple((name, request.args[name]) for name in sorted(names) if name in request.args)
+
+
+def _etag(version, key):
+    return hashlib.sha1(repr((version,) + key).encode()).hexdigest()
+
+
+def cached_page(args, vary=None):
+    """Cache a GET view whose output depends only on query ``args`` and the catalog.
+
+    ``vary()`` returns anything else the output depends on (e.g. today's date).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*view_args, **view_kwargs):
+            config = current_app.config
+            if not config.get("PAGE_CACHE", True):
+                return view(*view_args, **view_kwargs)
+            version = catalog.current().version
+            key = (request.endpoint, tuple(sorted(view_kwargs.items())), normalized_args(args),
+                   vary() if vary else None)
+            etag = _etag(version, key)
+            if request.if_none_match.contains_weak(etag):
+                cache.not_modified += 1
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            def render():
+                g.pop("page_cities", None)
+                response = make_response(view(*view_args, **view_kwargs))
+                return CachedPage(response.get_data(), response.status_code, response.mimetype, etag,
+                                  g.pop("page_cities", None))
+
+            cache.size = config.get("PAGE_CACHE_SIZE", DEFAULT_SIZE)
+            cache.max_bytes = config.get("PAGE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+            page = cache.get(version, key, render, config.get("PAGE_CACHE_WAIT", DEFAULT_WAIT))
+            if page.status == 200 and page.etag != etag and request.if_none_match.contains_weak(page.etag):
+                # Kept across a rates change that didn't touch it
+                cache.not_modified += 1
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.response_class(page.body, status=page.status, mimetype=page.mimetype)
+            if page.status == 200:
+                response.set_etag(page.etag)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,185 @@
+"""Departure calendar: a package's total for every departure day of a month.
+
+Hotel nights and flights can carry date-ranged ``SeasonalRate`` prices that
+override the row's own ``price`` (see models.py). A month is priced as one
+batch of array operations instead of an itinerary per day:
+
+* daily price arrays for the hotel and both flights cover the month plus the
+  trip length, from ``pricing.seasonal_prices``;
+* a cumulative sum gives the cost of the nights of every departure at once;
+* onward flights are taken on the departure day, return flights on the last
+  day, and the activity total (which does not depend on the date) comes from
+  ``pricing.grid_parts``.
+
+Every day equals the ``build_itinerary`` total for that ``departure``, which
+prices through the same season lookup; so does a listing with a departure
+date (``departure_prices``).
+
+Results are cached per (package, month, persons, departure city) for the
+current catalog version; a catalog write starts a fresh cache, except that a
+``catalog.rates_changed`` event only drops the entries of the changed cities.
+
+    CALENDAR_CACHE_SIZE   entries kept per process, default 2048
+"""
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+
+import pricing
+from catalog import rates_changed
+
+
+DEFAULT_CACHE_SIZE = 2048
+
+
+class CalendarError(ValueError):
+    pass
+
+
+def parse_month(value, today=None):
+    """First day of a ``YYYY-MM`` month; the current month when ``value`` is empty."""
+    if not value:
+        today = today or date.today()
+        return today.replace(day=1)
+    try:
+        year, month = (int(part) for part in value.split("-"))
+        return date(year, month, 1)
+    except ValueError:
+        raise CalendarError("month must be YYYY-MM") from None
+
+
+def departure_totals(package, entry, from_city, persons, first_day, days):
+    """``[(date, with_flight, without_flight)]`` for ``days`` departures from ``first_day``."""
+    dates = [first_day + timedelta(days=i) for i in range(days)]
+    if entry is None:
+        return [(d, package.price, package.price) for d in dates]
+
+    num_days = pricing.parse_num_days(package.duration)
+    nights = max(num_days - 1, 0)
+    span = days + max(num_days, 1)
+    item = pricing.GridItem(package.destination, package.duration, entry.hotels, entry.activities,
+                            entry.routes, entry.rates, from_city)
+    activities = int(pricing.grid_parts([item], [persons]).activities[0, 0])
+
+    hotel = entry.hotels[0] if entry.hotels else None
+    nightly = pricing.seasonal_prices(hotel, pricing.row_seasons(entry.seasons, "hotel", hotel), first_day, span)
+    cumulative = np.concatenate(([0], np.cumsum(nightly)))
+    stays = cumulative[nights:nights + days] - cumulative[:days]
+
+    onward = pricing.find_flight(entry.routes, from_city, package.destination)
+    flights = pricing.seasonal_prices(onward, pricing.row_seasons(entry.seasons, "flight", onward),
+                                      first_day, span)[:days]
+    back = pricing.find_flight(entry.routes, package.destination, from_city)
+    if back and num_days >= 1:
+        returns = pricing.seasonal_prices(back, pricing.row_seasons(entry.seasons, "flight", back),
+                                          first_day, span)
+        flights = flights + returns[num_days - 1:num_days - 1 + days]
+
+    without_flight = activities + stays
+    with_flight = without_flight + flights
+    return list(zip(dates, with_flight.tolist(), without_flight.tolist()))
+
+
+def month_totals(package, entry, from_city, persons, month):
+    """``[(date, with_flight, without_flight)]`` for every departure day of ``month``."""
+    days = calendar.monthrange(month.year, month.month)[1]
+    return departure_totals(package, entry, from_city, persons, month, days)
+
+
+def has_seasons(package, entry, from_city):
+    """Whether any row ``package`` is priced with has seasonal rates."""
+    if entry is None or not entry.seasons:
+        return False
+    hotel = entry.hotels[0] if entry.hotels else None
+    return bool(pricing.row_seasons(entry.seasons, "hotel", hotel)
+                or pricing.row_seasons(entry.seasons, "flight",
+                                       pricing.find_flight(entry.routes, from_city, package.destination))
+                or pricing.row_seasons(entry.seasons, "flight",
+                                       pricing.find_flight(entry.routes, package.destination, from_city)))
+
+
+def departure_prices(packages, snapshot, from_city, persons, departure):
+    """``{package_id: {"with_flight", "without_flight"}}`` on ``departure``.
+
+    Only packages with seasonal rates are included; every other package costs
+    the same on any date, so its undated total (e.g. from the price table)
+    stands.
+    """
+    prices = {}
+    for package in packages:
+        entry = snapshot.city(package.destination)
+        if has_seasons(package, entry, from_city):
+            _, with_flight, without_flight = departure_totals(package, entry, from_city, persons, departure, 1)[0]
+            prices[package.id] = {"with_flight": with_flight, "without_flight": without_flight}
+    return prices
+
+
+def parse_departure(value):
+    """Departure date from ``YYYY-MM-DD``, or None when missing or invalid."""
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+class CalendarCache:
+    """Month calendars for one catalog version, oldest evicted first."""
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE):
+        self.size = size
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, compute):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        self.misses += 1
+        value = compute()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = value
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def drop_cities(self, city_ids, previous_version, version):
+        """Move to ``version`` keeping all but ``city_ids``, if the cache was at ``previous_version``."""
+        with self._lock:
+            if self._version != previous_version:
+                return
+            for key in [k for k in self._entries if k[0] in city_ids]:
+                del self._entries[key]
+            self._version = version
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+cache = CalendarCache()
+
+
+@rates_changed.connect
+def _drop_changed_cities(sender, city_ids, previous_version, version, **kw):
+    cache.drop_cities(city_ids, previous_version, version)
+
+
+def package_calendar(package, snapshot, from_city, persons, month, cache_size=DEFAULT_CACHE_SIZE):
+    """Cached ``month_totals`` of ``package`` against a catalog snapshot."""
+    cache.size = cache_size
+    entry = snapshot.city(package.destination)
+    # Keyed by city first, for drop_cities
+    key = (entry.city.id if entry else None, package.id, month, persons, pricing.route_key(from_city))
+    return cache.get(snapshot.version, key, lambda: month_totals(package, entry, from_city, persons, month))
@@ -0,0 +1,305 @@
+"""Materialized package price table.
+
+Listing and detail totals depend only on (package, from_city, persons,
+flight_option). Activity rates only differ for 1-4 travellers, so every other
+group size shares the ``persons = 5`` row, and totals are stored as
+``base_price + per_person_price * persons``. ``from_city = ''`` holds the price
+for departure cities with no matching flights. Totals are undated, at each
+row's own ``price``; a listing or detail page with a departure date prices the
+packages that have seasonal rates live (see ``price_calendar.departure_prices``).
+
+Rows are recomputed with the pricing engine inside the transaction that
+changes the catalog, limited to the packages of the cities (or the packages)
+that were touched. Writes that bypass the ORM must call ``refresh_prices``.
+
+    flask --app app prices refresh   # rebuild every row
+    flask --app app prices check     # compare stored rows with live pricing
+"""
+from itertools import chain
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session, aliased
+
+import pricing
+from catalog import load_city_entries
+from models import db, City, Package, Flight, Hotel, Activity, DayPlanRule, PackagePrice
+
+
+PERSONS_KEYS = (1, 2, 3, 4, 5)
+OTHER_PERSONS = 5
+FLIGHT_OPTIONS = ("with", "without")
+CHUNK_SIZE = 500
+
+
+def persons_key(persons):
+    """Row key for a group size: 1-4 have their own rows, everything else uses 5."""
+    return persons if 1 <= persons <= 4 else OTHER_PERSONS
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _row(package_id, from_city, persons, flight_option, base_price, per_person_price):
+    return {
+        "package_id": package_id,
+        "from_city": from_city,
+        "persons": persons,
+        "flight_option": flight_option,
+        "base_price": base_price,
+        "per_person_price": per_person_price,
+    }
+
+
+def price_rows(packages, by_name):
+    """Price table rows for packages, given ``{city name: CityCatalog}``.
+
+    Every package and group size comes out of one ``pricing.grid_parts`` call.
+    """
+    rows, priced, items = [], [], []
+    for package in packages:
+        entry = by_name.get(package.destination)
+        if entry is None:
+            rows.extend(_row(package.id, "", p, option, package.price or 0, 0)
+                        for p in PERSONS_KEYS for option in FLIGHT_OPTIONS)
+            continue
+        priced.append((package, entry))
+        items.append(pricing.GridItem(package.destination, package.duration, entry.hotels, entry.activities,
+                                      entry.routes, entry.rates, ""))
+    if not items:
+        return rows
+    parts = pricing.grid_parts(items, PERSONS_KEYS)
+    # Activity totals are per person rate times persons, so this divides exactly
+    per_person = (parts.activities // PERSONS_KEYS).tolist()
+    hotel_totals = parts.hotels.tolist()
+
+    for i, (package, entry) in enumerate(priced):
+        destination = pricing.route_key(package.destination)
+        routes = entry.routes
+        from_cities = {src for src, dst in routes if dst == destination}
+        from_cities |= {dst for src, dst in routes if src == destination}
+        flight_totals = {}
+        for city in from_cities:
+            flights = [routes.get((city, destination)), routes.get((destination, city))]
+            flight_totals[city] = sum(f.price or 0 for f in flights if f)
+        hotel_total = hotel_totals[i]
+        for j, p in enumerate(PERSONS_KEYS):
+            rate = per_person[i][j]
+            rows.append(_row(package.id, "", p, "without", hotel_total, rate))
+            rows.append(_row(package.id, "", p, "with", hotel_total, rate))
+            for city, flight_total in flight_totals.items():
+                rows.append(_row(package.id, city, p, "with", hotel_total + flight_total, rate))
+    return rows
+
+
+def refresh_prices(conn, city_ids=(), destinations=(), package_ids=(), full=False):
+    """Recompute the rows of affected packages on ``conn``; returns rows written.
+
+    Affected packages are those whose destination is one of ``city_ids`` or
+    ``destinations``, plus ``package_ids``. ``full`` rebuilds the whole table.
+    """
+    table = Package.__table__
+    query = select(table.c.id, table.c.destination, table.c.duration, table.c.price)
+    if not full:
+        names = set(destinations)
+        for chunk in _chunks(city_ids):
+            names.update(conn.execute(select(City.name).where(City.id.in_(chunk))).scalars())
+        conditions = [table.c.destination.in_(chunk) for chunk in _chunks(names)]
+        conditions += [table.c.id.in_(chunk) for chunk in _chunks(package_ids)]
+        if not conditions:
+            return 0
+        query = query.where(or_(*conditions))
+    packages = conn.execute(query).all()
+
+    if full:
+        conn.execute(delete(PackagePrice))
+        entries = load_city_entries(conn)
+    else:
+        for chunk in _chunks(set(package_ids) | {p.id for p in packages}):
+            conn.execute(delete(PackagePrice).where(PackagePrice.package_id.in_(chunk)))
+        wanted = {p.destination for p in packages if p.destination}
+        ids = []
+        for chunk in _chunks(wanted):
+            ids.extend(conn.execute(select(City.id).where(City.name.in_(chunk))).scalars())
+        entries = load_city_entries(conn, ids) if ids else []
+    by_name = {e.city.name: e for e in entries}
+
+    rows = price_rows(packages, by_name)
+    for chunk in _chunks(rows, 5000):
+        conn.execute(insert(PackagePrice), chunk)
+    return len(rows)
+
+
+def lookup_totals(package_ids, from_city, persons):
+    """``{package_id: {"with_flight", "without_flight"}}`` read from the table.
+
+    ``package_ids`` is a list of ids or a select of ids (one query either way
+    for listings). Packages without rows are left out so callers can fall back
+    to live pricing.
+    """
+    key = persons_key(persons)
+    from_key = pricing.route_key(from_city or "")
+    columns = (PackagePrice.package_id, PackagePrice.from_city, PackagePrice.flight_option,
+               PackagePrice.base_price, PackagePrice.per_person_price)
+    if isinstance(package_ids, (list, tuple, set)):
+        id_filters = [PackagePrice.package_id.in_(chunk) for chunk in _chunks(package_ids)]
+    else:
+        id_filters = [PackagePrice.package_id.in_(package_ids)]
+
+    totals = {}
+    for id_filter in id_filters:
+        query = select(*columns).where(id_filter, PackagePrice.persons == key,
+                                       PackagePrice.from_city.in_({from_key, ""}))
+        for row in db.session.execute(query):
+            total = row.base_price + row.per_person_price * persons
+            slot = totals.setdefault(row.package_id, {})
+            if row.flight_option == "without":
+                slot["without_flight"] = total
+            elif row.from_city or "with_flight" not in slot:
+                # A row for this departure city beats the no-flights fallback
+                slot["with_flight"] = total
+    return totals
+
+
+def with_price(query, from_city, persons, flight_option="with"):
+    """Join a ``Package`` select to its materialized total for one search.
+
+    Returns ``(query, price)`` where ``price`` is a SQL expression usable for
+    ordering and keyset pagination. Packages without rows sort by their list
+    price.
+    """
+    key = persons_key(persons)
+    option = "without" if flight_option == "without" else "with"
+    fallback = aliased(PackagePrice)
+    query = query.outerjoin(fallback, and_(fallback.package_id == Package.id, fallback.persons == key,
+                                           fallback.flight_option == option, fallback.from_city == ""))
+    base, per_person = fallback.base_price, fallback.per_person_price
+    if option == "with":
+        exact = aliased(PackagePrice)
+        query = query.outerjoin(exact, and_(exact.package_id == Package.id, exact.persons == key,
+                                            exact.flight_option == option,
+                                            exact.from_city == pricing.route_key(from_city or "")))
+        base = func.coalesce(exact.base_price, base)
+        per_person = func.coalesce(exact.per_person_price, per_person)
+    price = func.coalesce(base + per_person * persons, Package.price, 0)
+    return query, price
+
+
+def check_consistency(persons_values=(1, 2, 3, 4, 5, 7)):
+    """Compare stored totals with a live recomputation; returns the mismatches."""
+    conn = db.session.connection()
+    stored = {}
+    for row in conn.execute(select(PackagePrice.__table__)):
+        stored[(row.package_id, row.from_city, row.persons, row.flight_option)] = (row.base_price, row.per_person_price)
+    by_name = {e.city.name: e for e in load_city_entries(conn)}
+
+    def stored_total(package_id, from_city, persons, flight_option):
+        key = persons_key(persons)
+        row = stored.get((package_id, from_city, key, flight_option)) or stored.get((package_id, "", key, flight_option))
+        return row[0] + row[1] * persons if row else None
+
+    mismatches = []
+    for package in conn.execute(select(Package.__table__)):
+        entry = by_name.get(package.destination)
+        from_cities = {""}
+        if entry:
+            for f in entry.flights:
+                from_cities.update(pricing.route_key(s) for s in (f.source_station, f.destination_station) if s)
+        for from_city in from_cities:
+            for persons in persons_values:
+                if entry:
+                    itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights,
+                                                        entry.hotels, entry.activities, from_city, persons,
+                                                        entry.routes, entry.rates)
+                    expected = {"with": itinerary.with_flight, "without": itinerary.without_flight}
+                else:
+                    expected = {"with": package.price or 0, "without": package.price or 0}
+                for option in FLIGHT_OPTIONS:
+                    actual = stored_total(package.id, from_city, persons, option)
+                    if actual != expected[option]:
+                        mismatches.append({
+                            "package_id": package.id,
+                            "from_city": from_city,
+                            "persons": persons,
+                            "flight_option": option,
+                            "stored": actual,
+                            "expected": expected[option],
+                        })
+    return mismatches
+
+
+# ---------------- WRITE TRACKING ---------------- #
+def _values(obj, attr):
+    """Current and pre-flush values of an attribute."""
+    history = inspect(obj).attrs[attr].history
+    return {v for v in chain(history.added, history.unchanged, history.deleted) if v is not None}
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    city_ids, destinations, package_ids = set(), set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Flight, Hotel, Activity, DayPlanRule)):
+            city_ids.update(_values(obj, "city_id"))
+        elif isinstance(obj, City):
+            destinations.update(_values(obj, "name"))
+        elif isinstance(obj, Package):
+            package_ids.add(obj.id)
+    if city_ids or destinations or package_ids:
+        refresh_prices(session.connection(), city_ids, destinations, package_ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(state):
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return None
+    mapper = state.bind_mapper
+    if mapper is None or not issubclass(mapper.class_, (City, Package, Flight, Hotel, Activity, DayPlanRule)):
+        return None
+    conn = state.session.connection()
+    if state.is_insert or issubclass(mapper.class_, (City, Package)):
+        result = state.invoke_statement()
+        refresh_prices(conn, full=True)
+        return result
+
+    # Bulk update/delete of Flight/Hotel/Activity/DayPlanRule: refresh the cities the
+    # matched rows belonged to before, and after, the statement.
+    table = mapper.local_table
+    matched = select(table.c.id, table.c.city_id)
+    if state.statement.whereclause is not None:
+        matched = matched.where(state.statement.whereclause)
+    before = conn.execute(matched).all()
+    result = state.invoke_statement()
+    city_ids = {r.city_id for r in before if r.city_id is not None}
+    if state.is_update:
+        for chunk in _chunks(r.id for r in before):
+            city_ids.update(conn.execute(select(table.c.city_id).where(table.c.id.in_(chunk))).scalars())
+    refresh_prices(conn, city_ids=city_ids)
+    return result
+
+
+# ---------------- CLI ---------------- #
+cli = AppGroup("prices", help="Maintain the materialized package price table.")
+
+
+@cli.command("refresh")
+def refresh_command():
+    """Rebuild every row of the price table."""
+    count = refresh_prices(db.session.connection(), full=True)
+    db.session.commit()
+    click.echo(f"{count} price rows written")
+
+
+@cli.command("check")
+def check_command():
+    """Compare stored rows with a live recomputation."""
+    mismatches = check_consistency()
+    for m in mismatches[:50]:
+        click.echo(m)
+    click.echo(f"{len(mismatches)} mismatches")
+    if mismatches:
+        raise SystemExit(1)
@@ -0,0 +1,344 @@
+"""Itinerary and package pricing engine.
+
+Pure functions over plain catalog rows: anything exposing the attributes of the
+``Flight``, ``Hotel`` and ``Activity`` models works, including the ORM rows
+themselves. There is no Flask or database dependency, so the HTML routes, the
+JSON APIs and batch jobs all price through the same code.
+
+``build_itinerary`` prices one package for one group size, day by day.
+Which activities go on which day comes from the city's compiled ``DayPlan``
+(see ``RateTable.plan``), so pricing a request only indexes into it.
+``price_grids`` prices many packages for many group sizes at once from each
+city's ``RateTable``, and is what listings, the price table and quotes use.
+Both price a row at its own ``price``; ``seasonal_prices`` applies the
+date-ranged ``SeasonalRate`` overrides for a departure date, and is the one
+season lookup the itinerary, the departure calendar and dated listings share.
+"""
+import re
+from collections import namedtuple
+
+import numpy as np
+
+
+DEFAULT_DURATION = "4D/3N"
+DEFAULT_NUM_DAYS = 4
+DURATION_RE = re.compile(r"(\d+)D")
+# Largest group the API prices; rate vectors and price grids grow with it
+MAX_GROUP_SIZE = 20
+
+# One day of an itinerary. ``flights`` is usually empty, or holds the onward
+# flight on day 1 and the return flight on the last day; ``hotel`` is None on
+# the last day (no night to stay).
+Day = namedtuple("Day", "number flights hotel activities flight_price hotel_price activity_price")
+Itinerary = namedtuple("Itinerary", "num_days days with_flight without_flight")
+
+
+def parse_num_days(duration):
+    """Number of days from a duration string like ``"5D/4N"``."""
+    match = DURATION_RE.match(duration or DEFAULT_DURATION)
+    return int(match.group(1)) if match else DEFAULT_NUM_DAYS
+
+
+def seasonal_prices(row, seasons, first_day, days):
+    """Price of ``row`` on each of ``days`` days from ``first_day``, as an array.
+
+    ``seasons`` are the row's seasonal rates ordered by start date; each one
+    overrides ``row.price`` over its dates, the latest-starting winning an
+    overlap. A missing ``row`` costs 0.
+    """
+    prices = np.full(days, (row.price or 0) if row else 0, dtype=np.int64)
+    if row is None:
+        return prices
+    for season in seasons:
+        start = max((season.start_date - first_day).days, 0)
+        end = min((season.end_date - first_day).days + 1, days)
+        if start < end:
+            prices[start:end] = season.price
+    return prices
+
+
+def row_seasons(seasons, kind, row):
+    """``row``'s rates from a ``{("hotel" | "flight", id): rates}`` map."""
+    return seasons.get((kind, row.id), ()) if row is not None else ()
+
+
+def activity_rate(activity, persons):
+    """Per-person rate of an activity for the given group size.
+
+    ``rate_1``..``rate_4`` are the rates for 1-4 travellers; ``price`` is the
+    group rate for any other size and stands in for a missing ``rate_n``.
+    """
+    if persons == 1 and activity.rate_1 is not None:
+        return activity.rate_1
+    elif persons == 2 and activity.rate_2 is not None:
+        return activity.rate_2
+    elif persons == 3 and activity.rate_3 is not None:
+        return activity.rate_3
+    elif persons == 4 and activity.rate_4 is not None:
+        return activity.rate_4
+    elif activity.price is not None:
+        return activity.price
+    return 0
+
+
+# Rate vector layout: rate_1..rate_4, then the group rate for any other size
+RATE_SLOTS = 5
+GROUP_SLOT = 4
+
+
+def rate_vector(activity):
+    """Per-person rates of an activity by slot; see ``activity_rate``."""
+    default = activity.price if activity.price is not None else 0
+    rates = (activity.rate_1, activity.rate_2, activity.rate_3, activity.rate_4)
+    return [r if r is not None else default for r in rates] + [default]
+
+
+def rate_slots(persons):
+    """Rate slot of each group size in ``persons`` (an array)."""
+    return np.where((persons >= 1) & (persons <= 4), persons - 1, GROUP_SLOT)
+
+
+# A trip length's activities per day, and the RateTable rows of each day and
+# of the whole trip (each ending in the zero row)
+DayPlan = namedtuple("DayPlan", "days day_rows rows")
+
+
+class RateTable:
+    """Activity rates of one city as an ``(activities + 1, RATE_SLOTS)`` array.
+
+    The last row is all zeros; ``rows`` appends it to every plan so an empty
+    plan still has a row to sum.
+
+    ``templates`` are the city's day-plan rules, ``{num_days: {day: (activity
+    names)}}``. ``plan(num_days)`` compiles the rules for a trip length once
+    and keeps the result.
+    """
+
+    def __init__(self, activities, templates=None):
+        self.activities = tuple(activities)
+        self.templates = templates or {}
+        self.index = {a.id: i for i, a in enumerate(activities)}
+        vectors = [rate_vector(a) for a in activities] + [[0] * RATE_SLOTS]
+        self.rates = np.array(vectors, dtype=np.int64)
+        self.zero_row = len(activities)
+        self._plans = {}
+
+    def rows(self, activities):
+        return [self.index[a.id] for a in activities] + [self.zero_row]
+
+    def plan(self, num_days):
+        plan = self._plans.get(num_days)
+        if plan is None:
+            days = plan_activities(num_days, self.activities, self.templates.get(num_days))
+            days = tuple(tuple(acts) for acts in days)
+            plan = DayPlan(days, tuple(self.rows(acts) for acts in days),
+                           self.rows([a for acts in days for a in acts]))
+            # Compiling twice on a race is harmless: both results are equal
+            self._plans[num_days] = plan
+        return plan
+
+
+def activity_totals(plans, persons):
+    """Activity totals of many plans for many group sizes in one array operation.
+
+    ``plans`` is a list of ``(RateTable, rows)``. Returns an int64 array of
+    shape ``(len(plans), len(persons))``.
+    """
+    persons = np.asarray(persons, dtype=np.int64)
+    starts, blocks, position = [], [], 0
+    for table, rows in plans:
+        starts.append(position)
+        blocks.append(table.rates[rows])
+        position += len(rows)
+    if not blocks:
+        return np.zeros((0, len(persons)), dtype=np.int64)
+    per_person = np.add.reduceat(np.concatenate(blocks), starts)
+    return per_person[:, rate_slots(persons)] * persons
+
+
+def route_key(station):
+    """Normalized station name used in route keys (matches ``flight.source_key``)."""
+    return station.lower()
+
+
+def route_map(flights):
+    """``{(source_key, destination_key): flight}`` with the first flight per route."""
+    routes = {}
+    for f in flights:
+        if f.source_station and f.destination_station:
+            routes.setdefault((route_key(f.source_station), route_key(f.destination_station)), f)
+    return routes
+
+
+def find_flight(routes, source, destination):
+    """Flight from ``source`` to ``destination`` (case-insensitive) in a ``route_map``."""
+    return routes.get((route_key(source), route_key(destination)))
+
+
+def plan_activities(num_days, activities, template=None):
+    """Assign activities to days: pickup first, drop last, tours in between.
+
+    Without a ``template`` tours are spread one per middle day with any extras
+    on the last middle day. A template (``{day: (tour names)}``, see
+    ``models.DayPlanRule``) lists the tours of each middle day instead; names
+    are matched case-insensitively and unknown ones are left out.
+    Returns one list of activities per day.
+    """
+    pickup_acts = [a for a in activities if a.type and a.type.lower() == "pickup"]
+    drop_acts = [a for a in activities if a.type and a.type.lower() == "drop"]
+    tour_acts = [a for a in activities if a.type and a.type.lower() == "tour"]
+
+    if num_days <= 1:
+        return [pickup_acts + drop_acts]
+
+    day_activities = [pickup_acts]
+    num_middle_days = num_days - 2
+    if template is not None:
+        by_name = {}
+        for a in tour_acts:
+            if a.name:
+                by_name.setdefault(a.name.upper(), a)
+        for day in range(2, num_days):
+            names = template.get(day, ())
+            day_activities.append([by_name[n.upper()] for n in names if n.upper() in by_name])
+    else:
+        for i in range(num_middle_days):
+            if i >= len(tour_acts):
+                day_activities.append([])
+            elif len(tour_acts) > num_middle_days and i == num_middle_days - 1:
+                # Last middle day: assign remaining tours
+                day_activities.append(tour_acts[i:])
+            else:
+                day_activities.append([tour_acts[i]])
+    day_activities.append(drop_acts)
+    return day_activities
+
+
+def build_itinerary(destination, duration, flights, hotels, activities, from_city, persons, routes=None,
+                    rates=None, departure=None, seasons=None):
+    """Build a day-by-day itinerary with prices for one package.
+
+    The first hotel is used for every night. Activity rates depend on
+    ``persons``; flight prices are reported per day and only included in
+    ``with_flight``. Pass a prebuilt ``routes`` map to skip building one
+    from ``flights``, and the city's ``RateTable`` to use its compiled day
+    plans (and day-plan templates) instead of laying out ``activities``.
+    With a ``departure`` date, day N's hotel night and flights are priced on
+    departure + N - 1 with the ``seasons`` map (see ``row_seasons``).
+    """
+    num_days = parse_num_days(duration)
+    if routes is None:
+        routes = route_map(flights)
+    onward_flight = find_flight(routes, from_city, destination)
+    return_flight = find_flight(routes, destination, from_city)
+    hotel = hotels[0] if hotels else None
+    if rates is not None:
+        day_activities = rates.plan(num_days).days
+    else:
+        day_activities = plan_activities(num_days, activities)
+
+    def day_prices(row, kind):
+        if departure is None:
+            return None
+        return seasonal_prices(row, row_seasons(seasons or {}, kind, row), departure,
+                               max(len(day_activities), num_days)).tolist()
+
+    hotel_prices = day_prices(hotel, "hotel")
+    onward_prices = day_prices(onward_flight, "flight")
+    return_prices = day_prices(return_flight, "flight")
+
+    days = []
+    for number, acts in enumerate(day_activities, start=1):
+        day_flights = []
+        if number == 1 and onward_flight:
+            day_flights.append(onward_flight)
+        if number == num_days and return_flight:
+            day_flights.append(return_flight)
+        day_hotel = hotel if number < num_days else None
+        if departure is None:
+            flight_price = sum(f.price or 0 for f in day_flights)
+            hotel_price = (day_hotel.price or 0) if day_hotel else 0
+        else:
+            flight_price = ((onward_prices[0] if number == 1 and onward_flight else 0)
+                            + (return_prices[number - 1] if number == num_days and return_flight else 0))
+            hotel_price = hotel_prices[number - 1] if day_hotel else 0
+        days.append(Day(
+            number=number,
+            flights=day_flights,
+            hotel=day_hotel,
+            activities=acts,
+            flight_price=flight_price,
+            hotel_price=hotel_price,
+            activity_price=sum(activity_rate(a, persons) * persons for a in acts),
+        ))
+
+    without_flight = sum(d.hotel_price + d.activity_price for d in days)
+    with_flight = without_flight + sum(d.flight_price for d in days)
+    return Itinerary(num_days=num_days, days=days, with_flight=with_flight, without_flight=without_flight)
+
+
+def fixed_prices(num_days, plan_days, onward_flight, return_flight, hotel):
+    """``(flight total, hotel total)`` of an itinerary, as ``build_itinerary`` lays it out."""
+    flight_total = hotel_total = 0
+    for number in range(1, plan_days + 1):
+        if number == 1 and onward_flight:
+            flight_total += onward_flight.price or 0
+        if number == num_days and return_flight:
+            flight_total += return_flight.price or 0
+        if number < num_days and hotel:
+            hotel_total += hotel.price or 0
+    return flight_total, hotel_total
+
+
+# One package to price with ``price_grids``; ``rates`` is the city's RateTable
+GridItem = namedtuple("GridItem", "destination duration hotels activities routes rates from_city")
+# ``activities`` is ``(items, persons)``, ``flights`` and ``hotels`` are ``(items,)``
+GridParts = namedtuple("GridParts", "activities flights hotels")
+
+
+def grid_parts(items, persons):
+    """Price components of many packages for many group sizes.
+
+    Items sharing a city and number of days share one compiled ``DayPlan``, so
+    a listing prices each distinct plan once.
+    """
+    plans, plan_index, item_plans = [], {}, []
+    fixed = np.zeros((len(items), 2), dtype=np.int64)
+    for i, item in enumerate(items):
+        num_days = parse_num_days(item.duration)
+        key = (id(item.rates), num_days)
+        if key not in plan_index:
+            day_plan = item.rates.plan(num_days)
+            plan_index[key] = (len(plans), len(day_plan.days))
+            plans.append((item.rates, day_plan.rows))
+        plan, plan_days = plan_index[key]
+        item_plans.append(plan)
+        fixed[i] = fixed_prices(num_days, plan_days,
+                                find_flight(item.routes, item.from_city, item.destination),
+                                find_flight(item.routes, item.destination, item.from_city),
+                                item.hotels[0] if item.hotels else None)
+    activities = activity_totals(plans, persons)[item_plans]
+    return GridParts(activities, fixed[:, 0], fixed[:, 1])
+
+
+def price_grids(items, persons):
+    """``(with_flight, without_flight)`` arrays of shape ``(len(items), len(persons))``.
+
+    Every cell equals the matching ``build_itinerary`` total.
+    """
+    parts = grid_parts(items, persons)
+    without_flight = parts.activities + parts.hotels[:, None]
+    return without_flight + parts.flights[:, None], without_flight
+
+
+def item_prices(itinerary, flight_option="with"):
+    """Per-day price components keyed the way the detail page expects them."""
+    prices = {}
+    for day in itinerary.days:
+        prices[f"flight-day{day.number}"] = day.flight_price if flight_option != "without" else 0
+    for day in itinerary.days:
+        if day.number < itinerary.num_days:
+            prices[f"hotel-day{day.number}"] = day.hotel_price
+    for day in itinerary.days:
+        prices[f"activity-day{day.number}"] = day.activity_price
+    return prices
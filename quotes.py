@@ -0,0 +1,137 @@
+"""Batch quotes: many (package, departure city, group size, flight option)
+combinations priced in one request.
+
+Requests are grouped by the package's destination city, so each city's catalog
+rows are taken from the snapshot (and shipped to a worker) once. Within a group
+every (package, departure city) pair is priced for all the group sizes asked
+for in one ``pricing.price_grids`` call, which answers both flight options.
+Groups are priced in a process pool sized to the CPUs this process may run on:
+the grids are numpy arrays, but building them and the itineraries around them
+is Python code that holds the interpreter lock, so threads would not overlap.
+Results stream back as NDJSON in completion order, each line carrying the
+``index`` of its request. Every item is validated before the first line is
+sent; ``persons`` must be between 1 and ``pricing.MAX_GROUP_SIZE``.
+
+    QUOTE_WORKERS   pool size; default the available CPUs, 1 prices inline
+"""
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pricing
+
+
+MAX_QUOTES = 5000
+FLIGHT_OPTIONS = ("with", "without")
+DEFAULT_FROM_CITY = "New Delhi"
+
+# ``package`` is (id, destination, duration, price)
+QuoteJob = namedtuple("QuoteJob", "index package from_city persons flight_option")
+
+
+class QuoteError(ValueError):
+    pass
+
+
+def parse_quote(item):
+    """``(package_id, from_city, persons, flight_option)`` from one request item."""
+    if not isinstance(item, dict):
+        raise QuoteError("quote must be an object")
+    try:
+        package_id = int(item["package_id"])
+    except (KeyError, TypeError, ValueError):
+        raise QuoteError("package_id must be an integer") from None
+    try:
+        persons = int(item.get("persons", 1))
+    except (TypeError, ValueError):
+        raise QuoteError("persons must be an integer") from None
+    if persons < 1:
+        raise QuoteError("persons must be at least 1")
+    if persons > pricing.MAX_GROUP_SIZE:
+        raise QuoteError(f"persons must be at most {pricing.MAX_GROUP_SIZE}")
+    flight_option = item.get("flight_option", "with")
+    if flight_option not in FLIGHT_OPTIONS:
+        raise QuoteError("flight_option must be 'with' or 'without'")
+    from_city = item.get("from_city") or DEFAULT_FROM_CITY
+    if not isinstance(from_city, str):
+        raise QuoteError("from_city must be a string")
+    return package_id, from_city, persons, flight_option
+
+
+def price_group(entry, jobs):
+    """Quote every job of one destination; ``entry`` is its ``CityCatalog`` or None."""
+    if entry is not None:
+        pairs = {}
+        for job in jobs:
+            pairs.setdefault((job.package, pricing.route_key(job.from_city)), job.from_city)
+        persons = sorted({job.persons for job in jobs})
+        items = [pricing.GridItem(package[1], package[2], entry.hotels, entry.activities,
+                                  entry.routes, entry.rates, from_city)
+                 for (package, _), from_city in pairs.items()]
+        with_flight, without_flight = pricing.price_grids(items, persons)
+        columns = {p: j for j, p in enumerate(persons)}
+        rows = {pair: i for i, pair in enumerate(pairs)}
+
+    results = []
+    for job in jobs:
+        package_id, destination, duration, list_price = job.package
+        if entry is None:
+            total = list_price
+        else:
+            i = rows[(job.package, pricing.route_key(job.from_city))]
+            grid = with_flight if job.flight_option == "with" else without_flight
+            total = int(grid[i, columns[job.persons]])
+        results.append({
+            "index": job.index,
+            "package_id": package_id,
+            "from_city": job.from_city,
+            "persons": job.persons,
+            "flight_option": job.flight_option,
+            "total": total,
+        })
+    return results
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class QuotePool:
+    """Process pool for ``price_group``, created on first use in each process."""
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._workers = None
+        self._lock = threading.Lock()
+
+    def executor(self, workers):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid() or self._workers != workers:
+                if self._executor is not None and self._pid == os.getpid():
+                    self._executor.shutdown(wait=False)
+                # spawn: forking a threaded server process is not safe
+                self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+                self._pid = os.getpid()
+                self._workers = workers
+            return self._executor
+
+
+pool = QuotePool()
+
+
+def run_groups(groups, workers):
+    """Price ``(entry, jobs)`` groups, yielding each group's results when it finishes."""
+    if workers <= 1 or len(groups) <= 1:
+        for entry, jobs in groups:
+            yield price_group(entry, jobs)
+        return
+    executor = pool.executor(workers)
+    futures = [executor.submit(price_group, entry, jobs) for entry, jobs in groups]
+    for future in as_completed(futures):
+        yield future.result()
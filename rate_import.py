@@ -0,0 +1,371 @@
+"""Streaming import of supplier rate sheets.
+
+Flight, hotel and activity sheets arrive as CSV or JSONL (optionally gzipped)
+with one rate per row and the city given by name (``city``) or id
+(``city_id``). A sheet flows through a generator pipeline, so memory stays
+bounded whatever the file size:
+
+    read -> validate -> batch -> write -> refresh
+
+``validate`` coerces numbers and resolves city names through an in-memory
+name -> id map. Rows it cannot use are counted and optionally written to a
+rejects file. ``write`` loads each batch into a temporary staging table with one
+``executemany``, then upserts it with two set-based statements: an
+``UPDATE ... FROM`` for rows matching an existing key and an
+``INSERT ... SELECT`` for the rest. ``refresh`` then recomputes the price table
+rows of the batch's cities and bumps the catalog version, and the batch
+commits with both: a reader never sees new rates next to old package prices,
+or pages cached under a version whose prices are not written yet.
+
+Upsert keys:
+
+    flights     city, source_station, destination_station (case-insensitive), details
+    hotels      city, name
+    activities  city, name
+
+The import writes through Core and bypasses the ORM session events. If it
+stops early, the batches committed so far stay, each with its prices and the
+cities it created; a failed batch leaves neither its rates nor its cities.
+
+    flask --app app rates import hotels hotels.csv [--chunk-size 5000] [--create-cities] [--rejects bad.jsonl]
+"""
+import csv
+import gzip
+import json
+import time
+from collections import namedtuple
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Column, Integer, MetaData, Table, exists, func, insert, or_, select, update
+
+from catalog import bump_version
+from models import db, City, Flight, Hotel, Activity
+from price_table import refresh_prices
+
+
+CHUNK_SIZE = 5000
+PRICE_REFRESH_CITIES = 20
+
+# ``fields`` are the sheet columns written to the table, ``required`` must be
+# present and ``numbers`` are parsed as non-negative integers
+SheetKind = namedtuple("SheetKind", "model fields required numbers key")
+
+KINDS = {
+    "flights": SheetKind(
+        Flight,
+        ("source_station", "destination_station", "price", "details"),
+        ("source_station", "destination_station", "price"),
+        ("price",),
+        ("source_station", "destination_station", "details"),
+    ),
+    "hotels": SheetKind(
+        Hotel,
+        ("name", "address", "room_category", "price", "meal", "details"),
+        ("name", "price"),
+        ("price",),
+        ("name",),
+    ),
+    "activities": SheetKind(
+        Activity,
+        ("name", "type", "rate_1", "rate_2", "rate_3", "rate_4", "price", "details"),
+        ("name", "type"),
+        ("rate_1", "rate_2", "rate_3", "rate_4", "price"),
+        ("name",),
+    ),
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+class StageStats:
+    """Rows and time per pipeline stage.
+
+    Pipeline stages are nested generators, so a stage's clock also runs while
+    the stages feeding it work; ``report`` subtracts that to get its own time.
+    """
+
+    def __init__(self):
+        self.stages = []   # [name, rows, seconds, nested]
+
+    def timed(self, name, iterable, size=None):
+        """Wrap a pipeline stage; ``size(item)`` counts rows in batched items."""
+        # Registered now: generator bodies only start on the first next()
+        stage = [name, 0, 0.0, True]
+        self.stages.append(stage)
+        return self._run(stage, iter(iterable), size)
+
+    def _run(self, stage, iterator, size):
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stage[2] += time.perf_counter() - start
+                return
+            stage[2] += time.perf_counter() - start
+            stage[1] += size(item) if size else 1
+            yield item
+
+    def add(self, name, rows, seconds):
+        self.stages.append([name, rows, seconds, False])
+
+    def report(self):
+        lines = []
+        upstream = 0.0
+        for name, rows, seconds, nested in self.stages:
+            own = seconds - upstream if nested else seconds
+            if nested:
+                upstream = seconds
+            rate = f"{rows / own:>12,.0f}" if own > 0 else f"{'-':>12}"
+            lines.append(f"{name:>10}: {rows:>9} rows  {own:8.2f}s  {rate} rows/s")
+        return lines
+
+
+# ---------------- READ ---------------- #
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_rows(path):
+    """Yield ``(line number, dict)`` from a CSV or JSONL (``.jsonl``/``.ndjson``) file."""
+    name = path[:-3] if path.endswith(".gz") else path
+    with _open(path) as f:
+        if name.endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as e:
+                        yield number, RowError(f"invalid JSON: {e}")
+        else:
+            # Line 1 is the header
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                yield number, row
+
+
+# ---------------- VALIDATE ---------------- #
+def parse_number(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        number = value
+    else:
+        try:
+            number = int(float(str(value).replace(",", "").strip()))
+        except (ValueError, OverflowError):
+            raise RowError(f"not a number: {value!r}") from None
+    if number < 0:
+        raise RowError(f"negative value: {number}")
+    return number
+
+
+class CityResolver:
+    """City name -> id map loaded once, optionally creating missing cities.
+
+    New cities are inserted in the open transaction and stay ``pending`` until
+    ``commit`` records that it committed; only then do they count as
+    ``created``.
+    """
+
+    def __init__(self, conn, create=False):
+        self.conn = conn
+        self.create = create
+        self.ids = {name.lower(): id for id, name in conn.execute(select(City.id, City.name))}
+        self.known_ids = set(self.ids.values())
+        self.pending = set()
+        self.created = set()
+
+    def commit(self):
+        self.created |= self.pending
+        self.pending = set()
+
+    def resolve(self, row):
+        city_id = row.get("city_id")
+        if city_id not in (None, ""):
+            city_id = parse_number(city_id)
+            if city_id not in self.known_ids:
+                raise RowError(f"unknown city id: {city_id}")
+            return city_id
+        name = str(row.get("city") or "").strip()
+        if not name:
+            raise RowError("missing city")
+        city_id = self.ids.get(name.lower())
+        if city_id is None:
+            if not self.create:
+                raise RowError(f"unknown city: {name}")
+            city_id = self.conn.execute(insert(City).values(name=name)).inserted_primary_key[0]
+            self.ids[name.lower()] = city_id
+            self.known_ids.add(city_id)
+            self.pending.add(city_id)
+        return city_id
+
+
+def validate(rows, kind, cities, rejects):
+    """Yield clean row dicts ready for the staging table; failures go to ``rejects``."""
+    for number, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            if not isinstance(row, dict):
+                raise RowError("row is not an object")
+            clean = {"city_id": cities.resolve(row)}
+            for field in kind.fields:
+                value = row.get(field)
+                if isinstance(value, str):
+                    value = value.strip()
+                if value in (None, ""):
+                    if field in kind.required:
+                        raise RowError(f"missing {field}")
+                    value = None
+                elif field in kind.numbers:
+                    value = parse_number(value)
+                else:
+                    value = str(value)
+                clean[field] = value
+        except RowError as e:
+            rejects(number, row, str(e))
+            continue
+        yield clean
+
+
+def _row_key(row, kind):
+    return (row["city_id"],) + tuple(
+        row[f].lower() if f.endswith("_station") else row[f] for f in kind.key)
+
+
+def batch(rows, kind, size):
+    """Group rows into lists of ``size``; within a batch the last row per key wins."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield list({_row_key(r, kind): r for r in chunk}.values())
+
+
+# ---------------- WRITE ---------------- #
+def staging_table(kind):
+    target = kind.model.__table__
+    columns = [Column("city_id", Integer)] + [Column(f, target.c[f].type) for f in kind.fields]
+    return Table(f"import_{target.name}", MetaData(), *columns, prefixes=["TEMPORARY"])
+
+
+def key_match(target, staging, kind, optional=()):
+    """Conditions matching ``target`` rows to ``staging`` rows on ``kind.key``.
+
+    Fields in ``optional`` match any value when the staging row leaves them NULL.
+    """
+    conditions = [target.c.city_id == staging.c.city_id]
+    for field in kind.key:
+        if field == "source_station":
+            conditions.append(target.c.source_key == func.lower(staging.c.source_station))
+        elif field == "destination_station":
+            conditions.append(target.c.destination_key == func.lower(staging.c.destination_station))
+        elif field in optional:
+            conditions.append(or_(staging.c[field].is_(None), target.c[field] == staging.c[field]))
+        else:
+            conditions.append(target.c[field].is_not_distinct_from(staging.c[field]))
+    return conditions
+
+
+def write(conn, batches, kind, staging, counts):
+    """Upsert each batch, leaving its transaction open for ``refresh``; yields the batches written."""
+    target = kind.model.__table__
+    match = key_match(target, staging, kind)
+    updated_fields = [f for f in kind.fields if f not in kind.key]
+    upsert_update = (update(target).where(*match)
+                     .values({f: staging.c[f] for f in updated_fields}))
+    upsert_insert = insert(target).from_select(
+        ["city_id", *kind.fields],
+        select(staging.c.city_id, *(staging.c[f] for f in kind.fields))
+        .where(~exists().where(*match)))
+
+    for rows in batches:
+        conn.execute(staging.delete())
+        conn.execute(insert(staging), rows)
+        counts["updated"] += conn.execute(upsert_update).rowcount
+        counts["inserted"] += conn.execute(upsert_insert).rowcount
+        yield rows
+
+
+def _refresh_cities(conn, city_ids):
+    city_ids = sorted(city_ids)
+    # A few cities at a time: a refresh holds every row of its cities in memory
+    return sum(refresh_prices(conn, city_ids=city_ids[i:i + PRICE_REFRESH_CITIES])
+               for i in range(0, len(city_ids), PRICE_REFRESH_CITIES))
+
+
+def _commit_cities(conn, city_ids, cities, counts):
+    refreshed = _refresh_cities(conn, city_ids)
+    bump_version(conn)
+    conn.commit()
+    cities.commit()
+    counts["city_ids"].update(city_ids)
+    return refreshed
+
+
+def refresh(conn, batches, cities, counts):
+    """Refresh each written batch's price rows, bump the version and commit; yields rows refreshed."""
+    for rows in batches:
+        # A new city can give packages that already name it a catalog entry,
+        # even when none of its rows are in the batch
+        yield _commit_cities(conn, {r["city_id"] for r in rows} | cities.pending, cities, counts)
+
+
+def import_sheet(conn, kind_name, path, chunk_size=CHUNK_SIZE, create_cities=False, rejects=None):
+    """Stream one rate sheet into the catalog on ``conn``; returns (counts, stats)."""
+    kind = KINDS[kind_name]
+    stats = StageStats()
+    counts = {"inserted": 0, "updated": 0, "rejected": 0, "cities_created": 0, "city_ids": set()}
+
+    def reject(number, row, reason):
+        counts["rejected"] += 1
+        if rejects is not None:
+            rejects.write(json.dumps({"line": number, "error": reason,
+                                      "row": row if isinstance(row, dict) else None}, default=str) + "\n")
+
+    staging = staging_table(kind)
+    staging.create(conn)
+    cities = CityResolver(conn, create_cities)
+    try:
+        pipeline = stats.timed("read", read_rows(path))
+        pipeline = stats.timed("validate", validate(pipeline, kind, cities, reject))
+        pipeline = stats.timed("batch", batch(pipeline, kind, chunk_size), len)
+        pipeline = stats.timed("write", write(conn, pipeline, kind, staging, counts), len)
+        for _ in stats.timed("prices", refresh(conn, pipeline, cities, counts), lambda refreshed: refreshed):
+            pass
+        # Cities created for rows rejected after the last batch
+        if cities.pending:
+            _commit_cities(conn, cities.pending, cities, counts)
+    finally:
+        # A failed batch takes the cities it created with it
+        conn.rollback()
+        counts["cities_created"] = len(cities.created)
+        staging.drop(conn)
+        conn.commit()
+    return counts, stats
+
+
+# ---------------- CLI ---------------- #
+cli = AppGroup("rates", help="Import supplier rate sheets.")
+
+
+@cli.command("import")
+@click.argument("kind", type=click.Choice(sorted(KINDS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=CHUNK_SIZE, show_default=True, help="Rows per transaction.")
+@click.option("--create-cities", is_flag=True, help="Create cities missing from the catalog.")
+@click.option("--rejects", type=click.File("w"), help="Write rejected rows here as JSONL.")
+def import_command(kind, path, chunk_size, create_cities, rejects):
+    """Upsert a CSV or JSONL rate sheet into the catalog."""
+    start = time.perf_counter()
+    with db.engine.connect() as conn:
+        counts, stats = import_sheet(conn, kind, path, chunk_size, create_cities, rejects)
+    for line in stats.report():
+        click.echo(line)
+    click.echo(f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['rejected']} rejected, "
+               f"{counts['cities_created']} cities created in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,180 @@
+"""Bulk price updates for hotels, flights and activities.
+
+``POST /admin/rates`` takes any number of price changes in one JSON body:
+
+    {"hotels": [{"id": 12, "price": 5400},
+                {"city": "Goa", "name": "Taj Exotica Resort & Spa", "price": 8000}],
+     "flights": [{"city": "Goa", "source_station": "New Delhi", "destination_station": "Goa",
+                  "details": "...", "price": 6100}],
+     "activities": [{"id": 7, "rate_1": 2500, "rate_2": 1400}]}
+
+A change names its row by ``id``, or by the rate sheet key (see
+``rate_import.KINDS``) with the city given by ``city`` or ``city_id``. Fields
+left out keep their value. A flight change without ``details`` matches the
+route whatever its details; if that fits more than one flight the change is
+counted as ``ambiguous`` and not applied. The payload is validated as a whole; any bad
+change rejects it.
+
+Changes are loaded into a temporary staging table per kind and applied with
+set-based ``UPDATE ... FROM`` statements, one matching by id and one by key,
+all in one transaction together with the price table refresh and the catalog
+version bump. Rows whose values do not change are not counted or touched.
+After the commit ``catalog.rates_changed`` is sent with the ids of the cities
+that changed, so in-process caches can refresh just those cities.
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, delete, exists, func, insert, or_, select, update
+
+from catalog import bump_version, rates_changed, read_version
+from price_table import refresh_prices
+from rate_import import KINDS, CityResolver, RowError, key_match, parse_number
+
+
+MAX_CHANGES = 50000
+MAX_ERRORS = 100
+# Key fields a change may leave out to match any value
+OPTIONAL_KEY_FIELDS = ("details",)
+
+# Columns a change may set, per kind
+PRICE_FIELDS = {
+    "hotels": ("price",),
+    "flights": ("price",),
+    "activities": ("rate_1", "rate_2", "rate_3", "rate_4", "price"),
+}
+
+
+class UpdateError(ValueError):
+    """A payload that can't be applied; ``errors`` lists the bad changes."""
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+def _parse_change(item, kind_name, cities):
+    if not isinstance(item, dict):
+        raise RowError("change must be an object")
+    kind = KINDS[kind_name]
+    row = {"target_id": None, "city_id": None, **dict.fromkeys(kind.key)}
+    if item.get("id") not in (None, ""):
+        row["target_id"] = parse_number(item["id"])
+    else:
+        row["city_id"] = cities.resolve(item)
+        for field in kind.key:
+            value = item.get(field)
+            if value in (None, ""):
+                if field in kind.required:
+                    raise RowError(f"missing {field} (or id)")
+                value = None
+            row[field] = None if value is None else str(value).strip()
+    values = {f: parse_number(item[f]) for f in PRICE_FIELDS[kind_name] if item.get(f) not in (None, "")}
+    if not values:
+        raise RowError(f"no price given; expected one of {', '.join(PRICE_FIELDS[kind_name])}")
+    return {**row, **dict.fromkeys(PRICE_FIELDS[kind_name]), **values}
+
+
+def parse_changes(body, conn):
+    """``{kind: [staging rows]}`` from a request body; raises ``UpdateError``."""
+    if not isinstance(body, dict) or not body or set(body) - set(KINDS):
+        raise UpdateError(f"body must be an object with any of {', '.join(sorted(KINDS))}")
+    if any(not isinstance(items, list) for items in body.values()):
+        raise UpdateError("each kind must be a list of changes")
+    if sum(len(items) for items in body.values()) > MAX_CHANGES:
+        raise UpdateError(f"at most {MAX_CHANGES} changes per request")
+
+    cities = CityResolver(conn)
+    changes, errors = {}, []
+    for kind_name, items in body.items():
+        rows = {}
+        for index, item in enumerate(items):
+            try:
+                row = _parse_change(item, kind_name, cities)
+            except RowError as e:
+                errors.append({"kind": kind_name, "index": index, "error": str(e)})
+                continue
+            # The last change to a row wins
+            key = row["target_id"] if row["target_id"] is not None else \
+                tuple(row[f] for f in ("city_id",) + KINDS[kind_name].key)
+            rows.pop(key, None)
+            rows[key] = row
+        changes[kind_name] = list(rows.values())
+    if errors:
+        raise UpdateError(f"{len(errors)} invalid changes", errors[:MAX_ERRORS])
+    return changes
+
+
+def staging_table(kind_name):
+    kind = KINDS[kind_name]
+    target = kind.model.__table__
+    columns = [Column("target_id", Integer), Column("city_id", Integer)]
+    columns += [Column(f, target.c[f].type) for f in kind.key + PRICE_FIELDS[kind_name]]
+    return Table(f"update_{target.name}", MetaData(), *columns, prefixes=["TEMPORARY"])
+
+
+def _apply(conn, kind_name, rows):
+    """Apply one kind's changes; returns (rows changed, unmatched, ambiguous, city ids)."""
+    kind = KINDS[kind_name]
+    target = kind.model.__table__
+    staging = staging_table(kind_name)
+    staging.create(conn)
+    try:
+        conn.execute(insert(staging), rows)
+        fields = PRICE_FIELDS[kind_name]
+        new_values = {f: func.coalesce(staging.c[f], target.c[f]) for f in fields}
+        differs = or_(*(target.c[f].is_distinct_from(new_values[f]) for f in fields))
+        by_id = [target.c.id == staging.c.target_id]
+        by_key = [staging.c.target_id.is_(None), *key_match(target, staging, kind, OPTIONAL_KEY_FIELDS)]
+        # A key change that fits several rows (a flight without details) is
+        # left out rather than applied to all of them
+        matches = select(func.count()).select_from(target).where(*by_key).scalar_subquery()
+        ambiguous = conn.execute(delete(staging).where(staging.c.target_id.is_(None), matches > 1)).rowcount
+
+        city_ids, changed = set(), 0
+        for match in (by_id, by_key):
+            statement = update(target).where(*match, differs).values(new_values).returning(target.c.city_id)
+            result = conn.execute(statement).scalars().all()
+            changed += len(result)
+            city_ids.update(c for c in result if c is not None)
+        unmatched = conn.execute(
+            select(func.count()).select_from(staging)
+            .where(~exists().where(target.c.id == staging.c.target_id))
+            .where(~exists().where(*by_key))).scalar()
+    finally:
+        staging.drop(conn)
+    return changed, unmatched, ambiguous, city_ids
+
+
+def apply_changes(conn, changes):
+    """Apply parsed changes in one transaction on ``conn`` and send ``rates_changed``.
+
+    Returns ``{"updated", "unmatched", "ambiguous", "kinds", "city_ids"}``.
+    """
+    report = {"updated": 0, "unmatched": 0, "ambiguous": 0, "kinds": {}, "city_ids": []}
+    city_ids = set()
+    try:
+        # Take the write lock first, so no other write lands between reading
+        # the version and bumping it
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        previous_version = read_version(conn)
+        for kind_name, rows in changes.items():
+            if not rows:
+                continue
+            changed, unmatched, ambiguous, touched = _apply(conn, kind_name, rows)
+            report["kinds"][kind_name] = {"changes": len(rows), "updated": changed, "unmatched": unmatched,
+                                          "ambiguous": ambiguous}
+            report["updated"] += changed
+            report["unmatched"] += unmatched
+            report["ambiguous"] += ambiguous
+            city_ids |= touched
+        if city_ids:
+            refresh_prices(conn, city_ids=sorted(city_ids))
+            bump_version(conn)
+            version = read_version(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    report["city_ids"] = sorted(city_ids)
+    if city_ids:
+        rates_changed.send(None, city_ids=frozenset(city_ids), previous_version=previous_version,
+                           version=version)
+    return report
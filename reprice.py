@@ -0,0 +1,177 @@
+"""Incremental re-pricing of one itinerary edit on the detail page.
+
+The page sends what it shows, not what it costs: the group size, flight
+option, departure city and departure date (``YYYY-MM-DD``, optional; seasonal
+rates apply on it as on the page), the hotels it swapped in (``{"2": "Sea View
+Inn"}``, by night) and the components it took off (``removed``, keys as in
+``pricing.item_prices``: ``flight-dayN``, ``hotel-dayN``, ``activity-dayN``),
+plus one change:
+
+    {"hotel": {"day": 2, "name": "Sea View Inn"}}   swap the hotel for night 2
+    {"persons": 3}                                   change the group size
+    {"flight_option": "without"}                     drop or add the flights
+
+Every price comes from the catalog snapshot; the page's own figures are never
+trusted. That is why the current state is not taken from the page: its whole
+itinerary is rebuilt from the request's selections with
+``pricing.build_itinerary``. The change is then priced on its own, component
+by component: one ``hotel-dayN`` for a swap, the ``activity-dayN`` of every
+day for a new group size (one ``pricing.activity_totals`` call over the
+city's compiled day plan), the ``flight-dayN`` of every day for a flight
+option. The response carries those components, the delta against the rebuilt
+itinerary and the new total.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+import pricing
+
+
+FLIGHT_OPTIONS = ("with", "without")
+
+# ``hotels`` is ``{night: hotel name}`` for the swapped hotels, ``removed`` the
+# components taken off the page
+RepriceState = namedtuple("RepriceState", "from_city persons flight_option departure hotels removed")
+
+
+class RepriceError(ValueError):
+    pass
+
+
+def _persons(value):
+    try:
+        persons = int(value)
+    except (TypeError, ValueError):
+        raise RepriceError("persons must be an integer") from None
+    if persons < 1:
+        raise RepriceError("persons must be at least 1")
+    if persons > pricing.MAX_GROUP_SIZE:
+        raise RepriceError(f"persons must be at most {pricing.MAX_GROUP_SIZE}")
+    return persons
+
+
+def _day(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RepriceError("hotel day must be an integer") from None
+
+
+def _flight_option(value):
+    if value not in FLIGHT_OPTIONS:
+        raise RepriceError("flight_option must be 'with' or 'without'")
+    return value
+
+
+def parse_request(body):
+    """``(RepriceState, change)`` from a request body; raises ``RepriceError``."""
+    if not isinstance(body, dict):
+        raise RepriceError("body must be an object")
+    hotels = body.get("hotels") or {}
+    if not isinstance(hotels, dict) or not all(isinstance(name, str) for name in hotels.values()):
+        raise RepriceError("hotels must be an object of night: hotel name")
+    hotels = {_day(day): name for day, name in hotels.items()}
+    removed = body.get("removed") or []
+    if not isinstance(removed, list) or not all(isinstance(key, str) for key in removed):
+        raise RepriceError("removed must be a list of components")
+    from_city = body.get("from_city") or "New Delhi"
+    if not isinstance(from_city, str):
+        raise RepriceError("from_city must be a string")
+    departure = body.get("departure") or None
+    try:
+        departure = date.fromisoformat(departure) if departure is not None else None
+    except (TypeError, ValueError):
+        raise RepriceError("departure must be YYYY-MM-DD") from None
+    state = RepriceState(from_city, _persons(body.get("persons", 1)),
+                         _flight_option(body.get("flight_option", "with")), departure, hotels,
+                         frozenset(removed))
+
+    change = body.get("change")
+    if not isinstance(change, dict) or len(change) != 1:
+        raise RepriceError("change must be an object with one of 'hotel', 'persons' or 'flight_option'")
+    (kind, value), = change.items()
+    if kind == "persons":
+        return state, ("persons", _persons(value))
+    if kind == "flight_option":
+        return state, ("flight_option", _flight_option(value))
+    if kind == "hotel":
+        if not isinstance(value, dict) or not isinstance(value.get("name"), str):
+            raise RepriceError("hotel change needs a day and a name")
+        return state, ("hotel", (_day(value.get("day")), value["name"]))
+    raise RepriceError("change must be an object with one of 'hotel', 'persons' or 'flight_option'")
+
+
+def _price_on(entry, kind, row, departure, day):
+    """``row``'s price on itinerary ``day``; its undated price without a departure."""
+    if departure is None:
+        return row.price or 0
+    first_day = departure + timedelta(days=day - 1)
+    return int(pricing.seasonal_prices(row, pricing.row_seasons(entry.seasons, kind, row), first_day, 1)[0])
+
+
+def _hotel_price(package, snapshot, state, num_days, day, name):
+    if not 1 <= day < num_days:
+        raise RepriceError(f"hotel day must be between 1 and {num_days - 1}")
+    hotel = snapshot.hotel(package.destination, name)
+    if hotel is None:
+        raise RepriceError(f"unknown hotel: {name}")
+    return _price_on(snapshot.city(package.destination), "hotel", hotel, state.departure, day)
+
+
+def current_prices(package, snapshot, state):
+    """The page's ``{component: price}`` for ``state``, priced from the catalog."""
+    entry = snapshot.city(package.destination)
+    if entry is None:
+        raise RepriceError("package has no catalog entry to price against")
+    itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights, entry.hotels,
+                                        entry.activities, state.from_city, state.persons, entry.routes,
+                                        entry.rates, state.departure, entry.seasons)
+    prices = pricing.item_prices(itinerary, state.flight_option)
+    for day, name in state.hotels.items():
+        prices[f"hotel-day{day}"] = _hotel_price(package, snapshot, state, itinerary.num_days, day, name)
+    return prices
+
+
+def changed_components(package, snapshot, state, change):
+    """``{component: new price}`` for the components ``change`` touches."""
+    kind, value = change
+    num_days = pricing.parse_num_days(package.duration)
+    entry = snapshot.city(package.destination)
+    if entry is None:
+        raise RepriceError("package has no catalog entry to price against")
+
+    if kind == "hotel":
+        day, name = value
+        return {f"hotel-day{day}": _hotel_price(package, snapshot, state, num_days, day, name)}
+
+    if kind == "persons":
+        plans = [(entry.rates, rows) for rows in entry.rates.plan(num_days).day_rows]
+        totals = pricing.activity_totals(plans, [value])[:, 0].tolist()
+        return {f"activity-day{number}": total for number, total in enumerate(totals, start=1)}
+
+    # flight_option: flights are on day 1 (onward) and the last day (return)
+    prices = dict.fromkeys(range(1, max(num_days, 1) + 1), 0)
+    if value == "with":
+        onward = pricing.find_flight(entry.routes, state.from_city, package.destination)
+        back = pricing.find_flight(entry.routes, package.destination, state.from_city)
+        if onward:
+            prices[1] += _price_on(entry, "flight", onward, state.departure, 1)
+        if back and num_days in prices:
+            prices[num_days] += _price_on(entry, "flight", back, state.departure, num_days)
+    return {f"flight-day{number}": price for number, price in prices.items()}
+
+
+def reprice(package, snapshot, state, change):
+    """Apply one change; returns the response body."""
+    current = current_prices(package, snapshot, state)
+    changed = changed_components(package, snapshot, state, change)
+    kept = {key: price for key, price in current.items() if key not in state.removed}
+    delta = sum(price - kept[key] for key, price in changed.items() if key in kept)
+    kind, value = change
+    return {
+        "changed": changed,
+        "delta": delta,
+        "total": sum(kept.values()) + delta,
+        "persons": value if kind == "persons" else state.persons,
+        "flight_option": value if kind == "flight_option" else state.flight_option,
+    }
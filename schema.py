@@ -0,0 +1,48 @@
+"""Schema upgrades for existing databases.
+
+``db.create_all()`` only creates missing tables. ``upgrade()`` also adds the
+columns and indexes an older ``holidays.db`` lacks and backfills derived data,
+so an existing file keeps working without a reseed.
+"""
+from sqlalchemy import func, inspect, select
+from sqlalchemy.schema import CreateColumn
+
+import search
+from bookings import rebuild_stats
+from models import db, Booking, BookingStat, Package, PackagePrice
+from price_table import refresh_prices
+
+
+def _add_missing_columns(conn):
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                # SQLite can only ALTER in plain and VIRTUAL generated columns,
+                # which is all the models add after the fact
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+
+def _create_missing_indexes(conn):
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def upgrade():
+    db.create_all()
+    conn = db.session.connection()
+    _add_missing_columns(conn)
+    _create_missing_indexes(conn)
+    search.ensure_index(conn)
+    has_packages = db.session.execute(select(func.count()).select_from(Package)).scalar()
+    has_prices = db.session.execute(select(func.count()).select_from(PackagePrice)).scalar()
+    if has_packages and not has_prices:
+        refresh_prices(db.session.connection(), full=True)
+    has_bookings = db.session.execute(select(Booking.id).limit(1)).scalar()
+    has_stats = db.session.execute(select(BookingStat.package_id).limit(1)).scalar()
+    if has_bookings and not has_stats:
+        rebuild_stats(db.session.connection())
+    db.session.commit()
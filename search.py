@@ -0,0 +1,91 @@
+"""Package search: FTS5 trigram index and destination autocomplete.
+
+``package_fts`` is an external-content FTS5 table over ``package.name``,
+``destination`` and ``type`` using the trigram tokenizer, which lets SQLite
+answer ``LIKE '%x%'`` from the index instead of scanning ``package``. Triggers
+keep it in sync on insert, update and delete, whatever the write path.
+
+``DestinationIndex`` is the in-memory prefix structure behind
+``/api/destinations/suggest``; the catalog snapshot builds one per version.
+"""
+from bisect import bisect_left
+
+from sqlalchemy import DDL, column, event, select, table, text
+
+from models import Package
+
+
+package_fts = table("package_fts", column("rowid"), column("name"), column("destination"), column("type"))
+
+_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS package_fts USING fts5("
+    "name, destination, type, content='package', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS package_fts_ai AFTER INSERT ON package BEGIN "
+    "INSERT INTO package_fts(rowid, name, destination, type) VALUES (new.id, new.name, new.destination, new.type); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS package_fts_ad AFTER DELETE ON package BEGIN "
+    "INSERT INTO package_fts(package_fts, rowid, name, destination, type) "
+    "VALUES ('delete', old.id, old.name, old.destination, old.type); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS package_fts_au AFTER UPDATE ON package BEGIN "
+    "INSERT INTO package_fts(package_fts, rowid, name, destination, type) "
+    "VALUES ('delete', old.id, old.name, old.destination, old.type); "
+    "INSERT INTO package_fts(rowid, name, destination, type) VALUES (new.id, new.name, new.destination, new.type); "
+    "END",
+]
+
+for _statement in _CREATE:
+    event.listen(Package.__table__, "after_create", DDL(_statement))
+# The triggers go with the package table; the index must go too or a
+# recreated package table would start out with stale index content
+event.listen(Package.__table__, "before_drop", DDL("DROP TABLE IF EXISTS package_fts"))
+
+
+def ensure_index(conn):
+    """Create and fill ``package_fts`` on a database that predates it."""
+    exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'package_fts'")).first()
+    for statement in _CREATE:
+        conn.exec_driver_sql(statement)
+    if not exists:
+        conn.exec_driver_sql("INSERT INTO package_fts(package_fts) VALUES ('rebuild')")
+
+
+def destination_matches(destination):
+    """Select of package ids whose destination contains ``destination``.
+
+    Same semantics as ``Package.destination.ilike('%x%')``; patterns with at
+    least three characters are answered from the trigram index.
+    """
+    return select(package_fts.c.rowid).where(package_fts.c.destination.like(f"%{destination}%"))
+
+
+class DestinationIndex:
+    """Sorted prefix index over destination names.
+
+    Every word of a name is a key, so "del" finds "New Delhi". A lookup is a
+    binary search plus a walk over the matching range.
+    """
+
+    def __init__(self, counts):
+        # counts: {display name: number of packages}
+        self.counts = dict(counts)
+        entries = set()
+        for name in self.counts:
+            words = name.lower().split()
+            for i in range(len(words)):
+                entries.add((" ".join(words[i:]), name))
+        self._entries = sorted(entries)
+        self._keys = [key for key, _ in self._entries]
+        self._top = sorted(self.counts, key=lambda n: (-self.counts[n], n))
+
+    def suggest(self, prefix, limit=10):
+        """Names starting with ``prefix`` (or with a word that does), most packages first."""
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return self._top[:limit]
+        names = set()
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            names.add(self._entries[i][1])
+            i += 1
+        return sorted(names, key=lambda n: (-self.counts[n], n))[:limit]
@@ -1,4 +1,9 @@
-from app import db, Package, City, Flight, Hotel, Activity, app
+from app import create_app
+from catalog import bump_version, insert_day_plan_rules
+from models import db, Package, City, Flight, Hotel, Activity
+from price_table import refresh_prices
+
+app = create_app()
 
 with app.app_context():
     db.drop_all()
@@ -66,6 +71,10 @@ with app.app_context():
         Activity(city_id=goa.id, name='SCUBA DIVING+WATERSPORTS', type='activity', rate_1=2000, rate_2=2000, rate_3=2000, rate_4=2000, price=2000, details='Scuba diving and watersports package')
     ]
     db.session.bulk_save_objects(activities)
+    insert_day_plan_rules(db.session.connection())
+    # bulk_save_objects bypasses session events, so publish the new catalog explicitly
+    bump_version(db.session.connection())
+    refresh_prices(db.session.connection(), full=True)
     db.session.commit()
 
     print('Seed data inserted: cities, flights, hotels, activities, packages')
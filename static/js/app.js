@@ -232,7 +232,7 @@ const topCities = [
         renderCityList(citySearch.value, cityList);
     });
     toCitySearch.addEventListener("input", function () {
-        renderCityList(toCitySearch.value, toCityList);
+        renderDestinationSuggestions(toCitySearch.value, toCityList);
     });
 
     // Select city from dropdowns
@@ -290,7 +290,7 @@ const topCities = [
     function showToCityDropdown() {
         toCityDropdown.style.display = "block";
         toCitySearch.value = "";
-        renderCityList("", toCityList);
+        renderDestinationSuggestions("", toCityList);
         toCitySearch.focus();
     }
 
@@ -298,8 +298,30 @@ const topCities = [
         let filtered = topCities.filter(city =>
             city.toLowerCase().includes(filter.toLowerCase())
         );
-        listElem.innerHTML = filtered.map(city =>
-            `<div class="city-option" style="padding:10px 18px;cursor:pointer;">${city}</div>`
-        ).join("");
+        renderCityOptions(filtered, listElem);
+    }
+
+    // Destinations come from the server-side autocomplete index
+    let suggestRequest = 0;
+    function renderDestinationSuggestions(query, listElem) {
+        const requestId = ++suggestRequest;
+        fetch(`/api/destinations/suggest?q=${encodeURIComponent(query)}`)
+            .then(res => res.json())
+            .then(data => {
+                // Ignore answers to queries the user has already typed past
+                if (requestId !== suggestRequest) return;
+                renderCityOptions(data.suggestions, listElem);
+            });
+    }
+
+    // Names come from catalog data: set them as text, never as markup
+    function renderCityOptions(cities, listElem) {
+        listElem.replaceChildren(...cities.map(city => {
+            const option = document.createElement("div");
+            option.className = "city-option";
+            option.style.cssText = "padding:10px 18px;cursor:pointer;";
+            option.textContent = city;
+            return option;
+        }));
     }
 });
@@ -0,0 +1,32 @@
+import pytest
+
+from app import create_app
+from benchmarks.datagen import generate
+from catalog import catalog
+from models import db
+from page_cache import cache
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a fresh SQLite file; keyword arguments override the config.
+
+    ``scale`` loads a synthetic catalog (seasonal rates included) of that size.
+    """
+    def make(scale=None, **config):
+        # The catalog and the page cache are process-wide: forget the last test's database
+        catalog.invalidate()
+        cache.clear()
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'holidays.db'}",
+                          "CATALOG_VERSION_TTL": 0, "TESTING": True, **config})
+        if scale is not None:
+            with app.app_context():
+                with db.engine.begin() as conn:
+                    generate(conn, scale=scale, seed=7)
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(scale=0.01)
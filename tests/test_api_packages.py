@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import func, select
+
+from models import db, Package
+
+
+def _walk(client, query):
+    """Every package of a paginated listing, following ``next_cursor``."""
+    packages, cursor = [], None
+    while True:
+        url = f"/api/packages?{query}" + (f"&cursor={cursor}" if cursor else "")
+        data = client.get(url).get_json()
+        packages += data["packages"]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return packages
+
+
+def test_cursor_pages_cover_every_package_once(app):
+    client = app.test_client()
+    with app.app_context():
+        total = db.session.execute(select(func.count()).select_from(Package)).scalar()
+    ids = [p["id"] for p in _walk(client, "limit=7")]
+    assert ids == sorted(ids)
+    assert len(ids) == len(set(ids)) == total
+
+
+def test_price_sort_orders_by_total(app):
+    client = app.test_client()
+    packages = _walk(client, "sort=price&persons=3&limit=9")
+    keys = [(p["with_flight"], p["id"]) for p in packages]
+    assert keys == sorted(keys)
+    without = _walk(client, "sort=price&persons=3&flight_option=without&limit=9")
+    keys = [(p["without_flight"], p["id"]) for p in without]
+    assert keys == sorted(keys)
+
+
+def test_unchanged_page_is_not_modified(app):
+    client = app.test_client()
+    first = client.get("/api/packages?limit=5")
+    etag = first.headers["ETag"]
+    assert client.get("/api/packages?limit=5", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/packages?limit=6", headers={"If-None-Match": etag}).status_code == 200
+    with app.app_context():
+        package = db.session.execute(select(Package).order_by(Package.id)).scalars().first()
+        package.price += 1
+        db.session.commit()
+    assert client.get("/api/packages?limit=5", headers={"If-None-Match": etag}).status_code == 200
+
+
+@pytest.mark.parametrize("query", ["sort=name", "cursor=not-a-cursor", "persons=0",
+                                   "sort=price&persons=99999999999999999999"])
+def test_bad_arguments_are_rejected(app, query):
+    response = app.test_client().get(f"/api/packages?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+import bookings
+from models import db, BookingStat, Package
+
+
+TOKEN = "test-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+FORM = {"name": "Asha", "email": "asha@example.com", "phone": "9999999999", "travellers": "2",
+        "persons": "3", "taxi_type": "Sedan", "room_type": "Double", "hotel_type": "3 Star"}
+
+
+@pytest.fixture
+def admin_app(make_app):
+    """An app with the admin API on and seven bookings over two packages, two of them cancelled."""
+    app = make_app(scale=0.01, ADMIN_TOKEN=TOKEN, BOOKING_EXPORT_CHUNK=2)
+    with app.app_context():
+        first, second = db.session.execute(select(Package.id).order_by(Package.id).limit(2)).scalars()
+        for i, (package_id, status) in enumerate([(first, "CONFIRMED")] * 4 + [(second, "CONFIRMED")]
+                                                 + [(second, "CANCELLED")] * 2):
+            values = {**bookings.parse_booking({**FORM, "name": f"Guest {i}"}, package_id), "status": status}
+            bookings.place_booking(values)
+    return app
+
+
+def _package_ids(app):
+    with app.app_context():
+        return tuple(db.session.execute(select(Package.id).order_by(Package.id).limit(2)).scalars())
+
+
+def _export(app, query=""):
+    response = app.test_client().get(f"/admin/bookings/export?{query}", headers=AUTH)
+    assert response.status_code == 200
+    return response
+
+
+def test_export_requires_the_admin_token(admin_app):
+    client = admin_app.test_client()
+    assert client.get("/admin/bookings/export").status_code == 401
+    assert client.get("/admin/bookings/stats", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+
+def test_csv_export_streams_every_booking_in_id_order(admin_app):
+    response = _export(admin_app)
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row["name"] for row in rows] == [f"Guest {i}" for i in range(7)]
+    assert [int(row["id"]) for row in rows] == sorted(int(row["id"]) for row in rows)
+    assert "idempotency_key" not in rows[0]
+
+
+def test_ndjson_export_filters(admin_app):
+    _, second = _package_ids(admin_app)
+    response = _export(admin_app, f"format=ndjson&package_id={second}&status=CANCELLED")
+    assert response.mimetype == "application/x-ndjson"
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(r["package_id"], r["status"], r["name"]) for r in records] == [
+        (second, "CANCELLED", "Guest 5"), (second, "CANCELLED", "Guest 6")]
+
+
+def test_export_resumes_from_min_id(admin_app):
+    records = [json.loads(line) for line in _export(admin_app, "format=ndjson").get_data(as_text=True).splitlines()]
+    last = records[2]["id"]
+    resumed = [json.loads(line) for line in
+               _export(admin_app, f"format=ndjson&min_id={last + 1}&max_id={records[5]['id']}")
+               .get_data(as_text=True).splitlines()]
+    assert resumed == records[3:6]
+
+
+@pytest.mark.parametrize("query, error", [("format=xml", "format must be one of csv, ndjson"),
+                                          ("min_id=first", "min_id must be a whole number")])
+def test_export_rejects_bad_arguments(admin_app, query, error):
+    response = admin_app.test_client().get(f"/admin/bookings/export?{query}", headers=AUTH)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+
+
+def test_stats_count_committed_bookings(admin_app):
+    first, second = _package_ids(admin_app)
+    today = datetime.now(timezone.utc).date().isoformat()
+    client = admin_app.test_client()
+    data = client.get("/admin/bookings/stats?group=package", headers=AUTH).get_json()
+    assert data["rows"] == [{"package_id": first, "bookings": 4, "travellers": 8, "persons": 12},
+                            {"package_id": second, "bookings": 3, "travellers": 6, "persons": 9}]
+    data = client.get(f"/admin/bookings/stats?status=CONFIRMED&start={today}&end={today}",
+                      headers=AUTH).get_json()
+    assert data["group"] == "both"
+    assert [(row["package_id"], row["day"], row["bookings"]) for row in data["rows"]] == [
+        (first, today, 4), (second, today, 1)]
+    assert client.get("/admin/bookings/stats?start=2026-13-01", headers=AUTH).status_code == 400
+
+
+def test_maintained_stats_equal_a_rebuild(admin_app):
+    def stat_rows(conn):
+        return sorted(tuple(row) for row in conn.execute(select(BookingStat.__table__)))
+
+    with admin_app.app_context():
+        with db.engine.begin() as conn:
+            maintained = stat_rows(conn)
+            bookings.rebuild_stats(conn)
+            assert stat_rows(conn) == maintained
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+import bookings
+from models import db, Booking, BookingStat, Package
+
+
+FORM = {"name": "Asha", "email": "asha@example.com", "phone": "9999999999", "travellers": "2",
+        "persons": "2", "taxi_type": "Sedan", "room_type": "Double", "hotel_type": "3 Star"}
+
+
+def _package_id(app):
+    with app.app_context():
+        return db.session.execute(select(Package.id).order_by(Package.id)).scalars().first()
+
+
+def _counts(app):
+    with app.app_context():
+        return (db.session.execute(select(func.count()).select_from(Booking)).scalar(),
+                db.session.execute(select(func.sum(BookingStat.bookings))).scalar() or 0)
+
+
+@pytest.mark.parametrize("group_commit", [True, False])
+def test_retried_booking_is_written_once(app, group_commit):
+    app.config["BOOKING_GROUP_COMMIT"] = group_commit
+    client = app.test_client()
+    package_id = _package_id(app)
+    for _ in range(3):
+        response = client.post(f"/book/{package_id}", data=FORM, headers={"Idempotency-Key": "retry-1"})
+        assert response.status_code == 302
+    assert _counts(app) == (1, 1)
+
+
+def test_concurrent_retries_share_one_booking(make_app):
+    app = make_app(scale=0.01, BOOKING_COMMIT_WINDOW=0.05)
+    package_id = _package_id(app)
+    values = bookings.parse_booking(FORM, package_id)
+    results = []
+
+    def place():
+        with app.app_context():
+            results.append(bookings.place_booking(values, "same-key"))
+
+    threads = [threading.Thread(target=place) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({booking_id for booking_id, _ in results}) == 1
+    assert sum(created for _, created in results) == 1
+    assert _counts(app) == (1, 1)
+
+
+def test_failing_booking_does_not_fail_its_batch(app):
+    package_id = _package_id(app)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TRIGGER reject_bad BEFORE INSERT ON booking WHEN NEW.name = 'bad' "
+                                 "BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+        with db.engine.connect() as conn:
+            results = bookings.write_bookings(conn, [
+                (bookings.parse_booking(FORM, package_id), "a"),
+                (bookings.parse_booking({**FORM, "name": "bad"}, package_id), "b"),
+                (bookings.parse_booking(FORM, package_id), "c"),
+            ])
+    assert isinstance(results[1], Exception)
+    assert [created for _, created in (results[0], results[2])] == [True, True]
+    assert _counts(app) == (2, 2)
@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+import shutil
+
+import pytest
+from flask import Flask, render_template_string
+
+import assets
+import compression
+
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_large_pages_are_gzipped(app):
+    client = app.test_client()
+    plain = client.get("/packages")
+    response = client.get("/packages", headers=GZIP)
+    assert len(plain.data) >= compression.DEFAULT_MIN_SIZE
+    assert "Content-Encoding" not in plain.headers
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_small_bodies_and_other_types_are_left_alone(make_app):
+    app = make_app(scale=0.01, GZIP_MIN_SIZE=1 << 30)
+    response = app.test_client().get("/packages", headers=GZIP)
+    assert "Content-Encoding" not in response.headers
+    assert b"</html>" in response.data
+    response = app.test_client().get("/static/css/style.css", headers=GZIP)
+    assert "Content-Encoding" not in response.headers
+    response.close()
+
+
+def test_compressed_etag_is_weak_and_still_matches(app):
+    client = app.test_client()
+    response = client.get("/api/packages?limit=50", headers=GZIP)
+    assert response.headers["Content-Encoding"] == "gzip"
+    etag, weak = response.get_etag()
+    assert weak
+    again = client.get("/api/packages?limit=50", headers={**GZIP, "If-None-Match": f'W/"{etag}"'})
+    assert again.status_code == 304
+
+
+def test_compressed_bodies_are_kept_by_etag(app):
+    client = app.test_client()
+    first = client.get("/api/packages?limit=50", headers=GZIP)
+    hits = compression.stats.memo_hits
+    second = client.get("/api/packages?limit=50", headers=GZIP)
+    assert compression.stats.memo_hits == hits + 1
+    assert second.data == first.data
+
+
+@pytest.fixture
+def static_app(tmp_path):
+    """A bare app over a copy of ``static/`` with the asset build run on it."""
+    static = tmp_path / "static"
+    shutil.copytree(os.path.join(os.path.dirname(assets.__file__), "static"), static,
+                    ignore=shutil.ignore_patterns(assets.DIST))
+    report = assets.build(str(static))
+    app = Flask(__name__, static_folder=str(static))
+    assets.init_app(app)
+    return app, report
+
+
+def test_build_fingerprints_and_precompresses(static_app):
+    app, report = static_app
+    with open(f"{app.static_folder}/dist/manifest.json") as f:
+        manifest = json.load(f)
+    assert set(manifest) == {source for source, _, _, _ in report}
+    for source, target, size, compressed_size in report:
+        assert manifest[source] == f"dist/{target}"
+        data = open(f"{app.static_folder}/{source}", "rb").read()
+        assert target == assets.hashed_name(source, data)
+        if compressed_size is not None:
+            assert gzip.decompress(open(f"{app.static_folder}/dist/{target}.gz", "rb").read()) == data
+    # Rebuilding unchanged files gives the same names and bytes
+    assert assets.build(app.static_folder) == report
+
+
+def test_hashed_urls_are_served_immutable(static_app):
+    app, _ = static_app
+    manifest = app.extensions["asset_manifest"]
+    with app.test_request_context():
+        url = render_template_string("{{ url_for('static', filename='js/app.js') }}")
+    assert url == f"/static/{manifest['js/app.js']}"
+    source = open(f"{app.static_folder}/js/app.js", "rb").read()
+
+    client = app.test_client()
+    response = client.get(url, headers=GZIP)
+    assert response.headers["Cache-Control"] == assets.IMMUTABLE
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype in ("application/javascript", "text/javascript")
+    assert gzip.decompress(response.get_data()) == source
+    response.close()
+
+    response = client.get(url)
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == source
+    response.close()
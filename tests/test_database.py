@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import event, func, select, text
+from sqlalchemy.exc import OperationalError
+
+import database
+from models import db, City
+
+
+def _statements(engine):
+    """List that collects the statements run on ``engine`` from now on."""
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_pragmas_are_in_effect_on_both_engines(app):
+    result = database.report(app)
+    assert set(result) == {"main", "read_only"}
+    for configured, actual in result.values():
+        assert database._mismatches(configured, actual) == {}
+    assert result["main"][1]["journal_mode"] == "WAL"
+    assert (result["main"][1]["query_only"], result["read_only"][1]["query_only"]) == (0, 1)
+
+
+def test_read_only_views_query_the_read_engine(app):
+    client = app.test_client()
+    # The first request loads the catalog snapshot, which is shared and not the view's own read
+    client.get("/packages")
+    read_statements = _statements(app.extensions["read_engine"])
+    with app.app_context():
+        main_statements = _statements(db.engine)
+    assert client.get("/packages?destination=a").status_code == 200
+    assert any("FROM package" in s for s in read_statements)
+    # Only the catalog version check stays on the main engine
+    assert all("FROM catalog_version" in s for s in main_statements)
+
+
+def test_session_binds_to_the_read_engine_only_inside_read_only(app):
+    @database.read_only
+    def view():
+        return db.session.get_bind()
+
+    with app.test_request_context():
+        assert view() is app.extensions["read_engine"]
+    with app.test_request_context():
+        assert db.session.get_bind() is db.engine
+
+
+def test_read_only_view_cannot_write(app):
+    @database.read_only
+    def view():
+        db.session.execute(text("INSERT INTO city (name) VALUES ('Written Anyway')"))
+        db.session.commit()
+
+    with app.test_request_context():
+        with pytest.raises(OperationalError, match="readonly|read-only"):
+            view()
+        db.session.rollback()
+    with app.app_context():
+        assert db.session.execute(select(func.count()).where(City.name == "Written Anyway")).scalar() == 0
+
+
+def test_read_engine_opens_paths_with_uri_characters(make_app, tmp_path):
+    folder = tmp_path / "rates #1 100% done"
+    folder.mkdir()
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{folder / 'holidays.db'}")
+    with app.app_context():
+        db.session.add(City(name="Odd Path"))
+        db.session.commit()
+    with app.extensions["read_engine"].connect() as conn:
+        assert conn.execute(select(City.name)).scalars().all() == ["Odd Path"]
+
+
+def test_read_pool_can_be_turned_off(make_app):
+    app = make_app(SQLITE_READ_POOL="0")
+    assert "read_engine" not in app.extensions
+    assert set(database.report(app)) == {"main"}
@@ -0,0 +1,89 @@
+from collections import namedtuple
+
+from sqlalchemy import select
+
+import price_table
+import pricing
+from catalog import catalog, insert_day_plan_rules
+from models import db, Activity, City, DayPlanRule, Package
+
+
+Act = namedtuple("Act", "id name type rate_1 rate_2 rate_3 rate_4 price")
+
+
+def _act(id, name, type):
+    return Act(id, name, type, 100 * id, 90 * id, 80 * id, 70 * id, 70 * id)
+
+
+# The shipped Goa activities (seed.py): the boat cruise is not a tour
+GOA = [_act(1, "AIRPORT PICK UP", "pickup"), _act(2, "AIRPORT DROP", "drop"),
+       _act(3, "NORTH GOA TOUR SIC", "tour"), _act(4, "SOUTH GOA TOUR SIC", "tour"),
+       _act(5, "BOAT CRUISE RIDE", "activity"), _act(6, "SCUBA DIVING+WATERSPORTS", "tour")]
+
+
+def _names(days):
+    return [[a.name for a in acts] for acts in days]
+
+
+def test_without_a_template_tours_spread_one_per_middle_day():
+    tours = [_act(10 + i, f"TOUR {i}", "tour") for i in range(4)]
+    assert _names(pricing.plan_activities(4, GOA[:2] + tours)) == [
+        ["AIRPORT PICK UP"], ["TOUR 0"], ["TOUR 1", "TOUR 2", "TOUR 3"], ["AIRPORT DROP"]]
+    assert _names(pricing.plan_activities(1, GOA[:2] + tours)) == [["AIRPORT PICK UP", "AIRPORT DROP"]]
+
+
+def test_template_names_match_tours_case_insensitively():
+    template = {2: ("north goa tour sic", "NO SUCH TOUR"), 4: ("SCUBA DIVING+WATERSPORTS",)}
+    assert _names(pricing.plan_activities(5, GOA, template)) == [
+        ["AIRPORT PICK UP"], ["NORTH GOA TOUR SIC"], [], ["SCUBA DIVING+WATERSPORTS"], ["AIRPORT DROP"]]
+
+
+def test_rate_table_compiles_each_trip_length_once():
+    rates = pricing.RateTable(GOA, {4: {2: ("NORTH GOA TOUR SIC",), 3: ("SOUTH GOA TOUR SIC",)}})
+    plan = rates.plan(4)
+    assert rates.plan(4) is plan
+    assert _names(plan.days) == [["AIRPORT PICK UP"], ["NORTH GOA TOUR SIC"], ["SOUTH GOA TOUR SIC"],
+                                 ["AIRPORT DROP"]]
+    assert plan.day_rows == tuple(rates.rows(acts) for acts in plan.days)
+    assert plan.rows == rates.rows([a for acts in plan.days for a in acts])
+    # Lengths without rules keep the default layout
+    assert _names(rates.plan(3).days) == _names(pricing.plan_activities(3, GOA))
+
+
+def test_default_rules_lay_out_goa(make_app):
+    app = make_app()
+    with app.app_context():
+        goa = City(name="Goa")
+        db.session.add(goa)
+        db.session.flush()
+        db.session.add_all(Activity(city_id=goa.id, **a._replace(id=None)._asdict()) for a in GOA)
+        assert insert_day_plan_rules(db.session.connection()) == 4
+        db.session.commit()
+        rates = catalog.current().city("Goa").rates
+        # The boat cruise is not a tour, so the rule naming it is left out, as before rules were data
+        assert _names(rates.plan(4).days) == [["AIRPORT PICK UP"], ["NORTH GOA TOUR SIC"],
+                                              ["SOUTH GOA TOUR SIC", "SCUBA DIVING+WATERSPORTS"],
+                                              ["AIRPORT DROP"]]
+
+
+def test_rule_writes_reach_the_catalog_and_price_table(app):
+    with app.app_context():
+        package = db.session.execute(select(Package).join(City, City.name == Package.destination)
+                                     .where(Package.duration == "4D/3N").order_by(Package.id)).scalars().first()
+        entry = catalog.current().city(package.destination)
+        tours = [a for a in entry.activities if a.type == "tour"]
+        assert len(tours) > 1
+        before = catalog.current().version
+        # Every tour on day 3, none on day 2
+        db.session.add_all(DayPlanRule(city_id=entry.city.id, num_days=4, day=3, position=i, activity_name=a.name)
+                           for i, a in enumerate(tours))
+        db.session.commit()
+
+        snapshot = catalog.current()
+        assert snapshot.version != before
+        entry = snapshot.city(package.destination)
+        assert _names(entry.rates.plan(4).days)[1:3] == [[], [a.name for a in tours]]
+        itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights, entry.hotels,
+                                            entry.activities, "New Delhi", 2, entry.routes, entry.rates)
+        assert price_table.lookup_totals([package.id], "New Delhi", 2)[package.id] == {
+            "with_flight": itinerary.with_flight, "without_flight": itinerary.without_flight}
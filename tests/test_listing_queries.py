@@ -0,0 +1,13 @@
+from benchmarks.listing_queries import build_catalog, count_listing_queries
+
+
+def test_listing_query_count_does_not_grow_with_packages(make_app):
+    # The page cache would answer the measured request without any SQL
+    app = make_app(PAGE_CACHE=False)
+    client = app.test_client()
+    counts = {}
+    with app.app_context():
+        for size in (10, 100, 500):
+            build_catalog(size)
+            counts[size] = count_listing_queries(client)
+    assert len(set(counts.values())) == 1, counts
@@ -0,0 +1,34 @@
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import metrics
+from models import db
+
+
+def test_failed_statement_leaves_nothing_on_the_connection(app):
+    with app.test_request_context():
+        stats = g._request_stats = metrics.RequestStats()
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            # Pooled connections live on, so per-statement state must not pile up in their info
+            assert "_query_start" not in conn.info
+            conn.execute(text("SELECT 1"))
+    assert stats.sql_statements == 1
+    assert stats.sql_seconds > 0
+
+
+def _sql_statement_count(client, route):
+    body = client.get("/metrics").get_data(as_text=True)
+    prefix = f'holiday_request_sql_statements_count{{route="{route}"}} '
+    return next((int(float(line[len(prefix):])) for line in body.splitlines() if line.startswith(prefix)), 0)
+
+
+def test_request_statements_reach_the_histograms(app):
+    # The registry is process-wide, so compare against what earlier tests left
+    client = app.test_client()
+    before = _sql_statement_count(client, "/packages")
+    assert client.get("/packages").status_code == 200
+    assert _sql_statement_count(client, "/packages") == before + 1
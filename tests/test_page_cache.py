@@ -0,0 +1,66 @@
+import threading
+
+import page_cache
+from page_cache import CachedPage, PageCache
+
+
+def _page(body, cities=None):
+    return CachedPage(body, 200, "text/html", "etag", cities)
+
+
+def test_concurrent_misses_render_once():
+    cache = PageCache()
+    started, release = threading.Event(), threading.Event()
+    renders = []
+
+    def render():
+        renders.append(1)
+        started.set()
+        release.wait(5)
+        return _page(b"page")
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get(1, "key", render)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get(1, "key", render)))
+                 for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    while cache.coalesced < len(followers):
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(renders) == 1
+    assert [page.body for page in results] == [b"page"] * 6
+    assert (cache.misses, cache.coalesced) == (1, 5)
+    assert cache.get(1, "key", render).body == b"page"
+    assert cache.hits == 1
+
+
+def test_rates_change_drops_only_affected_cities():
+    cache = PageCache()
+    cache.get(1, "goa", lambda: _page(b"goa", frozenset({1})))
+    cache.get(1, "kerala", lambda: _page(b"kerala", frozenset({2})))
+    cache.get(1, "all", lambda: _page(b"all"))
+
+    cache.drop_cities({1}, previous_version=1, version=2)
+
+    assert cache.get(2, "kerala", lambda: _page(b"new")).body == b"kerala"
+    assert cache.get(2, "goa", lambda: _page(b"new")).body == b"new"
+    assert cache.get(2, "all", lambda: _page(b"new")).body == b"new"
+    # Any other version change starts afresh
+    assert cache.get(3, "kerala", lambda: _page(b"newer")).body == b"newer"
+
+
+def test_detail_page_is_served_from_cache_with_etag(app):
+    client = app.test_client()
+    hits = page_cache.cache.hits
+    first = client.get("/package/1?persons=2&utm_source=mail")
+    second = client.get("/package/1?persons=2")
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert page_cache.cache.hits == hits + 1
+    assert client.get("/package/1?persons=2", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
@@ -0,0 +1,97 @@
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import price_calendar
+import pricing
+from catalog import catalog
+from models import db, Package
+
+
+Row = namedtuple("Row", "id price")
+Season = namedtuple("Season", "start_date end_date price")
+
+
+def _packages(app, count=30):
+    with app.app_context():
+        return db.session.execute(select(Package).order_by(Package.id).limit(count)).scalars().all()
+
+
+def test_seasonal_prices_latest_start_wins():
+    seasons = [Season(date(2026, 12, 20), date(2026, 12, 31), 200), Season(date(2026, 12, 24), date(2026, 12, 26), 300)]
+    prices = pricing.seasonal_prices(Row(1, 100), seasons, date(2026, 12, 18), 16).tolist()
+    assert prices == [100, 100] + [200] * 4 + [300] * 3 + [200] * 5 + [100, 100]
+    assert pricing.seasonal_prices(None, seasons, date(2026, 12, 18), 3).tolist() == [0, 0, 0]
+
+
+@pytest.mark.parametrize("month", [date(2026, 12, 1), date(2026, 3, 1)])
+def test_calendar_days_equal_dated_itineraries(app, month):
+    with app.app_context():
+        snapshot = catalog.current()
+        seasonal = 0
+        for package in _packages(app):
+            entry = snapshot.city(package.destination)
+            if entry is None:
+                continue
+            seasonal += price_calendar.has_seasons(package, entry, "New Delhi")
+            for day, with_flight, without_flight in price_calendar.month_totals(package, entry, "New Delhi", 2, month):
+                itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights,
+                                                    entry.hotels, entry.activities, "New Delhi", 2, entry.routes,
+                                                    entry.rates, day, entry.seasons)
+                assert (with_flight, without_flight) == (itinerary.with_flight, itinerary.without_flight)
+        assert seasonal
+
+
+def test_calendar_outside_seasons_equals_undated_itinerary(app):
+    # March has no seasons in the generated catalog
+    with app.app_context():
+        snapshot = catalog.current()
+        for package in _packages(app):
+            entry = snapshot.city(package.destination)
+            if entry is None:
+                continue
+            itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights,
+                                                entry.hotels, entry.activities, "New Delhi", 3, entry.routes,
+                                                entry.rates)
+            totals = {(w, wo) for _, w, wo in price_calendar.month_totals(package, entry, "New Delhi", 3,
+                                                                          date(2026, 3, 1))}
+            assert totals == {(itinerary.with_flight, itinerary.without_flight)}
+
+
+def test_detail_and_listing_match_the_calendar_day(app):
+    client = app.test_client()
+    with app.app_context():
+        snapshot = catalog.current()
+        package = next(p for p in _packages(app, 200)
+                       if price_calendar.has_seasons(p, snapshot.city(p.destination), "New Delhi"))
+        destination = package.destination
+    calendar = client.get(f"/api/package/{package.id}/calendar?month=2026-12&persons=2").get_json()
+    day = calendar["days"][27]
+    html = client.get(f"/package/{package.id}?departure={day['date']}&persons=2").get_data(as_text=True)
+    assert int(re.search(r"Total Price: ₹([\d,]+)", html).group(1).replace(",", "")) == day["with_flight"]
+    html = client.get(f"/packages?destination={destination}&departure={day['date']}&persons=2").get_data(as_text=True)
+    prices = dict(re.findall(r"/package/(\d+)\?[^\"]*flight_option=with&persons=2&initial_price=(\d+)", html))
+    assert int(prices[str(package.id)]) == day["with_flight"]
+
+
+@pytest.mark.parametrize("query, error", [("month=2026-13", "month must be YYYY-MM"),
+                                          ("persons=21", "persons must be at most 20")])
+def test_calendar_rejects_bad_arguments(app, query, error):
+    response = app.test_client().get(f"/api/package/1/calendar?{query}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": error}
+
+
+def test_calendar_covers_the_month(app):
+    data = app.test_client().get("/api/package/1/calendar?month=2027-02").get_json()
+    first = date(2027, 2, 1)
+    assert [d["date"] for d in data["days"]] == [(first + timedelta(days=i)).isoformat() for i in range(28)]
+
+
+@pytest.mark.parametrize("url", ["/packages?persons=99999999999999999999&departure=2026-12-28",
+                                 "/package/1?persons=21&departure=2026-12-28"])
+def test_pages_reject_oversized_groups(app, url):
+    assert app.test_client().get(url).status_code == 400
@@ -0,0 +1,36 @@
+from sqlalchemy import select
+
+import price_table
+import pricing
+from catalog import catalog
+from models import db, Hotel, Package
+
+
+def test_price_table_matches_live_pricing(app):
+    with app.app_context():
+        assert price_table.check_consistency() == []
+
+
+def test_orm_write_refreshes_affected_packages(app):
+    with app.app_context():
+        hotel = db.session.execute(select(Hotel).order_by(Hotel.id)).scalars().first()
+        hotel.price = (hotel.price or 0) + 1000
+        db.session.commit()
+        assert price_table.check_consistency() == []
+
+
+def test_lookup_totals_equal_itinerary_totals(app):
+    with app.app_context():
+        snapshot = catalog.current()
+        packages = db.session.execute(select(Package).order_by(Package.id).limit(20)).scalars().all()
+        for persons in (1, 3, 7):
+            totals = price_table.lookup_totals([p.id for p in packages], "New Delhi", persons)
+            for package in packages:
+                entry = snapshot.city(package.destination)
+                if entry is None:
+                    continue
+                itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights,
+                                                    entry.hotels, entry.activities, "New Delhi", persons,
+                                                    entry.routes, entry.rates)
+                assert totals[package.id] == {"with_flight": itinerary.with_flight,
+                                              "without_flight": itinerary.without_flight}
@@ -0,0 +1,54 @@
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import select
+
+import pricing
+from catalog import catalog
+from models import db, Package
+
+
+Activity = namedtuple("Activity", "rate_1 rate_2 rate_3 rate_4 price")
+
+
+def test_activity_rate_falls_back_to_group_rate():
+    activity = Activity(900, None, 700, None, 500)
+    assert [pricing.activity_rate(activity, p) for p in (1, 2, 3, 4, 5)] == [900, 500, 700, 500, 500]
+    assert pricing.activity_rate(Activity(None, None, None, None, None), 2) == 0
+    vector = pricing.rate_vector(activity)
+    slots = pricing.rate_slots(np.arange(1, 8)).tolist()
+    assert [vector[slot] for slot in slots] == [pricing.activity_rate(activity, p) for p in range(1, 8)]
+
+
+def test_price_grids_equal_itinerary_totals(app):
+    persons = list(range(1, 9))
+    with app.app_context():
+        snapshot = catalog.current()
+        packages = db.session.execute(select(Package).order_by(Package.id)).scalars().all()
+        for from_city in ("New Delhi", "Nowhere"):
+            priced = [(p, snapshot.city(p.destination)) for p in packages if snapshot.city(p.destination)]
+            items = [pricing.GridItem(p.destination, p.duration, e.hotels, e.activities, e.routes, e.rates,
+                                      from_city) for p, e in priced]
+            with_flight, without_flight = pricing.price_grids(items, persons)
+            for i, (package, entry) in enumerate(priced):
+                for j, size in enumerate(persons):
+                    itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights,
+                                                        entry.hotels, entry.activities, from_city, size,
+                                                        entry.routes, entry.rates)
+                    assert (with_flight[i, j], without_flight[i, j]) == (itinerary.with_flight,
+                                                                         itinerary.without_flight)
+
+
+def test_group_prices_endpoint(app):
+    client = app.test_client()
+    with app.app_context():
+        package = db.session.execute(select(Package).order_by(Package.id)).scalars().first()
+        entry = catalog.current().city(package.destination)
+        expected = [pricing.build_itinerary(package.destination, package.duration, entry.flights, entry.hotels,
+                                            entry.activities, "New Delhi", p, entry.routes, entry.rates)
+                    for p in range(1, 6)]
+    data = client.get(f"/api/package/{package.id}/prices?max_persons=5").get_json()
+    assert [(row["with_flight"], row["without_flight"]) for row in data["prices"]] == [
+        (it.with_flight, it.without_flight) for it in expected]
+    capped = client.get(f"/api/package/{package.id}/prices?max_persons=1000").get_json()
+    assert len(capped["prices"]) == pricing.MAX_GROUP_SIZE
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+import pricing
+import quotes
+from catalog import catalog
+from models import db, Package
+
+
+def _post(app, body):
+    response = app.test_client().post("/api/quotes", json=body)
+    return response.status_code, [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_quotes_equal_itinerary_totals(make_app, workers):
+    app = make_app(scale=0.01, QUOTE_WORKERS=workers)
+    with app.app_context():
+        packages = db.session.execute(select(Package).order_by(Package.id).limit(12)).scalars().all()
+        snapshot = catalog.current()
+        requests, expected = [], {}
+        for package in packages:
+            for persons, flight_option, from_city in [(1, "with", "Mumbai"), (3, "without", "New Delhi"),
+                                                      (7, "with", "New Delhi")]:
+                entry = snapshot.city(package.destination)
+                if entry is None:
+                    total = package.price
+                else:
+                    itinerary = pricing.build_itinerary(package.destination, package.duration, entry.flights,
+                                                        entry.hotels, entry.activities, from_city, persons,
+                                                        entry.routes, entry.rates)
+                    total = itinerary.with_flight if flight_option == "with" else itinerary.without_flight
+                expected[len(requests)] = total
+                requests.append({"package_id": package.id, "persons": persons, "flight_option": flight_option,
+                                 "from_city": from_city})
+
+    status, lines = _post(app, {"quotes": requests})
+    assert status == 200
+    assert lines[-1] == {"done": True, "quotes": len(requests), "errors": 0}
+    assert {line["index"]: line["total"] for line in lines[:-1]} == expected
+
+
+def test_invalid_items_are_reported_before_quotes(app):
+    status, lines = _post(app, [{"package_id": 1, "persons": 10 ** 30}, {"package_id": "x"},
+                                {"package_id": 1, "flight_option": "maybe"}, {"package_id": 10 ** 9},
+                                {"package_id": 1, "persons": 2}])
+    assert status == 200
+    assert [line.get("index") for line in lines] == [0, 1, 2, 3, 4, None]
+    assert lines[0]["error"] == f"persons must be at most {pricing.MAX_GROUP_SIZE}"
+    assert lines[3]["error"] == f"unknown package {10 ** 9}"
+    assert lines[4]["total"] > 0
+    assert lines[-1] == {"done": True, "quotes": 1, "errors": 4}
+
+
+@pytest.mark.parametrize("body", [{"quotes": "x"}, [{"package_id": 1}] * (quotes.MAX_QUOTES + 1)])
+def test_bad_bodies_are_rejected(app, body):
+    assert app.test_client().post("/api/quotes", json=body).status_code == 400
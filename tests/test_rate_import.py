@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+import price_table
+import rate_import
+from catalog import read_version
+from models import db, City, Hotel
+
+
+FIELDS = ("city", "name", "address", "room_category", "price", "meal", "details")
+
+
+def _sheet(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows({**dict.fromkeys(FIELDS, ""), **row} for row in rows)
+    return str(path)
+
+
+def _city(app):
+    with app.app_context():
+        return db.session.execute(select(City.name).order_by(City.id)).scalar()
+
+
+def _import(app, path, **options):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            return rate_import.import_sheet(conn, "hotels", path, **options)[0]
+
+
+def _hotel_prices(app, names):
+    with app.app_context():
+        return dict(db.session.execute(select(Hotel.name, Hotel.price).where(Hotel.name.in_(names))).all())
+
+
+def test_batches_upsert_and_reject(app, tmp_path):
+    city = _city(app)
+    rows = [{"city": city, "name": f"Import Inn {i}", "price": str(1000 + i)} for i in range(5)]
+    rows += [{"city": city, "name": "No Price Inn"}, {"city": "Atlantis", "name": "Lost Inn", "price": "900"}]
+    rejects = io.StringIO()
+    with app.app_context():
+        before = read_version(db.session.connection())
+    counts = _import(app, _sheet(tmp_path / "hotels.csv", rows), chunk_size=2, rejects=rejects)
+    assert (counts["inserted"], counts["updated"], counts["rejected"], counts["cities_created"]) == (5, 0, 2, 0)
+    assert [json.loads(line)["error"] for line in rejects.getvalue().splitlines()] == [
+        "missing price", "unknown city: Atlantis"]
+    with app.app_context():
+        # Five rows in batches of two: three commits, each with its version bump
+        assert read_version(db.session.connection()) == before + 3
+        assert price_table.check_consistency() == []
+
+    rows = [{"city": city.upper(), "name": "Import Inn 0", "price": "5000"},
+            {"city": city, "name": "Import Inn 9", "price": "700"}]
+    counts = _import(app, _sheet(tmp_path / "update.csv", rows), chunk_size=2)
+    assert (counts["inserted"], counts["updated"]) == (1, 1)
+    assert _hotel_prices(app, ["Import Inn 0", "Import Inn 1", "Import Inn 9"]) == {
+        "Import Inn 0": 5000, "Import Inn 1": 1001, "Import Inn 9": 700}
+
+
+def test_created_city_commits_with_its_batch(app, tmp_path):
+    rows = [{"city": "Atlantis", "name": "Lost Inn", "price": "900"},
+            # The last row's city is created, but its row is rejected
+            {"city": "El Dorado", "name": "Gold Inn"}]
+    counts = _import(app, _sheet(tmp_path / "hotels.csv", rows), chunk_size=1, create_cities=True)
+    assert (counts["inserted"], counts["rejected"], counts["cities_created"]) == (1, 1, 2)
+    with app.app_context():
+        ids = db.session.execute(select(City.id).where(City.name.in_(["Atlantis", "El Dorado"]))).scalars()
+        assert counts["city_ids"] == set(ids)
+
+
+def test_failed_batch_rolls_back_its_rates_and_cities(app, tmp_path):
+    city = _city(app)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TRIGGER reject_boom BEFORE INSERT ON hotel WHEN NEW.name = 'Boom Inn' "
+                                 "BEGIN SELECT RAISE(ABORT, 'boom'); END")
+        before = read_version(db.session.connection())
+    rows = [{"city": city, "name": "Safe Inn", "price": "1000"},
+            {"city": city, "name": "Safe Inn 2", "price": "1000"},
+            {"city": "Atlantis", "name": "Lost Inn", "price": "900"},
+            {"city": city, "name": "Boom Inn", "price": "1"}]
+    with pytest.raises(IntegrityError):
+        _import(app, _sheet(tmp_path / "hotels.csv", rows), chunk_size=2, create_cities=True)
+    with app.app_context():
+        conn = db.session.connection()
+        # The first batch stays with its one version bump; the second leaves nothing behind
+        assert read_version(conn) == before + 1
+        assert conn.execute(select(func.count()).select_from(City).where(City.name == "Atlantis")).scalar() == 0
+        assert price_table.check_consistency() == []
+    assert _hotel_prices(app, ["Safe Inn", "Safe Inn 2", "Lost Inn"]) == {"Safe Inn": 1000, "Safe Inn 2": 1000}
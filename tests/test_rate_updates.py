@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import select
+
+import price_table
+import rate_updates
+from catalog import rates_changed
+from models import db, City, Flight, Hotel
+
+
+def _apply(app, body):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            return rate_updates.apply_changes(conn, rate_updates.parse_changes(body, conn))
+
+
+def test_update_by_id_refreshes_prices_and_signals_cities(app):
+    received = []
+
+    def receiver(sender, city_ids, **kw):
+        received.append(city_ids)
+
+    with app.app_context():
+        hotels = db.session.execute(select(Hotel.id, Hotel.city_id, Hotel.price).limit(5)).all()
+    with rates_changed.connected_to(receiver):
+        report = _apply(app, {"hotels": [{"id": id, "price": (price or 0) + 500} for id, _, price in hotels]})
+    assert report["updated"] == len(hotels)
+    assert received == [frozenset(city_id for _, city_id, _ in hotels)]
+    with app.app_context():
+        assert price_table.check_consistency() == []
+
+
+def test_unchanged_values_are_not_counted(app):
+    with app.app_context():
+        hotel_id, price = db.session.execute(select(Hotel.id, Hotel.price).where(Hotel.price.is_not(None))).first()
+    assert _apply(app, {"hotels": [{"id": hotel_id, "price": price}]})["updated"] == 0
+
+
+def test_flight_change_without_details(app):
+    with app.app_context():
+        city = City(name="Testville")
+        db.session.add(city)
+        db.session.flush()
+        db.session.add_all([
+            Flight(city_id=city.id, source_station="Pune", destination_station="Testville", price=100, details="AM"),
+            Flight(city_id=city.id, source_station="Pune", destination_station="Testville", price=100, details="PM"),
+            Flight(city_id=city.id, source_station="Testville", destination_station="Pune", price=100, details="AM"),
+        ])
+        db.session.commit()
+        city_id = city.id
+
+    report = _apply(app, {"flights": [
+        {"city": "Testville", "source_station": "testville", "destination_station": "Pune", "price": 200},
+        {"city": "Testville", "source_station": "Pune", "destination_station": "Testville", "price": 300},
+        {"city": "Testville", "source_station": "Pune", "destination_station": "Testville", "details": "PM",
+         "price": 400},
+    ]})
+    assert (report["updated"], report["unmatched"], report["ambiguous"]) == (2, 0, 1)
+    with app.app_context():
+        prices = dict(db.session.execute(select(Flight.source_station + Flight.details, Flight.price)
+                                         .where(Flight.city_id == city_id)).all())
+    assert prices == {"TestvilleAM": 200, "PuneAM": 100, "PunePM": 400}
+
+
+def test_invalid_changes_reject_the_payload(app):
+    with pytest.raises(rate_updates.UpdateError) as error:
+        _apply(app, {"hotels": [{"id": 1, "price": -1}, {"city": "Nowhere", "name": "X", "price": 1}]})
+    assert [e["index"] for e in error.value.errors] == [0, 1]
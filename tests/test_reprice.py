@@ -0,0 +1,93 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+import price_calendar
+import pricing
+from catalog import catalog
+from models import db, Package
+
+
+def _priced_package(app, seasonal=False):
+    """A package with a catalog entry of at least three days, and the entry."""
+    with app.app_context():
+        snapshot = catalog.current()
+        for package in db.session.execute(select(Package).order_by(Package.id)).scalars():
+            entry = snapshot.city(package.destination)
+            if entry is None or pricing.parse_num_days(package.duration) < 3:
+                continue
+            if seasonal and not price_calendar.has_seasons(package, entry, "New Delhi"):
+                continue
+            db.session.expunge(package)
+            return package, entry
+    pytest.fail("no priced package in the generated catalog")
+
+
+def _itinerary(package, entry, persons, departure=None):
+    return pricing.build_itinerary(package.destination, package.duration, entry.flights, entry.hotels,
+                                   entry.activities, "New Delhi", persons, entry.routes, entry.rates,
+                                   departure, entry.seasons)
+
+
+def _reprice(app, package, **body):
+    return app.test_client().post(f"/api/package/{package.id}/reprice", json=body)
+
+
+@pytest.mark.parametrize("departure", [None, date(2026, 12, 28)])
+def test_group_size_change_equals_rebuilt_itinerary(app, departure):
+    package, entry = _priced_package(app, seasonal=departure is not None)
+    body = {"persons": 2, "flight_option": "with", "change": {"persons": 5}}
+    if departure:
+        body["departure"] = departure.isoformat()
+    data = _reprice(app, package, **body).get_json()
+    assert data["persons"] == 5
+    assert data["total"] == _itinerary(package, entry, 5, departure).with_flight
+    assert data["delta"] == data["total"] - _itinerary(package, entry, 2, departure).with_flight
+
+
+def test_flight_option_change_equals_rebuilt_itinerary(app):
+    package, entry = _priced_package(app)
+    data = _reprice(app, package, persons=3, flight_option="with",
+                    change={"flight_option": "without"}).get_json()
+    itinerary = _itinerary(package, entry, 3)
+    assert data["flight_option"] == "without"
+    assert data["total"] == itinerary.without_flight
+    assert data["delta"] == itinerary.without_flight - itinerary.with_flight
+
+
+def test_client_figures_are_ignored(app):
+    package, entry = _priced_package(app)
+    body = {"persons": 2, "change": {"persons": 4}}
+    honest = _reprice(app, package, **body).get_json()
+    forged = _reprice(app, package, item_prices={"flight-day1": 1, "hotel-day1": 1}, total=1,
+                      **body).get_json()
+    assert forged == honest
+    assert honest["total"] == _itinerary(package, entry, 4).with_flight
+
+
+def test_hotel_swap_and_removed_components(app):
+    package, entry = _priced_package(app)
+    itinerary = _itinerary(package, entry, 2)
+    prices = pricing.item_prices(itinerary, "with")
+    hotel = entry.hotels[-1]
+    data = _reprice(app, package, persons=2, removed=["activity-day1"],
+                    change={"hotel": {"day": 1, "name": hotel.name}}).get_json()
+    assert data["changed"] == {"hotel-day1": hotel.price}
+    assert data["delta"] == hotel.price - prices["hotel-day1"]
+    assert data["total"] == itinerary.with_flight - prices["activity-day1"] + data["delta"]
+
+
+@pytest.mark.parametrize("body, error", [
+    ({"persons": 21, "change": {"persons": 2}}, "persons must be at most 20"),
+    ({"persons": 2, "change": {"persons": 21}}, "persons must be at most 20"),
+    ({"persons": 2, "change": {"hotel": {"day": 1, "name": "Nowhere Inn"}}}, "unknown hotel: Nowhere Inn"),
+    ({"persons": 2, "departure": "28-12-2026", "change": {"persons": 3}}, "departure must be YYYY-MM-DD"),
+    ({"persons": 2, "change": {"price": 1}},
+     "change must be an object with one of 'hotel', 'persons' or 'flight_option'"),
+])
+def test_rejects_bad_requests(app, body, error):
+    package, _ = _priced_package(app)
+    response = _reprice(app, package, **body)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": error}
@@ -0,0 +1,44 @@
+from sqlalchemy import select
+
+import search
+from models import db, Package
+
+
+def test_destination_matches_agree_with_ilike(app):
+    with app.app_context():
+        destinations = db.session.execute(select(Package.destination).distinct()).scalars().all()
+        for pattern in {d[1:4].lower() for d in destinations if d} | {"zzz", "a"}:
+            expected = set(db.session.execute(select(Package.id)
+                                              .where(Package.destination.ilike(f"%{pattern}%"))).scalars())
+            found = set(db.session.execute(search.destination_matches(pattern)).scalars())
+            assert found == expected, pattern
+
+
+def test_index_follows_package_writes(app):
+    with app.app_context():
+        package = db.session.execute(select(Package).order_by(Package.id)).scalars().first()
+        package.destination = "Quxtown"
+        db.session.commit()
+        assert list(db.session.execute(search.destination_matches("uxto")).scalars()) == [package.id]
+        db.session.delete(package)
+        db.session.commit()
+        assert list(db.session.execute(search.destination_matches("uxto")).scalars()) == []
+
+
+def test_suggest_matches_any_word_most_packages_first():
+    index = search.DestinationIndex({"New Delhi": 3, "Delhi Hills": 5, "Goa": 9})
+    assert index.suggest("del") == ["Delhi Hills", "New Delhi"]
+    assert index.suggest("  NEW   d") == ["New Delhi"]
+    assert index.suggest("") == ["Goa", "Delhi Hills", "New Delhi"]
+    assert index.suggest("", limit=1) == ["Goa"]
+    assert index.suggest("x") == []
+
+
+def test_suggest_endpoint(app):
+    client = app.test_client()
+    with app.app_context():
+        name = db.session.execute(select(Package.destination).where(Package.destination != "")).scalar()
+    data = client.get(f"/api/destinations/suggest?q={name[:2]}&limit=50").get_json()
+    assert data["q"] == name[:2]
+    assert name in data["suggestions"]
+    assert len(client.get("/api/destinations/suggest?limit=2").get_json()["suggestions"]) == 2